@@ -0,0 +1,286 @@
+"""
+Script python créé par S. ROULLET
+Dernière modification le 19/10/2026
+
+Ce script contient les fonctions pour la fenêtre d'association de valeurs à des points.
+"""
+
+import pandas as pd
+import os
+import json
+from tkinter import *
+from tkinter import filedialog, messagebox
+from tool_associer_points_valeur import AssociationValeurs, appliquer_etiquettes, charger_etiquettes
+from tool_echantillonner_tif import echantillonner_tif
+from interface_session import CONVERSION
+
+BG_1 = "#A6E3E9"
+BG_2 = "#71C9CE"
+FG = "#112D4E"
+
+def show_credits():
+    messagebox.showinfo("Crédits",
+                'Conversion RGB\n\n'
+        "Outil pour convertir des couleurs en valeurs à partir d'une palette.\n\n"
+        "Développé par Sylvain Roullet\n\n"
+        "Utilise :\n"
+        "- Python\n"
+        "- Tkinter\n"
+        "- Numpy\n"
+        "- Pandas\n"
+        "- Matplotlib\n\n"
+        "© mars 2025, tous droits réservés."
+    )
+
+class AssociationWindow:
+    def __init__(self, root, session=None):
+        self.session = session
+        self.window = Toplevel(root)
+        self.window.title("Association de valeurs à des points")
+        self.window.config(bg=BG_1)
+
+        # Variables de configuration
+        self.fichier_valeurs = StringVar()
+        self.fichier_points = StringVar()
+        self.fichier_etiquettes = StringVar()
+
+        self.k = StringVar(value="1")
+        self.methode = StringVar(value="vote")
+        self.dist_max = StringVar(value="")
+        self.utiliser_session = BooleanVar(value=False)
+
+        self.nom_X = StringVar(value="X")
+        self.nom_Y = StringVar(value="Y")
+        self.nom_Z = StringVar(value="Z")
+
+        # Index spatial conservé tant que le fichier de valeurs ne change pas
+        self.association = None
+        self.association_source = None
+
+        self.window.protocol("WM_DELETE_WINDOW", self.on_close)
+
+        # Interface graphique
+        self.create_widgets()
+        self.create_menu()
+
+    def create_menu(self):
+        """Crée la barre de menu avec des raccourcis clavier."""
+        self.menu = Menu(self.window)
+        self.window.config(menu=self.menu)
+
+        file_menu = Menu(self.menu, tearoff=0)
+        file_menu.add_command(label="Sélectionner CSV des valeurs", command=self.browse_values_file)
+        file_menu.add_command(label="Sélectionner CSV des points", command=self.browse_points_file)
+        file_menu.add_separator()
+        file_menu.add_command(label="Charger Paramètres", command=self.load_parameters, accelerator="Ctrl+L")
+        file_menu.add_command(label="Sauvegarder Paramètres", command=self.save_parameters, accelerator="Ctrl+S")
+        file_menu.add_separator()
+        file_menu.add_command(label="Quitter", command=self.on_close, accelerator="Ctrl+Q")
+
+        self.menu.add_cascade(label="Associer des valeurs", menu=file_menu)
+
+        aide_menu = Menu(self.menu, tearoff=0)
+        aide_menu.add_command(label="Crédits", command=show_credits)
+        self.menu.add_cascade(label="Aide", menu=aide_menu)
+
+        # Ajout des raccourcis clavier
+        self.window.bind("<Control-s>", lambda event: self.save_parameters())
+        self.window.bind("<Control-l>", lambda event: self.load_parameters())
+        self.window.bind("<Control-q>", lambda event: self.on_close())
+
+    def on_close(self):
+        self.window.destroy()
+
+    def create_widgets(self):
+        # Fichiers d'entrée
+        for row, (texte, variable, commande) in enumerate([
+            ("Valeurs converties (CSV ou Tif)", self.fichier_valeurs, self.browse_values_file),
+            ("CSV des points", self.fichier_points, self.browse_points_file),
+            ("Étiquettes (JSON, optionnel)", self.fichier_etiquettes, self.browse_labels_file),
+        ]):
+            Label(self.window, text=texte, font=("Arial", 12, "bold"), bg=BG_1).grid(row=row, column=0, padx=10,
+                                                                                  pady=10, sticky="w")
+            Entry(self.window, textvariable=variable, width=30, relief="solid", highlightbackground=BG_1).grid(row=row, column=1,
+                                                                                                          padx=10, pady=10)
+            Button(self.window, text="Parcourir", command=commande, width=15, relief="solid", bg=BG_1,
+                   highlightbackground=BG_1, highlightcolor=FG).grid(row=row, column=2, padx=10, pady=10)
+
+        # Nombre de voisins
+        Label(self.window, text="Nombre de voisins", font=("Arial", 12, "bold"), bg=BG_1).grid(row=3, column=0, padx=10,
+                                                                                              pady=10, sticky="w")
+        Entry(self.window, textvariable=self.k, width=10, relief="solid", highlightbackground=BG_1).grid(row=3, column=1,
+                                                                                                      padx=10, pady=10)
+
+        # Méthode
+        Label(self.window, text="Méthode", font=("Arial", 12, "bold"), bg=BG_1).grid(row=4, column=0, padx=10,
+                                                                                    pady=10, sticky="w")
+        OptionMenu(self.window, self.methode, "vote", "moyenne", "plus_proche", "bilineaire").grid(row=4, column=1, padx=10, pady=10)
+        Label(self.window, text="CSV : vote ou moyenne\nTif : plus_proche ou bilineaire", font=("Arial", 10), bg=BG_1).grid(
+            row=4, column=2, padx=10, pady=10)
+
+        # Distance maximale
+        Label(self.window, text="Distance maximale (vide : aucune)", font=("Arial", 12, "bold"), bg=BG_1).grid(row=5, column=0,
+                                                                                                              padx=10, pady=10,
+                                                                                                              sticky="w")
+        Entry(self.window, textvariable=self.dist_max, width=10, relief="solid", highlightbackground=BG_1).grid(row=5, column=1,
+                                                                                                             padx=10, pady=10)
+
+        # Conversion gardée en mémoire dans la session
+        if self.session is not None:
+            Checkbutton(self.window, text="Utiliser la conversion de la session", variable=self.utiliser_session,
+                        font=("Arial", 12, "bold"), bg=BG_1).grid(row=5, column=2, padx=10, pady=10, sticky="w")
+
+        # Noms des colonnes
+        self.frame_noms = Frame(self.window, bg=BG_2, relief="solid", bd=2)
+        self.frame_noms.grid(row=6, column=0, columnspan=2, padx=10, pady=10, sticky="w")
+
+        for column, (texte, variable) in enumerate([("Nom X", self.nom_X), ("Nom Y", self.nom_Y), ("Nom Z", self.nom_Z)]):
+            Label(self.frame_noms, text=texte, font=("Arial", 12, "bold"), bg=BG_2).grid(row=0, column=column, padx=5,
+                                                                                        pady=5, sticky="w")
+            Entry(self.frame_noms, textvariable=variable, width=10, relief="solid", highlightbackground=BG_2).grid(
+                row=1, column=column, padx=5, pady=5)
+
+        # Bouton de traitement
+        Button(self.window, text="Charger les param.", command=self.load_parameters, width=20, height=2, relief="solid", bg=BG_1,
+               highlightbackground=BG_1, highlightcolor=FG).grid(row=7, column=0, padx=10, pady=20)
+        Button(self.window, text="Sauvegarder les param.", command=self.save_parameters, width=20, height=2, relief="solid", bg=BG_1,
+               highlightbackground=BG_1, highlightcolor=FG).grid(row=7, column=1, padx=10, pady=20)
+        Button(self.window, text="Lancer l'association", command=self.process, width=20, height=2, relief="solid", bg=BG_1,
+               highlightbackground=BG_1, highlightcolor=FG).grid(row=7, column=2, padx=10, pady=20)
+
+    def get_parameters(self):
+        return {
+            "fichier_valeurs": self.fichier_valeurs.get(),
+            "fichier_points": self.fichier_points.get(),
+            "fichier_etiquettes": self.fichier_etiquettes.get(),
+            "k": self.k.get(),
+            "methode": self.methode.get(),
+            "dist_max": self.dist_max.get(),
+            "nom_X": self.nom_X.get(),
+            "nom_Y": self.nom_Y.get(),
+            "nom_Z": self.nom_Z.get()
+        }
+
+    def save_parameters(self):
+        """Sauvegarde les paramètres dans un fichier JSON."""
+        params = self.get_parameters()
+        file_path = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("JSON", "*.json")])
+        if not file_path:
+            return
+
+        try:
+            with open(file_path, "w") as f:
+                json.dump(params, f, indent=4)
+            messagebox.showinfo("Sauvegarde", "Paramètres sauvegardés avec succès.")
+        except Exception as e:
+            messagebox.showerror("Erreur", f"Erreur lors de la sauvegarde des paramètres : {e}")
+
+    def set_parameters(self, params):
+        """Applique un dictionnaire de paramètres (fichier JSON ou projet) aux champs de la fenêtre."""
+        self.fichier_valeurs.set(params.get("fichier_valeurs", ""))
+        self.fichier_points.set(params.get("fichier_points", ""))
+        self.fichier_etiquettes.set(params.get("fichier_etiquettes", ""))
+        self.k.set(params.get("k", "1"))
+        self.methode.set(params.get("methode", "vote"))
+        self.dist_max.set(params.get("dist_max", ""))
+        self.nom_X.set(params.get("nom_X", "X"))
+        self.nom_Y.set(params.get("nom_Y", "Y"))
+        self.nom_Z.set(params.get("nom_Z", "Z"))
+
+    def load_parameters(self):
+        """Charge les paramètres depuis un fichier JSON."""
+        file_path = filedialog.askopenfilename(filetypes=[("JSON", "*.json")])
+        if not file_path:
+            return
+
+        try:
+            with open(file_path, "r") as f:
+                params = json.load(f)
+            self.set_parameters(params)
+            messagebox.showinfo("Chargement", "Paramètres chargés avec succès.")
+        except Exception as e:
+            messagebox.showerror("Erreur", f"Erreur lors du chargement des paramètres : {e}")
+
+    def browse_values_file(self):
+        filename = filedialog.askopenfilename(filetypes=[("CSV files", "*.csv"), ("Fichiers tif", "*.tif *.tiff")])
+        if filename:
+            self.fichier_valeurs.set(filename)
+
+    def browse_points_file(self):
+        filename = filedialog.askopenfilename(filetypes=[("CSV files", "*.csv")])
+        if filename:
+            self.fichier_points.set(filename)
+
+    def browse_labels_file(self):
+        filename = filedialog.askopenfilename(filetypes=[("JSON", "*.json")])
+        if filename:
+            self.fichier_etiquettes.set(filename)
+
+    def process(self):
+        fichiers = [self.fichier_points.get()] if self.utiliser_session.get() else [self.fichier_valeurs.get(), self.fichier_points.get()]
+        for fichier in fichiers:
+            if not fichier or not os.path.exists(fichier):
+                messagebox.showerror("Erreur", f"Le fichier {fichier} n'existe pas.")
+                return
+
+        try:
+            k = int(self.k.get())
+            if k <= 0:
+                raise ValueError
+            dist_max = float(self.dist_max.get()) if self.dist_max.get().strip() else None
+        except ValueError:
+            messagebox.showerror("Erreur", "Le nombre de voisins doit être un entier positif et la distance un nombre.")
+            return
+
+        file_path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("Fichiers CSV", "*.csv")])
+        if not file_path:
+            return
+
+        nom_X, nom_Y, nom_Z = self.nom_X.get(), self.nom_Y.get(), self.nom_Z.get()
+        try:
+            if not self.utiliser_session.get() and self.fichier_valeurs.get().lower().endswith((".tif", ".tiff")):
+                self.process_tif(file_path, nom_X, nom_Y, nom_Z)
+                return
+
+            # L'index spatial n'est reconstruit que si le fichier de valeurs a changé
+            if self.utiliser_session.get():
+                values = self.session.get(CONVERSION)
+                if values is None:
+                    messagebox.showerror("Erreur", "Aucune conversion dans la session.")
+                    return
+                source = (CONVERSION, self.session.date(CONVERSION), nom_X, nom_Y, nom_Z)
+            else:
+                values = None
+                source = (self.fichier_valeurs.get(), os.path.getmtime(self.fichier_valeurs.get()), nom_X, nom_Y, nom_Z)
+            if self.association_source != source:
+                if values is None:
+                    values = pd.read_csv(self.fichier_valeurs.get(), usecols=[nom_X, nom_Y, nom_Z])
+                self.association = AssociationValeurs(values[[nom_X, nom_Y]].values, values[nom_Z].values)
+                self.association_source = source
+
+            positions = pd.read_csv(self.fichier_points.get())
+            valeurs, distances = self.association.associer(positions[[nom_X, nom_Y]].values, k, self.methode.get(), dist_max)
+
+            output_df = positions.copy()
+            output_df[nom_Z] = valeurs
+            output_df["distance"] = distances
+            if self.fichier_etiquettes.get():
+                output_df["Etiquette"] = appliquer_etiquettes(valeurs, charger_etiquettes(self.fichier_etiquettes.get()))
+
+            output_df.to_csv(file_path, index=False)
+            messagebox.showinfo("Succès", f"{len(output_df)} points associés et sauvegardés dans {file_path}")
+        except Exception as e:
+            messagebox.showerror("Erreur", f"Erreur lors de l'association : {e}")
+
+    def process_tif(self, file_path, nom_X, nom_Y, nom_Z):
+        """Lit directement les valeurs du Tif aux positions des points, par fenêtres."""
+        methode = "bilineaire" if self.methode.get() == "bilineaire" else "plus_proche"
+        positions = pd.read_csv(self.fichier_points.get())
+
+        output_df = positions.copy()
+        output_df[nom_Z] = echantillonner_tif(self.fichier_valeurs.get(), positions[nom_X].values, positions[nom_Y].values, methode)
+        if self.fichier_etiquettes.get():
+            output_df["Etiquette"] = appliquer_etiquettes(output_df[nom_Z].values, charger_etiquettes(self.fichier_etiquettes.get()))
+
+        output_df.to_csv(file_path, index=False)
+        messagebox.showinfo("Succès", f"{len(output_df)} points échantillonnés et sauvegardés dans {file_path}")
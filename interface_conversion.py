@@ -11,14 +11,21 @@ import json
 import time
 import os
 import csv
+import itertools
 import queue
+import multiprocessing
 import matplotlib.pyplot as plt
 import matplotlib.colors as mcolors
 from scipy.interpolate import interp1d
+from scipy.ndimage import uniform_filter
+from scipy.spatial import cKDTree
 from tkinter import *
 from tkinter import filedialog, messagebox
 from tkinter.ttk import Progressbar
 import threading
+from tool_cache import cache
+from tool_profilage import Profilage, profiler_queue
+from interface_session import EXTRACTION, PALETTE, CONVERSION, PALETTE_INTERPOLEE
 
 
 BG_1 = "#A6E3E9"
@@ -98,6 +105,7 @@ def plot_palette_vertical(palette, output_file, n_ticks):
     ax.set_yticklabels([palette.loc[i, 'value'].round(2) for i in tick_positions])
 
     plt.savefig(output_file, bbox_inches='tight', dpi=300)
+    plt.close(fig)
 
 
 def create_custom_cmap(palette_df):
@@ -109,7 +117,69 @@ def create_custom_cmap(palette_df):
     return cmap
 
 
-def plot_scatter(dataframe, x_col, y_col, z_col, palette, output_file):
+def rasteriser_points(x, y, z, largeur, hauteur, agregation="mode", etendue=None):
+    """
+    Regroupe les points dans une grille de largeur x hauteur cellules et agrège Z par cellule :
+    "mode" (valeur la plus fréquente) ou "moyenne". Les cellules vides valent NaN.
+    Retourne la grille (ligne 0 en bas) et l'étendue (x_min, x_max, y_min, y_max).
+    Sans point valide, la grille est vide (NaN) et l'étendue par défaut (0, 1, 0, 1).
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    z = np.asarray(z, dtype=np.float64)
+    valides = ~np.isnan(z)
+    x, y, z = x[valides], y[valides], z[valides]
+
+    if etendue is None:
+        etendue = (x.min(), x.max(), y.min(), y.max()) if len(z) else (0.0, 1.0, 0.0, 1.0)
+    if len(z) == 0:
+        return np.full((hauteur, largeur), np.nan), etendue
+    x_min, x_max, y_min, y_max = etendue
+
+    ix = np.clip(((x - x_min) / ((x_max - x_min) or 1) * largeur).astype(np.int64), 0, largeur - 1)
+    iy = np.clip(((y - y_min) / ((y_max - y_min) or 1) * hauteur).astype(np.int64), 0, hauteur - 1)
+    cellule = iy * largeur + ix
+
+    grille = np.full(largeur * hauteur, np.nan)
+    if agregation == "moyenne":
+        sommes = np.bincount(cellule, weights=z, minlength=largeur * hauteur)
+        comptes = np.bincount(cellule, minlength=largeur * hauteur)
+        remplies = comptes > 0
+        grille[remplies] = sommes[remplies] / comptes[remplies]
+    elif agregation == "mode":
+        # Compter chaque couple (cellule, valeur) puis garder le plus fréquent de chaque cellule
+        valeurs, codes = np.unique(z, return_inverse=True)
+        couples, comptes = np.unique(cellule * len(valeurs) + codes.ravel(), return_counts=True)
+        cellules_couples = couples // len(valeurs)
+        ordre = np.lexsort((-comptes, cellules_couples))
+        premiers = ordre[np.r_[True, np.diff(cellules_couples[ordre]) != 0]]
+        grille[cellules_couples[premiers]] = valeurs[couples[premiers] % len(valeurs)]
+    else:
+        raise ValueError(f"Agrégation inconnue : {agregation}")
+
+    return grille.reshape(hauteur, largeur), etendue
+
+
+def dimensions_grille(x, y, largeur_max, hauteur_max):
+    """
+    Nombre de cellules (largeur, hauteur) de la grille d'agrégation, d'après l'espacement des données et au plus
+    largeur_max x hauteur_max (la taille en pixels de la zone de tracé) : une grille plus fine que les données
+    laisserait la plupart des cellules vides. imshow agrandit ensuite la grille à la taille de l'image.
+    """
+    n_x, n_y = len(np.unique(x)), len(np.unique(y))
+    if n_x * n_y > 4 * len(x):
+        # Coordonnées non alignées sur les axes (carte tournée, points épars) : environ deux points par cellule
+        n_x = np.sqrt(len(x) / 2 * largeur_max / hauteur_max)
+        n_y = len(x) / 2 / n_x
+    return int(min(max(n_x, 1), largeur_max)), int(min(max(n_y, 1), hauteur_max))
+
+
+def plot_scatter(dataframe, x_col, y_col, z_col, palette, output_file, rendu="points"):
+    """
+    Trace le nuage de points. rendu : "points" (un marqueur par point) ou "moyenne"/"mode" :
+    les points sont agrégés dans une grille à l'espacement des données (au plus la résolution de l'image)
+    puis tracés avec imshow, ce qui rend le temps de tracé indépendant du nombre de points.
+    """
     x_data = dataframe[x_col]
     y_data = dataframe[y_col]
     z_data = dataframe[z_col]
@@ -117,7 +187,24 @@ def plot_scatter(dataframe, x_col, y_col, z_col, palette, output_file):
     cmap = create_custom_cmap(palette)
 
     fig, ax = plt.subplots(figsize=(8, 6))
-    scatter = ax.scatter(x_data, y_data, c=z_data, cmap=cmap, s=5, edgecolors='none')
+    dpi = 600
+    if z_data.isna().all():
+        # Aucun point conservé (seuil trop strict ou valeurs manquantes) : figure vide avec un message
+        ax.text(0.5, 0.5, "Aucun point à tracer", ha="center", va="center", fontsize=14, transform=ax.transAxes)
+        ax.set_title(f'Nuage de points ({x_col}, {y_col}, {z_col})', fontsize=16)
+        plt.savefig(output_file, bbox_inches='tight', dpi=dpi)
+        plt.close(fig)
+        return
+    if rendu == "points":
+        scatter = ax.scatter(x_data, y_data, c=z_data, cmap=cmap, s=5, edgecolors='none')
+    else:
+        # Une cellule par point de la grille des données, au plus une par pixel de la zone de tracé
+        position = ax.get_position()
+        largeur, hauteur = dimensions_grille(x_data.values, y_data.values,
+                                             int(fig.get_figwidth() * position.width * dpi),
+                                             int(fig.get_figheight() * position.height * dpi))
+        grille, etendue = rasteriser_points(x_data.values, y_data.values, z_data.values, largeur, hauteur, rendu)
+        scatter = ax.imshow(grille, origin="lower", extent=etendue, cmap=cmap, aspect="auto", interpolation="nearest")
 
     ax.set_title(f'Nuage de points ({x_col}, {y_col}, {z_col})', fontsize=16)
     ax.set_xlabel(x_col, fontsize=12)
@@ -126,7 +213,22 @@ def plot_scatter(dataframe, x_col, y_col, z_col, palette, output_file):
     cbar = plt.colorbar(scatter, ax=ax)
     cbar.set_label(z_col, fontsize=12)
 
-    plt.savefig(output_file, bbox_inches='tight', dpi=600)
+    plt.savefig(output_file, bbox_inches='tight', dpi=dpi)
+    plt.close(fig)
+
+
+def render_figures(palette, n_ticks, fichier_palette, dataframe, x_col, y_col, z_col, fichier_nuage, rendu, result_queue):
+    """
+    Trace la palette et le nuage de points dans un processus séparé, sans interface (backend Agg).
+    Envoie ("termine", fichiers) ou ("erreur", message) dans result_queue.
+    """
+    try:
+        plt.switch_backend("Agg")
+        plot_palette_vertical(palette, fichier_palette, n_ticks)
+        plot_scatter(dataframe, x_col, y_col, z_col, palette, fichier_nuage, rendu)
+        result_queue.put(("termine", [fichier_palette, fichier_nuage]))
+    except Exception as e:
+        result_queue.put(("erreur", str(e)))
 
 
 def color_distance(c1, c2):
@@ -146,8 +248,326 @@ def match_color_to_value(r, g, b, reference, update_progress=None):
     closest_idx = np.argmin(distances)
     return reference.loc[closest_idx, 'value'], distances[closest_idx]
 
+# === Espaces de couleur pour la correspondance ===
+# La distance (et donc le seuil) est exprimée dans l'unité de l'espace : niveaux RGB, ΔE, ou OKLab x 100
+ESPACES_COULEUR = ["RGB", "CIELAB ΔE76", "CIELAB ΔE2000", "OKLab"]
+# Candidats les plus proches en ΔE76 parmi lesquels le plus proche en ΔE2000 est choisi
+CANDIDATS_DE2000 = 8
+# Marge (relative puis dans l'unité de l'espace) sous laquelle une couleur de la palette est jugée aussi proche
+# que la plus proche pour le score d'ambiguïté, et nombre maximal de candidats gardés en mémoire à la fois
+MARGE_AMBIGUITE_RELATIVE = 0.25
+MARGE_AMBIGUITE = 2.0
+MAX_CANDIDATS_AMBIGUITE = 2_000_000
+# Lignes traitées entre deux mises à jour de la progression (correspondance vectorisée de la fenêtre)
+TAILLE_BLOC_CORRESPONDANCE = 200_000
+
+def rgb_to_linear(colors):
+    """sRGB (0-255) vers RGB linéaire (0-1)."""
+    c = np.asarray(colors, dtype=np.float64) / 255.0
+    return np.where(c <= 0.04045, c / 12.92, ((c + 0.055) / 1.055) ** 2.4)
+
+def rgb_to_lab(colors):
+    """sRGB (0-255) vers CIELAB (illuminant D65), tableaux (N, 3)."""
+    lin = rgb_to_linear(colors)
+    xyz = lin @ np.array([[0.4124564, 0.2126729, 0.0193339],
+                          [0.3575761, 0.7151522, 0.1191920],
+                          [0.1804375, 0.0721750, 0.9503041]])
+    xyz /= np.array([0.95047, 1.0, 1.08883])
+    f = np.where(xyz > (6 / 29) ** 3, np.cbrt(xyz), xyz / (3 * (6 / 29) ** 2) + 4 / 29)
+    return np.stack([116 * f[:, 1] - 16, 500 * (f[:, 0] - f[:, 1]), 200 * (f[:, 1] - f[:, 2])], axis=1)
+
+def rgb_to_oklab(colors):
+    """sRGB (0-255) vers OKLab, multiplié par 100 pour que les distances soient du même ordre que les ΔE."""
+    lin = rgb_to_linear(colors)
+    lms = np.cbrt(lin @ np.array([[0.4122214708, 0.2119034982, 0.0883024619],
+                                  [0.5363325363, 0.6806995451, 0.2817188376],
+                                  [0.0514459929, 0.1073969566, 0.6299787005]]))
+    return 100 * lms @ np.array([[0.2104542553, 1.9779984951, 0.0259040371],
+                                 [0.7936177850, -2.4285922050, 0.7827717662],
+                                 [-0.0040720468, 0.4505937099, -0.8086757660]])
+
+def delta_e2000(lab1, lab2):
+    """Différence de couleur CIEDE2000 entre deux tableaux CIELAB de même forme (..., 3)."""
+    L1, a1, b1 = lab1[..., 0], lab1[..., 1], lab1[..., 2]
+    L2, a2, b2 = lab2[..., 0], lab2[..., 1], lab2[..., 2]
+    C_moy = (np.hypot(a1, b1) + np.hypot(a2, b2)) / 2
+    G = 0.5 * (1 - np.sqrt(C_moy ** 7 / (C_moy ** 7 + 25.0 ** 7)))
+    a1p, a2p = (1 + G) * a1, (1 + G) * a2
+    C1p, C2p = np.hypot(a1p, b1), np.hypot(a2p, b2)
+    h1p = np.degrees(np.arctan2(b1, a1p)) % 360
+    h2p = np.degrees(np.arctan2(b2, a2p)) % 360
+    chroma_nulle = C1p * C2p == 0
+
+    dLp = L2 - L1
+    dCp = C2p - C1p
+    dhp = h2p - h1p
+    dhp = np.where(dhp > 180, dhp - 360, np.where(dhp < -180, dhp + 360, dhp))
+    dhp = np.where(chroma_nulle, 0, dhp)
+    dHp = 2 * np.sqrt(C1p * C2p) * np.sin(np.radians(dhp / 2))
+
+    Lp_moy = (L1 + L2) / 2
+    Cp_moy = (C1p + C2p) / 2
+    somme_h = h1p + h2p
+    hp_moy = np.where(np.abs(h1p - h2p) <= 180, somme_h / 2,
+                      np.where(somme_h < 360, (somme_h + 360) / 2, (somme_h - 360) / 2))
+    hp_moy = np.where(chroma_nulle, somme_h, hp_moy)
+
+    T = (1 - 0.17 * np.cos(np.radians(hp_moy - 30)) + 0.24 * np.cos(np.radians(2 * hp_moy))
+         + 0.32 * np.cos(np.radians(3 * hp_moy + 6)) - 0.20 * np.cos(np.radians(4 * hp_moy - 63)))
+    d_theta = 30 * np.exp(-((hp_moy - 275) / 25) ** 2)
+    R_C = 2 * np.sqrt(Cp_moy ** 7 / (Cp_moy ** 7 + 25.0 ** 7))
+    S_L = 1 + 0.015 * (Lp_moy - 50) ** 2 / np.sqrt(20 + (Lp_moy - 50) ** 2)
+    S_C = 1 + 0.045 * Cp_moy
+    S_H = 1 + 0.015 * Cp_moy * T
+    R_T = -np.sin(np.radians(2 * d_theta)) * R_C
+    return np.sqrt((dLp / S_L) ** 2 + (dCp / S_C) ** 2 + (dHp / S_H) ** 2 + R_T * (dCp / S_C) * (dHp / S_H))
+
+def convert_colors_space(colors, espace="RGB"):
+    """Coordonnées des couleurs RGB (N, 3) dans l'espace de correspondance."""
+    if espace == "RGB":
+        return np.asarray(colors, dtype=np.float64).reshape(-1, 3)
+    if espace in ("CIELAB ΔE76", "CIELAB ΔE2000"):
+        return rgb_to_lab(np.asarray(colors).reshape(-1, 3))
+    if espace == "OKLab":
+        return rgb_to_oklab(np.asarray(colors).reshape(-1, 3))
+    raise ValueError(f"Espace de couleur inconnu : {espace}")
+
+def palette_tree(reference, espace="RGB"):
+    """Index des couleurs de la palette (converties dans l'espace de correspondance), réutilisable entre plusieurs correspondances."""
+    return cKDTree(convert_colors_space(reference[['r', 'g', 'b']].values, espace))
+
+def couleurs_uniques(colors):
+    """
+    Couleurs distinctes (U, 3) d'un tableau (N, 3) de couleurs RGB et indice de la couleur distincte de chaque ligne :
+    une carte contient bien moins de couleurs distinctes que de pixels.
+    """
+    colors = np.asarray(colors).reshape(-1, 3)
+    codes = (colors[:, 0].astype(np.int64) << 16) | (colors[:, 1].astype(np.int64) << 8) | colors[:, 2].astype(np.int64)
+    codes_uniques, inverse = np.unique(codes, return_inverse=True)
+    return np.stack([codes_uniques >> 16, (codes_uniques >> 8) & 255, codes_uniques & 255], axis=1), inverse.ravel()
+
+def plus_proches(coordonnees, tree, espace="RGB"):
+    """Indice de la couleur de la palette la plus proche de chaque coordonnée (dans l'espace de tree) et sa distance."""
+    if espace == "CIELAB ΔE2000":
+        # ΔE2000 n'est pas une distance euclidienne : plus proche parmi les candidats les plus proches en ΔE76
+        k = min(CANDIDATS_DE2000, tree.n)
+        _, candidats = tree.query(coordonnees, k=k)
+        candidats = candidats.reshape(len(coordonnees), k)
+        ecarts = delta_e2000(coordonnees[:, None, :], tree.data[candidats])
+        meilleur = np.argmin(ecarts, axis=1)
+        return candidats[np.arange(len(candidats)), meilleur], ecarts[np.arange(len(candidats)), meilleur]
+    distances, indices = tree.query(coordonnees)
+    return indices, distances
+
+def score_ambiguite(coordonnees, distances, tree, valeurs_palette):
+    """
+    Écart de valeurs entre toutes les couleurs de la palette quasi aussi proches que la plus proche, c'est-à-dire
+    à moins de distances * (1 + MARGE_AMBIGUITE_RELATIVE) + MARGE_AMBIGUITE (distances dans la métrique de tree).
+    Nul quand la couleur ne correspond qu'à une portion de la palette, élevé quand la palette se recoupe
+    (légendes arc-en-ciel) et que des valeurs éloignées ont presque la même couleur.
+    La recherche par rayon trouve toutes les branches de la palette, quelle que soit sa densité d'interpolation ;
+    elle est faite par blocs de couleurs pour garder au plus MAX_CANDIDATS_AMBIGUITE candidats en mémoire.
+    """
+    rayons = distances * (1 + MARGE_AMBIGUITE_RELATIVE) + MARGE_AMBIGUITE
+    scores = np.zeros(len(coordonnees))
+    # Au pire, chaque couleur du bloc a toute la palette dans son rayon
+    taille_bloc = max(1, MAX_CANDIDATS_AMBIGUITE // tree.n)
+    for debut in range(0, len(coordonnees), taille_bloc):
+        fin = min(debut + taille_bloc, len(coordonnees))
+        voisins = tree.query_ball_point(coordonnees[debut:fin], rayons[debut:fin], return_sorted=False)
+        longueurs = np.fromiter(map(len, voisins), dtype=np.int64, count=len(voisins))
+        indices = np.fromiter(itertools.chain.from_iterable(voisins), dtype=np.int64, count=int(longueurs.sum()))
+        valeurs = valeurs_palette[indices]
+        debuts = np.concatenate([[0], np.cumsum(longueurs)[:-1]])
+        scores[debut:fin] = np.maximum.reduceat(valeurs, debuts) - np.minimum.reduceat(valeurs, debuts)
+    return scores
+
+def match_colors_to_values(colors, reference, tree=None, espace="RGB", ambiguite=False):
+    """
+    Version vectorisée de match_color_to_value : colors est un tableau (N, 3) de couleurs RGB.
+    Retourne les valeurs et les distances de la couleur la plus proche de la palette pour chaque ligne.
+    tree est l'index palette_tree(reference, espace) s'il a déjà été construit.
+    Hors RGB, seules les couleurs distinctes de l'image sont converties puis recherchées.
+    Avec ambiguite, retourne aussi le score_ambiguite de chaque ligne, calculé sur les couleurs distinctes.
+    """
+    if tree is None:
+        tree = palette_tree(reference, espace)
+    valeurs_palette = reference['value'].values
+    if espace == "RGB" and not ambiguite:
+        distances, indices = tree.query(np.asarray(colors, dtype=np.float64).reshape(-1, 3))
+        return valeurs_palette[indices], distances
+
+    uniques, inverse = couleurs_uniques(colors)
+    coordonnees = convert_colors_space(uniques, espace)
+    indices, distances = plus_proches(coordonnees, tree, espace)
+    if not ambiguite:
+        return valeurs_palette[indices][inverse], distances[inverse]
+
+    # Le rayon de recherche est exprimé dans la métrique de l'index (ΔE76 pour les deux espaces CIELAB)
+    distances_arbre = tree.query(coordonnees)[0] if espace == "CIELAB ΔE2000" else distances
+    scores = score_ambiguite(coordonnees, distances_arbre, tree, valeurs_palette)
+    return valeurs_palette[indices][inverse], distances[inverse], scores[inverse]
+
+def get_interpolated_palette(ref_palette, n_points):
+    """Palette interpolée sur n_points, relue depuis le cache si elle a déjà été calculée."""
+    cle = cache.cle("palette", ref_palette, n_points)
+    interp_palette = cache.get(cle)
+    if interp_palette is None:
+        interp_palette = interpolate_palette(ref_palette, n_points)
+        cache.put(cle, interp_palette)
+    return interp_palette
+
+def convert_colors(df, colonnes, interp_palette, tree=None, espace="RGB", ambiguite=False):
+    """
+    Correspondance couleurs -> valeurs de tout un DataFrame d'extraction.
+    colonnes donne les indices des colonnes X, Y, R, G, B. Retourne les colonnes X, Y, Z et distance, sans seuil,
+    et la colonne ambiguite si elle est demandée.
+    """
+    cle = cache.cle("correspondance", df.iloc[:, colonnes], interp_palette, espace, ambiguite)
+    df_sortie = cache.get(cle)
+    if df_sortie is None:
+        df_sortie = df.iloc[:, colonnes[:2]].copy()
+        resultat = match_colors_to_values(df.iloc[:, colonnes[2:]].values, interp_palette, tree, espace, ambiguite)
+        df_sortie['Z'], df_sortie['distance'] = resultat[0], resultat[1]
+        if ambiguite:
+            df_sortie['ambiguite'] = resultat[2]
+        cache.put(cle, df_sortie)
+    return df_sortie
+
+def filter_conversion(df_correspondance, seuil, nom_X, nom_Y, nom_Z, conserver_distance=False):
+    """Applique le seuil de distance et les noms de colonnes au résultat non filtré de la correspondance."""
+    df_sortie = df_correspondance[df_correspondance['distance'] <= seuil]
+    if not conserver_distance:
+        df_sortie = df_sortie.drop(columns=['distance'])
+    # Les colonnes distance et ambiguite éventuelles gardent leur nom
+    df_sortie.columns = [nom_X, nom_Y, nom_Z, *df_sortie.columns[3:]]
+    return df_sortie
+
+# === Consensus de voisinage après la correspondance ===
+METHODES_CONSENSUS = ["aucun", "mode", "moyenne"]
+# Un point retenu est jugé bruité si sa distance dépasse la moitié du seuil et FACTEUR_BRUIT fois la distance
+# moyenne de son voisinage
+FACTEUR_BRUIT = 2.0
+
+def forme_grille(x, y):
+    """
+    Forme (nx, ny) de la grille d'une extraction parcourue colonne par colonne (ordre de extract_colors), retrouvée
+    depuis les coordonnées : le pas entre deux points est le même dans une colonne et change au passage à la suivante.
+    Retourne None si les points ne forment pas une telle grille (extraction filtrée, fusionnée ou réordonnée).
+    """
+    n = len(x)
+    if n < 3:
+        return None
+    pas = np.column_stack([np.diff(np.asarray(x, dtype=np.float64)), np.diff(np.asarray(y, dtype=np.float64))])
+    pas_colonne = np.median(pas, axis=0)
+    sauts = np.flatnonzero(np.hypot(*(pas - pas_colonne).T) > 0.5 * np.hypot(*pas_colonne))
+    ny = sauts[0] + 1 if len(sauts) else n
+    if n % ny or not np.array_equal(sauts, np.arange(ny - 1, n - 1, ny)):
+        return None
+    return int(n // ny), int(ny)
+
+def consensus_voisinage(df_correspondance, seuil, methode, taille, valeurs_classes):
+    """
+    Remplace les points rejetés (distance > seuil) et bruités par le consensus de leurs voisins sur la grille de
+    l'extraction (fenêtre de taille x taille points) : classe de valeurs_classes la plus représentée (mode) ou
+    moyenne des valeurs, chaque voisin retenu étant pondéré par 1 / (1 + distance).
+    Les points remplacés reçoivent la distance moyenne pondérée de leurs voisins, et passent donc le seuil ; ceux
+    sans voisin retenu sont inchangés. Coût linéaire en nombre de points (filtres uniformes de scipy.ndimage).
+    """
+    if methode not in METHODES_CONSENSUS[1:]:
+        raise ValueError(f"Méthode de consensus inconnue : {methode}")
+    if taille < 1:
+        raise ValueError("La taille du voisinage doit être un entier positif.")
+    forme = forme_grille(df_correspondance.iloc[:, 0].values, df_correspondance.iloc[:, 1].values)
+    if forme is None:
+        raise ValueError("Le consensus de voisinage demande une extraction complète, dans l'ordre de l'extraction "
+                         "(colonne par colonne).")
+
+    z = df_correspondance['Z'].values.astype(np.float64).reshape(forme)
+    d = df_correspondance['distance'].values.astype(np.float64).reshape(forme)
+    poids = np.where(d <= seuil, 1 / (1 + d), 0.0)
+
+    # Les sommes sur la fenêtre sont des moyennes uniformes : le facteur taille² se simplifie dans les rapports
+    support = uniform_filter(poids, taille, mode="constant")
+    avec_support = support > 1e-12
+    diviseur = np.where(avec_support, support, 1.0)
+    d_voisinage = uniform_filter(poids * d, taille, mode="constant") / diviseur
+
+    if methode == "moyenne":
+        z_consensus = uniform_filter(poids * z, taille, mode="constant") / diviseur
+    else:
+        # Classe de chaque point : valeur de valeurs_classes la plus proche
+        valeurs_classes = np.unique(valeurs_classes)
+        classe = np.searchsorted((valeurs_classes[1:] + valeurs_classes[:-1]) / 2, z)
+        meilleur = np.zeros(forme)
+        z_consensus = z.copy()
+        for indice, valeur in enumerate(valeurs_classes):
+            score = uniform_filter(np.where(classe == indice, poids, 0.0), taille, mode="constant")
+            plus = score > meilleur
+            meilleur[plus] = score[plus]
+            z_consensus[plus] = valeur
+
+    bruites = (d > seuil / 2) & (d > FACTEUR_BRUIT * d_voisinage)
+    remplaces = avec_support & ((d > seuil) | bruites)
+
+    df_sortie = df_correspondance.copy()
+    df_sortie['Z'] = np.where(remplaces, z_consensus, z).ravel()
+    df_sortie['distance'] = np.where(remplaces, d_voisinage, d).ravel()
+    return df_sortie
+
+ETAPES_CONVERSION = ["Chargement de l'extraction", "Interpolation de la palette", "Correspondance des couleurs",
+                     "Écriture du CSV", "Tracé des figures"]
+
+def convert_file(extraction, ref_palette, params, progress_queue):
+    """
+    Conversion complète (correspondance, CSV et figures), exécutée dans un processus séparé par la file des traitements.
+    extraction est le chemin du CSV d'extraction ou un DataFrame, params les paramètres de la fenêtre de conversion.
+    L'avancement est envoyé dans progress_queue : ("etape", indice), ("points", nombre), puis ("termine", chemin)
+    ou ("erreur", message).
+    """
+    progress_queue = profiler_queue(progress_queue, "conversion", ETAPES_CONVERSION)
+    try:
+        progress_queue.put(("etape", 0))
+        df = pd.read_csv(extraction) if isinstance(extraction, str) else extraction
+        progress_queue.put(("points", len(df)))
+
+        progress_queue.put(("etape", 1))
+        interp_palette = get_interpolated_palette(ref_palette, int(params["n_points_interpolation"]))
+
+        progress_queue.put(("etape", 2))
+        colonnes = [int(params[c]) for c in ("colonne_X", "colonne_Y", "colonne_R", "colonne_G", "colonne_B")]
+        df_correspondance = convert_colors(df, colonnes, interp_palette, espace=params.get("espace_couleur", "RGB"),
+                                           ambiguite=params.get("score_ambiguite", False))
+        if params.get("consensus", "aucun") != "aucun":
+            df_correspondance = consensus_voisinage(df_correspondance, float(params["seuil_distance_couleur"]),
+                                                    params["consensus"], int(params.get("taille_consensus", 3)),
+                                                    ref_palette['value'].values)
+        df_sortie = filter_conversion(df_correspondance, float(params["seuil_distance_couleur"]),
+                                      params["nom_X"], params["nom_Y"], params["nom_Z"], params["conserver_distance"])
+
+        progress_queue.put(("etape", 3))
+        fichier_csv = os.path.join(params["dossier_sortie"], params["fichier_sortie_csv"] + ".csv")
+        df_sortie.to_csv(fichier_csv, index=False)
+
+        progress_queue.put(("etape", 4))
+        figures_queue = queue.Queue()
+        render_figures(interp_palette, int(params["n_ticks_yticks"]),
+                       os.path.join(params["dossier_sortie"], params["fichier_sortie_image_palette"] + ".png"),
+                       df_sortie, params["nom_X"], params["nom_Y"], params["nom_Z"],
+                       os.path.join(params["dossier_sortie"], params["fichier_sortie_image_csv"] + ".png"),
+                       params["rendu_nuage"], figures_queue)
+        message = figures_queue.get_nowait()
+        if message[0] == "erreur":
+            raise RuntimeError(f"Erreur lors du tracé des figures : {message[1]}")
+
+        progress_queue.put(("termine", fichier_csv))
+    except Exception as e:
+        progress_queue.put(("erreur", str(e)))
+
 class ConversionWindow:
-    def __init__(self, root):
+    def __init__(self, root, session=None, taches=None):
+        self.session = session
+        self.taches = taches
         self.window = Toplevel(root)
         self.window.title("Convertir couleurs en valeurs")
         self.queue = queue.Queue()
@@ -164,6 +584,11 @@ class ConversionWindow:
         self.n_points_interpolation = StringVar(value="1000")
         self.n_ticks_yticks = StringVar(value="10")
         self.seuil_distance_couleur = StringVar(value="80")
+        self.rendu_nuage = StringVar(value="points")
+        self.espace_couleur = StringVar(value="RGB")
+        self.consensus = StringVar(value="aucun")
+        self.taille_consensus = StringVar(value="3")
+        self.valeurs_classes = None
 
         # Variables pour les indices de colonne
         self.colonne_X = StringVar(value="0")
@@ -175,6 +600,14 @@ class ConversionWindow:
         self.nom_X = StringVar(value="X")
         self.nom_Y = StringVar(value="Y")
         self.nom_Z = StringVar(value="Z")
+        self.conserver_distance = BooleanVar(value=False)
+        self.score_ambiguite = BooleanVar(value=False)
+        self.utiliser_session = BooleanVar(value=False)
+
+        # Résultat non filtré de la dernière correspondance (valeurs et distances), pour ré-appliquer
+        # instantanément un nouveau seuil ou de nouveaux noms de colonnes
+        self.derniere_correspondance = None
+        self.derniere_signature = None
 
         self.is_processing = False
         self.window.protocol("WM_DELETE_WINDOW", self.on_close)
@@ -205,12 +638,12 @@ class ConversionWindow:
         self.menu.add_cascade(label="Aide", menu=aide_menu)
 
         # Ajout des raccourcis clavier
-        self.window.bind_all("<Control-e>", lambda event: self.browse_extraction_file())
-        self.window.bind_all("<Control-p>", lambda event: self.browse_palette_file())
-        self.window.bind_all("<Control-d>", lambda event: self.browse_folder())
-        self.window.bind_all("<Control-s>", lambda event: self.save_parameters())
-        self.window.bind_all("<Control-l>", lambda event: self.load_parameters())
-        self.window.bind_all("<Control-q>", lambda event: self.on_close())
+        self.window.bind("<Control-e>", lambda event: self.browse_extraction_file())
+        self.window.bind("<Control-p>", lambda event: self.browse_palette_file())
+        self.window.bind("<Control-d>", lambda event: self.browse_folder())
+        self.window.bind("<Control-s>", lambda event: self.save_parameters())
+        self.window.bind("<Control-l>", lambda event: self.load_parameters())
+        self.window.bind("<Control-q>", lambda event: self.on_close())
 
     def on_close(self):
         """Vérifie si la palette a été sauvegardée avant de fermer la fenêtre."""
@@ -273,11 +706,39 @@ class ConversionWindow:
         Entry(self.window, textvariable=self.n_ticks_yticks, width=10, relief="solid", highlightbackground=BG_1).grid(row=7, column=1, padx=10,
                                                                                             pady=10)
 
+        # Données de la session (extraction et palette gardées en mémoire)
+        if self.session is not None:
+            Checkbutton(self.window, text="Utiliser les données de la session", variable=self.utiliser_session,
+                        font=("Arial", 12, "bold"), bg=BG_1).grid(row=0, column=3, padx=10, pady=10, sticky="w")
+
+        # Rendu du nuage de points
+        Label(self.window, text="Rendu du nuage de points", font=("Arial", 12, "bold"), bg=BG_1).grid(row=6, column=2, padx=10,
+                                                                                                   pady=10, sticky="w")
+        OptionMenu(self.window, self.rendu_nuage, "points", "moyenne", "mode").grid(row=7, column=2, padx=10, pady=10)
+
+        # Espace de couleur de la correspondance (le seuil est exprimé dans son unité)
+        Label(self.window, text="Espace de couleur", font=("Arial", 12, "bold"), bg=BG_1).grid(row=6, column=3, padx=10,
+                                                                                             pady=10, sticky="w")
+        OptionMenu(self.window, self.espace_couleur, *ESPACES_COULEUR).grid(row=7, column=3, padx=10, pady=10)
+
         # Seuil distance couleur
         Label(self.window, text="Seuil du filtre des couleurs hors de la palette", font=("Arial", 12, "bold"), bg=BG_1).grid(row=8, column=0, padx=10,
                                                                                            pady=10, sticky="w")
         Entry(self.window, textvariable=self.seuil_distance_couleur, width=10, relief="solid", highlightbackground=BG_1).grid(row=8, column=1,
                                                                                                     padx=10, pady=10)
+        self.label_points_retenus = Label(self.window, text="", font=("Arial", 12), bg=BG_1)
+        self.label_points_retenus.grid(row=8, column=2, padx=10, pady=10, sticky="w")
+        self.seuil_distance_couleur.trace_add("write", lambda *args: self.update_retained_count())
+
+        # Consensus de voisinage : points rejetés ou bruités remplacés d'après leurs voisins sur la grille
+        Label(self.window, text="Consensus de voisinage", font=("Arial", 12, "bold"), bg=BG_1).grid(row=9, column=2, padx=10,
+                                                                                                  pady=10, sticky="w")
+        OptionMenu(self.window, self.consensus, *METHODES_CONSENSUS).grid(row=9, column=3, padx=10, pady=10)
+        Label(self.window, text="Taille du voisinage (points)", font=("Arial", 12, "bold"), bg=BG_1).grid(row=10, column=2,
+                                                                                                        padx=10, pady=10,
+                                                                                                        sticky="w")
+        Entry(self.window, textvariable=self.taille_consensus, width=10, relief="solid", highlightbackground=BG_1).grid(
+            row=10, column=3, padx=10, pady=10)
 
         # Indices des colonnes dans un frame avec columnspan=5
         self.frame_indices = Frame(self.window, bg=BG_2, relief="solid", bd=2)
@@ -339,6 +800,11 @@ class ConversionWindow:
         Entry(self.frame_noms, textvariable=self.nom_Z, width=10, relief="solid", highlightbackground=BG_2).grid(
             row=1, column=2, padx=5,pady=5)
 
+        Checkbutton(self.frame_noms, text="Conserver la distance couleur", variable=self.conserver_distance,
+                    font=("Arial", 12, "bold"), bg=BG_2).grid(row=2, column=0, columnspan=3, padx=5, pady=5, sticky="w")
+        Checkbutton(self.frame_noms, text="Ajouter le score d'ambiguïté", variable=self.score_ambiguite,
+                    font=("Arial", 12, "bold"), bg=BG_2).grid(row=3, column=0, columnspan=3, padx=5, pady=5, sticky="w")
+
             # Bouton de traitement
         Button(self.window, text="Charger les param.", command=self.load_parameters, width=20, height=2, relief="solid", bg=BG_1,
                highlightbackground=BG_1, highlightcolor=FG).grid(row=11, column=0, padx=10, pady=20)
@@ -346,10 +812,12 @@ class ConversionWindow:
                highlightbackground=BG_1, highlightcolor=FG).grid(row=11, column=1, padx=10, pady=20)
         Button(self.window, text="Lancer le traitement", command=self.process, width=20, height=2, relief="solid", bg=BG_1,
                highlightbackground=BG_1, highlightcolor=FG).grid(row=11, column=2, padx=10, pady=20)
+        if self.taches is not None:
+            Button(self.window, text="Mettre en file", command=self.queue_conversion, width=20, height=2, relief="solid",
+                   bg=BG_1, highlightbackground=BG_1, highlightcolor=FG).grid(row=11, column=3, padx=10, pady=20)
 
-    def save_parameters(self):
-        """Sauvegarde les paramètres dans un fichier JSON."""
-        params = {
+    def get_parameters(self):
+        return {
             "fichier_extraction": self.fichier_extraction.get(),
             "fichier_palette": self.fichier_palette.get(),
             "dossier_sortie": self.dossier_sortie.get(),
@@ -359,6 +827,10 @@ class ConversionWindow:
             "n_points_interpolation": self.n_points_interpolation.get(),
             "n_ticks_yticks": self.n_ticks_yticks.get(),
             "seuil_distance_couleur": self.seuil_distance_couleur.get(),
+            "rendu_nuage": self.rendu_nuage.get(),
+            "espace_couleur": self.espace_couleur.get(),
+            "consensus": self.consensus.get(),
+            "taille_consensus": self.taille_consensus.get(),
             "colonne_X": self.colonne_X.get(),
             "colonne_Y": self.colonne_Y.get(),
             "colonne_R": self.colonne_R.get(),
@@ -366,8 +838,14 @@ class ConversionWindow:
             "colonne_B": self.colonne_B.get(),
             "nom_X": self.nom_X.get(),
             "nom_Y": self.nom_Y.get(),
-            "nom_Z": self.nom_Z.get()
+            "nom_Z": self.nom_Z.get(),
+            "conserver_distance": self.conserver_distance.get(),
+            "score_ambiguite": self.score_ambiguite.get()
         }
+
+    def save_parameters(self):
+        """Sauvegarde les paramètres dans un fichier JSON."""
+        params = self.get_parameters()
         file_path = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("JSON", "*.json")])
         if not file_path:
             return
@@ -379,6 +857,33 @@ class ConversionWindow:
         except Exception as e:
             messagebox.showerror("Erreur", f"Erreur lors de la sauvegarde des paramètres : {e}")
 
+    def set_parameters(self, params):
+        """Applique un dictionnaire de paramètres (fichier JSON ou projet) aux champs de la fenêtre."""
+        self.fichier_extraction.set(params.get("fichier_extraction", ""))
+        self.fichier_palette.set(params.get("fichier_palette", ""))
+        self.dossier_sortie.set(params.get("dossier_sortie", ""))
+        self.fichier_sortie_image_palette.set(params.get("fichier_sortie_image_palette", "Palette_interpolée"))
+        self.fichier_sortie_image_csv.set(params.get("fichier_sortie_image_csv", "Nuage_points"))
+        self.fichier_sortie_csv.set(params.get("fichier_sortie_csv", "Extraction_convertie"))
+        self.n_points_interpolation.set(params.get("n_points_interpolation", "1000"))
+        self.n_ticks_yticks.set(params.get("n_ticks_yticks", "10"))
+        self.seuil_distance_couleur.set(params.get("seuil_distance_couleur", "80"))
+        self.rendu_nuage.set(params.get("rendu_nuage", "points"))
+        self.espace_couleur.set(params.get("espace_couleur", "RGB"))
+        self.consensus.set(params.get("consensus", "aucun"))
+        self.taille_consensus.set(params.get("taille_consensus", "3"))
+        self.colonne_X.set(params.get("colonne_X", "0"))
+        self.colonne_Y.set(params.get("colonne_Y", "1"))
+        self.colonne_R.set(params.get("colonne_R", "2"))
+        self.colonne_G.set(params.get("colonne_G", "3"))
+        self.colonne_B.set(params.get("colonne_B", "4"))
+        self.nom_X.set(params.get("nom_X","X"))
+        self.nom_Y.set(params.get("nom_Y","Y"))
+        self.nom_Z.set(params.get("nom_Z","Z"))
+        self.conserver_distance.set(params.get("conserver_distance", False))
+        self.score_ambiguite.set(params.get("score_ambiguite", False))
+        self.show_column_names_and_indices()
+
     def load_parameters(self):
         """Charge les paramètres depuis un fichier JSON."""
         file_path = filedialog.askopenfilename(filetypes=[("JSON", "*.json")])
@@ -388,25 +893,8 @@ class ConversionWindow:
         try:
             with open(file_path, "r") as f:
                 params = json.load(f)
-                self.fichier_extraction.set(params.get("fichier_extraction", ""))
-                self.fichier_palette.set(params.get("fichier_palette", ""))
-                self.dossier_sortie.set(params.get("dossier_sortie", ""))
-                self.fichier_sortie_image_palette.set(params.get("fichier_sortie_image_palette", "Palette_interpolée"))
-                self.fichier_sortie_image_csv.set(params.get("fichier_sortie_image_csv", "Nuage_points"))
-                self.fichier_sortie_csv.set(params.get("fichier_sortie_csv", "Extraction_convertie"))
-                self.n_points_interpolation.set(params.get("n_points_interpolation", "1000"))
-                self.n_ticks_yticks.set(params.get("n_ticks_yticks", "10"))
-                self.seuil_distance_couleur.set(params.get("seuil_distance_couleur", "80"))
-                self.colonne_X.set(params.get("colonne_X", "0"))
-                self.colonne_Y.set(params.get("colonne_Y", "1"))
-                self.colonne_R.set(params.get("colonne_R", "2"))
-                self.colonne_G.set(params.get("colonne_G", "3"))
-                self.colonne_B.set(params.get("colonne_B", "4"))
-                self.nom_X.set(params.get("nom_X","X"))
-                self.nom_Y.set(params.get("nom_Y","Y"))
-                self.nom_Z.set(params.get("nom_Z","Z"))
+            self.set_parameters(params)
             messagebox.showinfo("Chargement", "Paramètres chargés avec succès.")
-            self.show_column_names_and_indices()
         except Exception as e:
             messagebox.showerror("Erreur", f"Erreur lors du chargement des paramètres : {e}")
 
@@ -476,16 +964,17 @@ class ConversionWindow:
         if current == total and elapsed_time:
             total_minutes = elapsed_time // 60
             total_seconds = elapsed_time % 60
-            self.is_processing = False
             self.progress_label.config(text=f"Calcul terminé en {int(total_minutes)}m {int(total_seconds)}s")
 
-    def start_thread(self, df_filtre):
+    def start_thread(self, df_filtre, parametres):
         # Lancer le long calcul dans un thread séparé
-        thread = threading.Thread(target=self.long_calcul, args=(df_filtre,))
+        thread = threading.Thread(target=self.long_calcul, args=(df_filtre, parametres))
         thread.start()
 
-    def long_calcul(self, df_filtre):
+    def long_calcul(self, df_filtre, parametres):
         total_rows = len(df_filtre)
+        self.profilage.debut("Correspondance des couleurs")
+        self.profilage.lignes(total_rows)
         start_time = time.time()  # Enregistrer l'heure de départ
 
         # Appliquer la fonction pour chaque ligne et calculer 'Z' et 'distance'
@@ -493,45 +982,221 @@ class ConversionWindow:
             elapsed_time = time.time() - start_time  # Calculer le temps écoulé
             self.update_progress(row_idx + 1, total_rows, elapsed_time)  # mettre à jour la barre de progression
 
-        df_sortie = df_filtre.iloc[:, [int(self.colonne_X.get()), int(self.colonne_Y.get())]].copy()
+        colonnes = [int(self.colonne_X.get()), int(self.colonne_Y.get()),
+                    int(self.colonne_R.get()), int(self.colonne_G.get()), int(self.colonne_B.get())]
+
+        # Résultat de la correspondance déjà calculé pour ces couleurs, cette palette et cet espace ?
+        espace = self.espace_couleur.get()
+        ambiguite = self.score_ambiguite.get()
+        cle = cache.cle("correspondance", df_filtre.iloc[:, colonnes], self.interp_palette, espace, ambiguite)
+        df_sortie = cache.get(cle)
+        if df_sortie is not None:
+            self.update_progress(total_rows, total_rows, max(time.time() - start_time, 1e-3))
+        elif espace != "RGB" or ambiguite:
+            # Correspondance vectorisée (perceptuelle ou avec candidats), par blocs pour afficher la progression
+            df_sortie = df_filtre.iloc[:, colonnes[:2]].copy()
+            tree = palette_tree(self.interp_palette, espace)
+            couleurs = df_filtre.iloc[:, colonnes[2:]].values
+            resultats = np.empty((3 if ambiguite else 2, total_rows))
+            for debut in range(0, total_rows, TAILLE_BLOC_CORRESPONDANCE):
+                fin = min(debut + TAILLE_BLOC_CORRESPONDANCE, total_rows)
+                resultats[:, debut:fin] = match_colors_to_values(couleurs[debut:fin], self.interp_palette, tree, espace,
+                                                                 ambiguite)
+                self.update_progress(fin, total_rows, max(time.time() - start_time, 1e-3))
+            df_sortie['Z'], df_sortie['distance'] = resultats[0], resultats[1]
+            if ambiguite:
+                df_sortie['ambiguite'] = resultats[2]
+            cache.put(cle, df_sortie)
+        else:
+            df_sortie = df_filtre.iloc[:, colonnes[:2]].copy()
+
+            # Appliquer la fonction pour chaque ligne et calculer 'Z' et 'distance'
+            df_sortie[['Z', 'distance']] = df_filtre.apply(
+                lambda row: match_color_to_value(
+                    row.iloc[colonnes[2]], row.iloc[colonnes[3]], row.iloc[colonnes[4]],
+                    self.interp_palette, update_progress_in_lambda(row.name)
+                ),
+                axis=1, result_type='expand', raw=False
+            )
+            cache.put(cle, df_sortie)
+
+        self.derniere_correspondance = df_sortie
+        self.window.after(0, self.update_retained_count)
+        self.finish_conversion(df_sortie, parametres)
+
+    def output_parameters(self):
+        """
+        Paramètres de fin de conversion (seuil, consensus, noms et fichier de sortie), lus dans la boucle Tk
+        avant de lancer le thread de calcul. Lève ValueError si un paramètre numérique est invalide.
+        """
+        return {"seuil": float(self.seuil_distance_couleur.get()), "consensus": self.consensus.get(),
+                "taille_consensus": int(self.taille_consensus.get()), "nom_X": self.nom_X.get(),
+                "nom_Y": self.nom_Y.get(), "nom_Z": self.nom_Z.get(), "conserver_distance": self.conserver_distance.get(),
+                "fichier_sortie_csv": self.fichier_sortie_csv.get(),
+                "chemin_csv": os.path.join(self.dossier_sortie.get(), self.fichier_sortie_csv.get() + ".csv")}
+
+    def apply_consensus(self, df_correspondance, parametres):
+        """Consensus de voisinage choisi dans la fenêtre ; sans effet (avec un avertissement) s'il est impossible."""
+        if parametres["consensus"] == "aucun":
+            return df_correspondance
+        self.profilage.debut("Consensus de voisinage")
+        try:
+            return consensus_voisinage(df_correspondance, parametres["seuil"], parametres["consensus"],
+                                       parametres["taille_consensus"], self.valeurs_classes)
+        except ValueError as e:
+            message = f"Consensus de voisinage non appliqué : {e}"
+            self.window.after(0, lambda: messagebox.showwarning("Consensus", message))
+            return df_correspondance
+
+    def finish_conversion(self, df_correspondance, parametres):
+        """
+        Consensus, seuil, noms des colonnes et écriture du CSV, dans le thread de calcul. Le résultat est envoyé
+        dans self.queue sous la forme ("termine", df_sortie) ou ("erreur", message).
+        """
+        try:
+            df_correspondance = self.apply_consensus(df_correspondance, parametres)
+            self.profilage.debut("Seuil et noms des colonnes")
+            df_sortie = filter_conversion(df_correspondance, parametres["seuil"], parametres["nom_X"],
+                                          parametres["nom_Y"], parametres["nom_Z"], parametres["conserver_distance"])
+            self.profilage.debut("Écriture du CSV")
+            self.profilage.lignes(len(df_sortie))
+
+            if self.session is not None:
+                self.session.put(CONVERSION, df_sortie, parametres["fichier_sortie_csv"])
+            df_sortie.to_csv(parametres["chemin_csv"], index=False)
+            self.profilage.fin()
+        except Exception as e:
+            self.queue.put(("erreur", str(e)))
+            return
+        self.queue.put(("termine", df_sortie))
+
+    def update_retained_count(self):
+        """
+        Affiche en direct le nombre de points conservés avec le seuil saisi (masque seul). Avec un consensus de
+        voisinage, le nombre exact est affiché à la fin de la conversion.
+        """
+        if self.derniere_correspondance is None:
+            return
+        try:
+            seuil = float(self.seuil_distance_couleur.get())
+        except ValueError:
+            self.label_points_retenus.config(text="")
+            return
+        total = len(self.derniere_correspondance)
+        retenus = int(np.count_nonzero(self.derniere_correspondance['distance'].values <= seuil))
+        self.show_retained_count(retenus, total)
 
-        # Appliquer la fonction pour chaque ligne et calculer 'Z' et 'distance'
-        df_sortie[['Z', 'distance']] = df_filtre.apply(
-            lambda row: match_color_to_value(
-                row.iloc[int(self.colonne_R.get())], row.iloc[int(self.colonne_G.get())], row.iloc[int(self.colonne_B.get())],
-                self.interp_palette, update_progress_in_lambda(row.name)
-            ),
-            axis=1, result_type='expand', raw=False
-        )
-
-        # Filtrer les résultats en fonction du seuil de distance
-        df_sortie = df_sortie[df_sortie['distance'] <= float(self.seuil_distance_couleur.get())]
-        df_sortie = df_sortie.drop(columns=['distance'])
-        df_sortie.columns = [self.nom_X.get(), self.nom_Y.get(), self.nom_Z.get()]
+    def show_retained_count(self, retenus, total):
+        self.label_points_retenus.config(text=f"Points retenus : {retenus}/{total} ({retenus / max(total, 1) * 100:.1f}%)")
 
-        self.queue.put(df_sortie)
-        df_sortie.to_csv(os.path.join(self.dossier_sortie.get(),self.fichier_sortie_csv.get()  + ".csv"), index=False)
-        self.window.after(1000, self.check_for_updates)
+    def input_signature(self):
+        """Identifie les entrées de la correspondance sans relire les fichiers (seuil et noms exclus)."""
+        def fichier(chemin):
+            return (chemin, os.path.getmtime(chemin), os.path.getsize(chemin)) if os.path.exists(chemin) else chemin
 
+        if self.utiliser_session.get():
+            extraction = ("session", self.session.date(EXTRACTION))
+            palette = ("session", self.session.date(PALETTE)) if self.session.get(PALETTE) is not None else fichier(self.fichier_palette.get())
+        else:
+            extraction = fichier(self.fichier_extraction.get())
+            palette = fichier(self.fichier_palette.get())
+        return (extraction, palette, self.n_points_interpolation.get(), self.colonne_X.get(), self.colonne_Y.get(),
+                self.colonne_R.get(), self.colonne_G.get(), self.colonne_B.get(), self.espace_couleur.get(),
+                self.score_ambiguite.get())
+
+    def queue_conversion(self):
+        """Ajoute la conversion à la file des traitements avec les paramètres actuels de la fenêtre."""
+        params = self.get_parameters()
+        extraction = self.session.get(EXTRACTION) if self.utiliser_session.get() else params["fichier_extraction"]
+        palette = self.session.get(PALETTE) if self.utiliser_session.get() else None
+        if extraction is None or (isinstance(extraction, str) and not os.path.exists(extraction)):
+            messagebox.showerror("Erreur", "Le fichier d'extraction n'existe pas.")
+            return
+        if palette is None and not os.path.exists(params["fichier_palette"]):
+            messagebox.showerror("Erreur", "Le fichier de palette n'existe pas.")
+            return
+        if not os.path.isdir(params["dossier_sortie"]):
+            messagebox.showerror("Erreur", "Le dossier de sortie n'existe pas.")
+            return
+        try:
+            int(params["n_points_interpolation"]), int(params["n_ticks_yticks"]), float(params["seuil_distance_couleur"])
+            int(params["taille_consensus"])
+            [int(params[c]) for c in ("colonne_X", "colonne_Y", "colonne_R", "colonne_G", "colonne_B")]
+        except ValueError:
+            messagebox.showerror("Erreur", "Les paramètres numériques et les indices des colonnes doivent être des nombres.")
+            return
+
+        ref_palette = load_reference_palette(params["fichier_palette"]) if palette is None else palette
+        self.taches.soumettre("Conversion", params["fichier_sortie_csv"], convert_file,
+                              (extraction, ref_palette, params), ETAPES_CONVERSION)
 
     def check_for_updates(self):
         try:
-            df_sortie = self.queue.get_nowait()
-            # Sauvegarder la figure une fois que l'interpolation est terminée
-            plot_scatter(df_sortie, self.nom_X.get(), self.nom_Y.get(), self.nom_Z.get(), self.interp_palette, os.path.join(self.dossier_sortie.get(), self.fichier_sortie_image_csv.get()  + ".png"))
+            message = self.queue.get_nowait()
+            self.is_processing = False
+            if message[0] == "erreur":
+                self.profilage.ecrire("erreur")
+                messagebox.showerror("Erreur", f"Erreur lors de la conversion : {message[1]}")
+                return
+            df_sortie = message[1]
+            if self.derniere_correspondance is not None:
+                # Nombre exact de points écrits, consensus de voisinage compris
+                self.show_retained_count(len(df_sortie), len(self.derniere_correspondance))
+            # Tracer les figures dans un processus séparé une fois que l'interpolation est terminée
+            self.figures_queue = multiprocessing.Queue()
+            self.figures_worker = multiprocessing.Process(
+                target=render_figures,
+                args=(self.interp_palette, self.n_ticks,
+                      os.path.join(self.dossier_sortie.get(), self.fichier_sortie_image_palette.get() + ".png"),
+                      df_sortie, self.nom_X.get(), self.nom_Y.get(), self.nom_Z.get(),
+                      os.path.join(self.dossier_sortie.get(), self.fichier_sortie_image_csv.get() + ".png"),
+                      self.rendu_nuage.get(), self.figures_queue),
+                daemon=True
+            )
+            self.profilage.debut("Tracé des figures (processus séparé)")
+            self.figures_worker.start()
+            self.window.after(1000, self.check_for_figures)
         except queue.Empty:
             # Pas encore de mise à jour, vérifier à nouveau
             self.window.after(1000, self.check_for_updates)
 
+    def check_for_figures(self):
+        """Attend la fin du tracé des figures et prévient l'utilisateur."""
+        try:
+            message = self.figures_queue.get_nowait()
+        except queue.Empty:
+            if self.figures_worker.is_alive():
+                self.window.after(1000, self.check_for_figures)
+            else:
+                self.profilage.ecrire("erreur")
+                messagebox.showerror("Erreur", "Le processus de tracé des figures s'est arrêté de manière inattendue.")
+            return
+
+        self.figures_worker.join()
+        self.profilage.ecrire(message[0])
+        if message[0] == "termine":
+            messagebox.showinfo("Figures", "Figures sauvegardées :\n" + "\n".join(message[1]))
+        else:
+            messagebox.showerror("Erreur", f"Erreur lors du tracé des figures : {message[1]}")
+
     def process(self):
         if self.is_processing:
             return  # Ne pas démarrer un traitement si déjà en cours
 
+        # Données de la session si demandé
+        df_session = palette_session = None
+        if self.utiliser_session.get():
+            df_session = self.session.get(EXTRACTION)
+            palette_session = self.session.get(PALETTE)
+            if df_session is None:
+                messagebox.showerror("Erreur", "Aucune extraction dans la session.")
+                return
+
         # Vérification des fichiers
-        if not self.fichier_extraction.get() or not os.path.exists(self.fichier_extraction.get()):
+        if df_session is None and (not self.fichier_extraction.get() or not os.path.exists(self.fichier_extraction.get())):
             messagebox.showerror("Erreur", "Le fichier d'extraction n'existe pas.")
             return
-        if not self.fichier_palette.get() or not os.path.exists(self.fichier_palette.get()):
+        if palette_session is None and (not self.fichier_palette.get() or not os.path.exists(self.fichier_palette.get())):
             messagebox.showerror("Erreur", "Le fichier de palette n'existe pas.")
             return
 
@@ -562,9 +1227,30 @@ class ConversionWindow:
             messagebox.showerror("Erreur", "Seuil du filtre des couleurs hors de la palette doit être un float positif.")
             return
 
+        try:
+            parametres = self.output_parameters()
+        except ValueError:
+            messagebox.showerror("Erreur", "La taille du voisinage du consensus doit être un entier positif.")
+            return
+
+        # Mesures par étape, si le profilage est activé
+        self.profilage = Profilage("conversion")
+
+        # Seul le seuil ou les noms ont changé : ré-appliquer le consensus, le seuil et l'écriture du CSV sur le
+        # dernier résultat, dans le thread de calcul comme une conversion complète
+        signature = self.input_signature()
+        if self.derniere_correspondance is not None and signature == self.derniere_signature:
+            self.n_ticks = n_ticks_yticks
+            self.is_processing = True
+            threading.Thread(target=self.finish_conversion, args=(self.derniere_correspondance, parametres)).start()
+            self.window.after(1000, self.check_for_updates)
+            return
+
         # Vérification des indices des colonnes
         try:
-            df = pd.read_csv(fichier_extraction)  # Chargement du fichier d'extraction
+            self.profilage.debut("Lecture du CSV")
+            df = pd.read_csv(fichier_extraction) if df_session is None else df_session  # Chargement du fichier d'extraction
+            self.profilage.lignes(len(df))
             col_X, col_Y, col_R, col_G, col_B = self.colonne_X.get(), self.colonne_Y.get(), self.colonne_R.get(), self.colonne_G.get(), self.colonne_B.get()
             try:
                 col_X = int(col_X)
@@ -586,10 +1272,12 @@ class ConversionWindow:
             return
 
         self.is_processing = True
+        self.derniere_correspondance = None
+        self.derniere_signature = signature
 
-        # Charger les fichiers
-        df = pd.read_csv(fichier_extraction)  # Chargement du fichier d'extraction
-        ref_palette = load_reference_palette(fichier_palette)  # Chargement de la palette de référence
+        # Charger la palette de référence
+        ref_palette = load_reference_palette(fichier_palette) if palette_session is None else palette_session
+        self.valeurs_classes = ref_palette['value'].values
 
         progress_window = Toplevel(self.window)
         progress_window.title("Progression de l'interpolation")
@@ -612,10 +1300,14 @@ class ConversionWindow:
         progress_window.protocol("WM_DELETE_WINDOW", on_progress_window_close)
 
         # === Créer une palette interpolée avec le nombre de points spécifié ===
-        self.interp_palette = interpolate_palette(ref_palette, n_points_interpolation)
+        self.profilage.debut("Interpolation de la palette")
+        self.interp_palette = get_interpolated_palette(ref_palette, n_points_interpolation)
+        self.profilage.fin()
+        if self.session is not None:
+            self.session.put(PALETTE_INTERPOLEE, self.interp_palette, f"{n_points_interpolation} points")
 
-        # === Tracer la palette interpolée verticalement ===
-        plot_palette_vertical(self.interp_palette, os.path.join(self.dossier_sortie.get(), self.fichier_sortie_image_palette.get() + ".png"), n_ticks_yticks)
+        # La palette interpolée est tracée avec le nuage de points, dans le processus des figures
+        self.n_ticks = n_ticks_yticks
 
         # === Filtrer le tableau en supprimant les lignes à 0 ou NaN ===
         filtre = False
@@ -630,7 +1322,8 @@ class ConversionWindow:
             df_filtre= df
 
         # === Associer la valeur interpolée aux couleurs ===
-        self.start_thread(df_filtre)
+        self.start_thread(df_filtre, parametres)
+        self.window.after(1000, self.check_for_updates)
 
 
 
@@ -5,12 +5,17 @@ Dernière modification le 26/03/2025
 Ce script contient les fonctions pour la fenêtre d'extraction des couleurs d'une image.
 """
 
+import os
 import math
+import queue
+import multiprocessing
 from tkinter import *
 from tkinter import filedialog, messagebox
+from tkinter.ttk import Progressbar
 from PIL import Image, ImageTk
 import json
-import csv
+import numpy as np
+from interface_session import EXTRACTION, GRILLE
 
 # === Paramètres par défaut ===
 DEFAULT_VALUES = {
@@ -29,6 +34,16 @@ DEFAULT_VALUES = {
     "Coordonnées Nord-Est (°)": "",
 }
 
+# Paramètres propres à l'export du Tif des valeurs (hors paramètres d'extraction)
+VALEURS_TIF_DEFAUT = {
+    "EPSG Sortie": 4326,
+    "Points Interpolation Palette": 1000,
+    "Seuil Distance Couleur": 80,
+}
+
+# Taille maximale de l'image affichée (et extraite)
+TAILLE_AFFICHAGE = (800, 600)
+
 BG_1 = "#A6E3E9"
 BG_2 = "#71C9CE"
 FG = "#112D4E"
@@ -120,8 +135,182 @@ def bilinear_geo(x, y, width, height, nw, ne, sw, se):
     return lon, lat
 
 
+def open_image(file_path):
+    """Ouvre une image réduite à la taille d'affichage : les paramètres en pixels sont relatifs à cette taille."""
+    image = Image.open(file_path)
+    image.thumbnail(TAILLE_AFFICHAGE)
+    return image
+
+def get_pixel_affine(width, height, params):
+    """
+    Calcule la transformation affine (a, b, c, d, e, f) des pixels vers les coordonnées réelles :
+    X = a*x + b*y + c, Y = d*x + e*y + f, avec y descendant comme dans l'image.
+    Utilise les 4 coins (ajustement par moindres carrés), 2 coins opposés ou l'offset/échelle.
+    params est le dictionnaire des paramètres d'extraction (mêmes clés que DEFAULT_VALUES).
+    """
+    nw = parse_coord(str(params["Coordonnées Nord-Ouest (°)"]))
+    ne = parse_coord(str(params["Coordonnées Nord-Est (°)"]))
+    sw = parse_coord(str(params["Coordonnées Sud-Ouest (°)"]))
+    se = parse_coord(str(params["Coordonnées Sud-Est (°)"]))
+
+    if nw and ne and sw and se:
+        # Affine la plus proche de l'interpolation bilinéaire entre les 4 coins
+        src = np.array([[0, 0, 1], [width - 1, 0, 1], [0, height - 1, 1], [width - 1, height - 1, 1]], dtype=float)
+        dst = np.array([nw, ne, sw, se], dtype=float)
+        (a, d), (b, e), (c, f) = np.linalg.lstsq(src, dst, rcond=None)[0]
+        return a, b, c, d, e, f
+
+    if nw and se:
+        lon_min, lat_min, lon_max, lat_max = nw[0], se[1], se[0], nw[1]
+    elif ne and sw:
+        lon_min, lat_min, lon_max, lat_max = sw[0], sw[1], ne[0], ne[1]
+    else:
+        pixels_x = float(params["Longueur Pixels X"])
+        pixels_y = float(params["Longueur Pixels Y"])
+        if pixels_x == 0 or pixels_y == 0:
+            raise ValueError("Longueur pixels ne peut pas être nulle.")
+        echelle_x = float(params["Longueur Réelle X"]) / pixels_x
+        echelle_y = float(params["Longueur Réelle Y"]) / pixels_y
+        offset_x = float(params["Valeur Offset X"]) - float(params["Pixel Offset X"]) * echelle_x
+        offset_y = float(params["Valeur Offset Y"]) + (height - float(params["Pixel Offset Y"])) * echelle_y
+        return echelle_x, 0.0, offset_x, 0.0, -echelle_y, offset_y
+
+    return ((lon_max - lon_min) / (width - 1), 0.0, lon_min,
+            0.0, -(lat_max - lat_min) / (height - 1), lat_max)
+
+def extract_colors(image, params, image_path=None):
+    """
+    Extrait les couleurs de l'image avec leurs coordonnées (colonnes X, Y, R, G, B),
+    dans le même ordre que le parcours colonne par colonne de l'image.
+    params est le dictionnaire des paramètres d'extraction (mêmes clés que DEFAULT_VALUES).
+    """
+    import pandas as pd  # Import à la demande pour ne pas ralentir l'ouverture de la fenêtre
+    from tool_cache import cache
+
+    # Seules les clés d'extraction comptent (un fichier de paramètres contient aussi celles du Tif des valeurs)
+    params = {key: params.get(key, valeur) for key, valeur in DEFAULT_VALUES.items()}
+    pas = str(params["Pas Echantillonage"])
+    if not pas.isdigit() or int(pas) <= 0:
+        raise ValueError("Le pas d'échantillonnage doit être un entier positif.")
+    pas = int(pas)
+
+    # Extraction déjà calculée pour cette image et ces paramètres ?
+    cle = cache.cle("extraction", image_path, image.size, params)
+    df = cache.get(cle) if image_path else None
+    if df is not None:
+        return df
+
+    # ---------------------------------------------------
+    # Lecture des coordonnées GPS (2 ou 4 coins)
+    # ---------------------------------------------------
+    nw = parse_coord(str(params["Coordonnées Nord-Ouest (°)"])) # Inversion car l'axe y est descendant
+    ne = parse_coord(str(params["Coordonnées Nord-Est (°)"]))
+    sw = parse_coord(str(params["Coordonnées Sud-Ouest (°)"]))
+    se = parse_coord(str(params["Coordonnées Sud-Est (°)"]))
+
+    width = image.width
+    height = image.height
+
+    rgb = np.asarray(image.convert("RGB"))[::pas, ::pas]
+    x, y = np.meshgrid(np.arange(0, width, pas), np.arange(0, height, pas), indexing="ij")
+    x, y = x.ravel(), y.ravel()
+    couleurs = rgb.transpose(1, 0, 2).reshape(-1, 3)
+
+    # Mode HELMERT si 4 coins donnés
+    if nw and ne and sw and se:
+        real_x, real_y = bilinear_geo(x, y, width, height, nw, ne, sw, se)
+
+    # Mode INTERPOLATION si seulement 2 coins donnés
+    elif (nw and se) or (ne and sw):
+        if nw and se:
+            lon_min, lat_min, lon_max, lat_max = nw[0], se[1], se[0], nw[1]
+        else:
+            lon_min, lat_min, lon_max, lat_max = sw[0], sw[1], ne[0], ne[1]
+        real_x = lon_min + x / (width - 1) * (lon_max - lon_min)
+        real_y = lat_max - y / (height - 1) * (lat_max - lat_min)
+
+    # Conversion normale coords réelles
+    else:
+        a, b, c, d, e, f = get_pixel_affine(width, height, params)
+        real_x = a * x + b * y + c
+        real_y = d * x + e * y + f
+
+    df = pd.DataFrame({'X': real_x, 'Y': real_y,
+                       'R': couleurs[:, 0], 'G': couleurs[:, 1], 'B': couleurs[:, 2]})
+    if image_path:
+        cache.put(cle, df)
+    return df
+
+
+ETAPES_EXTRACTION = ["Ouverture de l'image", "Extraction des couleurs", "Écriture du CSV"]
+
+def export_colors(image_path, params, output_file, progress_queue):
+    """
+    Extraction d'une image vers un CSV, exécutée dans un processus séparé par la file des traitements.
+    L'avancement est envoyé dans progress_queue : ("etape", indice), ("points", nombre), puis ("termine", chemin)
+    ou ("erreur", message).
+    """
+    from tool_profilage import profiler_queue
+
+    progress_queue = profiler_queue(progress_queue, "extraction", ETAPES_EXTRACTION)
+    try:
+        progress_queue.put(("etape", 0))
+        image = open_image(image_path)
+        pas = int(params["Pas Echantillonage"])
+        progress_queue.put(("points", math.ceil(image.width / pas) * math.ceil(image.height / pas)))
+        progress_queue.put(("etape", 1))
+        df = extract_colors(image, params, image_path)
+        progress_queue.put(("etape", 2))
+        df.to_csv(output_file, index=False)
+        progress_queue.put(("termine", output_file))
+    except Exception as e:
+        progress_queue.put(("erreur", str(e)))
+
+
+ETAPES_TIF_VALEURS = ["Ouverture de l'image", "Interpolation de la palette", "Correspondance des couleurs",
+                      "Écriture du Tif"]
+
+def export_values_tif(image_path, params, params_tif, palette_path, output_file, progress_queue):
+    """
+    Convertit directement les pixels de l'image en valeurs et les écrit dans un Tif aligné sur l'image, dans un
+    processus séparé. L'avancement est envoyé dans progress_queue : ("etape", indice), ("points", nombre), puis
+    ("termine", grille) avec grille = {"valeurs", "affine", "pas", "epsg"} pour la session, ou ("erreur", message).
+    """
+    # Import à la demande : pandas, scipy et rasterio ne sont chargés que pour cet export
+    from interface_conversion import load_reference_palette, get_interpolated_palette, match_colors_to_values
+    from interface_tif import write_value_tif
+    from tool_profilage import profiler_queue
+
+    progress_queue = profiler_queue(progress_queue, "tif_valeurs", ETAPES_TIF_VALEURS)
+    try:
+        progress_queue.put(("etape", 0))
+        image = open_image(image_path)
+        pas = int(params["Pas Echantillonage"])
+        epsg = int(params_tif["EPSG Sortie"])
+        affine = get_pixel_affine(image.width, image.height, params)
+        # Le pas devient un facteur de décimation de la grille de pixels
+        rgb = np.asarray(image.convert("RGB"))[::pas, ::pas]
+        progress_queue.put(("points", rgb.shape[0] * rgb.shape[1]))
+
+        progress_queue.put(("etape", 1))
+        palette = get_interpolated_palette(load_reference_palette(palette_path),
+                                           int(params_tif["Points Interpolation Palette"]))
+
+        progress_queue.put(("etape", 2))
+        values, distances = match_colors_to_values(rgb.reshape(-1, 3), palette)
+        values = np.where(distances <= float(params_tif["Seuil Distance Couleur"]), values, np.nan).reshape(rgb.shape[:2])
+
+        progress_queue.put(("etape", 3))
+        write_value_tif(values, affine, pas, epsg, output_file)
+        progress_queue.put(("termine", {"valeurs": values, "affine": affine, "pas": pas, "epsg": epsg}))
+    except Exception as e:
+        progress_queue.put(("erreur", str(e)))
+
+
 class ExtractionWindow:
-    def __init__(self, root):
+    def __init__(self, root, session=None, taches=None):
+        self.session = session
+        self.taches = taches
         self.window = Toplevel(root)
         self.window.title("Extraction des couleurs")
         self.window.config(bg=BG_1)
@@ -137,6 +326,7 @@ class ExtractionWindow:
         self.previous_click = None
         self.is_saved = False
         self.ask_open = False
+        self.worker = None
         self.window.protocol("WM_DELETE_WINDOW", self.on_close)
 
         self.colors = []  # Liste des couleurs ajoutées depuis la palette
@@ -154,6 +344,7 @@ class ExtractionWindow:
         file_menu = Menu(self.menu, tearoff=0)
         file_menu.add_command(label="Ouvrir Image", command=self.open_image, accelerator="Ctrl+O")
         file_menu.add_command(label="Exporter CSV", command=self.export_csv, accelerator="Ctrl+E")
+        file_menu.add_command(label="Exporter Tif des valeurs", command=self.export_value_tif)
         file_menu.add_separator()
         file_menu.add_command(label="Charger Paramètres", command=self.load_parameters, accelerator="Ctrl+L")
         file_menu.add_command(label="Sauvegarder Paramètres", command=self.save_parameters, accelerator="Ctrl+S")
@@ -163,11 +354,11 @@ class ExtractionWindow:
         self.menu.add_cascade(label="Extraction des couleurs", menu=file_menu)
 
         # Ajout des raccourcis clavier
-        self.window.bind_all("<Control-o>", lambda event: self.open_image())
-        self.window.bind_all("<Control-e>", lambda event: self.export_csv())
-        self.window.bind_all("<Control-s>", lambda event: self.save_parameters())
-        self.window.bind_all("<Control-l>", lambda event: self.load_parameters())
-        self.window.bind_all("<Control-q>", lambda event: self.on_close())
+        self.window.bind("<Control-o>", lambda event: self.open_image())
+        self.window.bind("<Control-e>", lambda event: self.export_csv())
+        self.window.bind("<Control-s>", lambda event: self.save_parameters())
+        self.window.bind("<Control-l>", lambda event: self.load_parameters())
+        self.window.bind("<Control-q>", lambda event: self.on_close())
 
         aide_menu = Menu(self.menu, tearoff=0)
         aide_menu.add_command(label="Crédits", command=show_credits)
@@ -184,8 +375,11 @@ class ExtractionWindow:
         self.frame_entries.grid(row=1, column=1, sticky="nsew", padx=10, pady=10)
 
         self.entries = {}
+        self.entries_tif = {}
         for i, (nom, valeur) in enumerate(DEFAULT_VALUES.items()):
             self.create_entry(nom, valeur, i)
+        for i, (nom, valeur) in enumerate(VALEURS_TIF_DEFAUT.items(), start=len(DEFAULT_VALUES)):
+            self.create_entry(nom, valeur, i, self.entries_tif)
 
         # Canvas pour l'affichage de l'image
         frame_canvas = Frame(self.window, bg=BG_1)
@@ -211,15 +405,26 @@ class ExtractionWindow:
                relief="solid", bg=BG_1, highlightbackground=BG_1, highlightcolor=FG).grid(row=0, column=1, padx=5, pady=5)
 
         Button(frame_buttons, text="Extraire les couleurs", command=self.export_csv, width=20, height=2,
-               relief="solid", bg=BG_1, highlightbackground=BG_1, highlightcolor=FG).grid(row=1, column=0, columnspan=2, pady=10)
+               relief="solid", bg=BG_1, highlightbackground=BG_1, highlightcolor=FG).grid(row=1, column=0, pady=10)
+        Button(frame_buttons, text="Exporter un Tif des valeurs", command=self.export_value_tif, width=20, height=2,
+               relief="solid", bg=BG_1, highlightbackground=BG_1, highlightcolor=FG).grid(row=1, column=1, pady=10)
+        if self.session is not None:
+            Button(frame_buttons, text="Envoyer vers la session", command=self.send_to_session, width=20, height=2,
+                   relief="solid", bg=BG_1, highlightbackground=BG_1, highlightcolor=FG).grid(row=2, column=0, pady=10)
+        if self.taches is not None:
+            Button(frame_buttons, text="Mettre en file l'extraction", command=self.queue_export, width=20, height=2,
+                   relief="solid", bg=BG_1, highlightbackground=BG_1, highlightcolor=FG).grid(row=2, column=1, pady=10)
 
         # Label pour afficher les coordonnées
         self.coord_label = Label(self.window, text="Coordonnées : X=0.00, Y=0.00", font=("Arial", 15, "italic"),
                                  bg="lightyellow", relief="solid", bd=1)
         self.coord_label.grid(row=3, column=1)
 
-    def create_entry(self, nom, default_value, n):
-        """Crée une entrée avec un label et un bouton de sélection si applicable."""
+    def create_entry(self, nom, default_value, n, entries=None):
+        """
+        Crée une entrée avec un label et un bouton de sélection si applicable.
+        L'entrée est ajoutée à entries (par défaut, les paramètres d'extraction self.entries).
+        """
 
         # Détermine colonne et rangée en fonction de n
         col = 0 if n < 8 else 2  # 1ère colonne pour n<10, 2ème colonne pour n>=10
@@ -235,7 +440,7 @@ class ExtractionWindow:
         entry.insert(0, str(default_value))
         entry.grid(row=row + 1, column=col, padx=5, pady=2)
 
-        self.entries[nom] = entry
+        (self.entries if entries is None else entries)[nom] = entry
 
         # ---- Bouton ----
         btn_col = col + 1  # Le bouton va dans la colonne juste à droite
@@ -259,9 +464,7 @@ class ExtractionWindow:
         file_path = filedialog.askopenfilename(filetypes=[("PNG", "*.png"), ("JPG", "*.jpg"), ("JPEG", "*.jpeg")])
         if file_path:
             self.image_path = file_path
-            self.image = Image.open(file_path)
-            max_size = (800, 600)
-            self.image.thumbnail(max_size)
+            self.image = open_image(file_path)
             self.tk_image = ImageTk.PhotoImage(self.image)
             self.canvas.create_image(0, 0, anchor=NW, image=self.tk_image)
 
@@ -354,7 +557,7 @@ class ExtractionWindow:
 
     def save_parameters(self):
         """Sauvegarde les paramètres dans un fichier JSON."""
-        params = {key: entry.get() for key, entry in self.entries.items()}
+        params = self.get_parameters()
         file_path = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("JSON", "*.json")])
         if not file_path:
             return
@@ -366,6 +569,15 @@ class ExtractionWindow:
         except Exception as e:
             messagebox.showerror("Erreur", f"Erreur lors de la sauvegarde des paramètres : {e}")
 
+    def set_parameters(self, params):
+        """Applique un dictionnaire de paramètres (fichier JSON ou projet) aux champs de la fenêtre."""
+        # Paramètres d'extraction et du Tif des valeurs
+        for key, value in params.items():
+            entries = self.entries if key in self.entries else self.entries_tif if key in self.entries_tif else None
+            if entries is not None:
+                entries[key].delete(0, END)
+                entries[key].insert(0, value)
+
     def load_parameters(self):
         """Charge les paramètres depuis un fichier JSON."""
         file_path = filedialog.askopenfilename(filetypes=[("JSON", "*.json")])
@@ -375,14 +587,26 @@ class ExtractionWindow:
         try:
             with open(file_path, "r") as f:
                 params = json.load(f)
-                for key, value in params.items():
-                    if key in self.entries:
-                        self.entries[key].delete(0, END)
-                        self.entries[key].insert(0, value)
+            self.set_parameters(params)
             messagebox.showinfo("Chargement", "Paramètres chargés avec succès.")
         except Exception as e:
             messagebox.showerror("Erreur", f"Erreur lors du chargement des paramètres : {e}")
 
+    def get_parameters(self):
+        """Paramètres enregistrés (fichier JSON ou projet) : ceux de l'extraction et du Tif des valeurs."""
+        return {**self.get_extraction_parameters(), **self.get_value_tif_parameters()}
+
+    def get_extraction_parameters(self):
+        return {key: entry.get() for key, entry in self.entries.items()}
+
+    def get_value_tif_parameters(self):
+        """Paramètres de l'export du Tif des valeurs (projection, palette interpolée, seuil)."""
+        return {key: entry.get() for key, entry in self.entries_tif.items()}
+
+    def extract_dataframe(self):
+        """Extrait les couleurs de l'image affichée avec leurs coordonnées (colonnes X, Y, R, G, B)."""
+        return extract_colors(self.image, self.get_extraction_parameters(), self.image_path)
+
     def export_csv(self):
         if self.image is None:
             response = messagebox.askyesno("Erreur", "Aucune image chargée. Voulez-vous en charger une maintenant ?")
@@ -394,79 +618,17 @@ class ExtractionWindow:
         if not file_path:
             return
 
+        from tool_profilage import Profilage
+
+        profilage = Profilage("extraction")
         try:
-            pixels = self.image.load()
-            pas = self.entries["Pas Echantillonage"].get()
-
-            if not pas.isdigit() or int(pas) <= 0:
-                messagebox.showerror("Erreur", "Le pas d'échantillonnage doit être un entier positif.")
-                return
-            pas = int(pas)
-
-            # ---------------------------------------------------
-            # Lecture des coordonnées GPS (2 ou 4 coins)
-            # ---------------------------------------------------
-            nw = parse_coord(self.entries["Coordonnées Nord-Ouest (°)"].get()) # Inversion car l'axe y est descendant
-            ne = parse_coord(self.entries["Coordonnées Nord-Est (°)"].get())
-            sw = parse_coord(self.entries["Coordonnées Sud-Ouest (°)"].get())
-            se = parse_coord(self.entries["Coordonnées Sud-Est (°)"].get())
-
-            width = self.image.width
-            height = self.image.height
-
-            # Initialisation
-            use_four_points = False
-            use_bilinear = False
-            lon_min = lon_max = lat_min = lat_max = None
-
-            # Mode HELMERT si 4 coins donnés
-            if nw and ne and sw and se:
-                use_four_points = True
-
-            # Mode INTERPOLATION si seulement 2 coins donnés
-            elif nw and se:
-                use_bilinear = True
-                lon_min = nw[0]
-                lat_min = se[1]
-                lon_max = se[0]
-                lat_max = nw[1]
-
-            elif ne and sw:
-                use_bilinear = True
-                lon_min = sw[0]
-                lat_min = sw[1]
-                lon_max = ne[0]
-                lat_max = ne[1]
-
-            # ---------------------------------------------------
-            #   ÉCRITURE CSV
-            # ---------------------------------------------------
-            with open(file_path, mode='w', newline='') as file:
-                writer = csv.writer(file)
-                writer.writerow(['X', 'Y', 'R', 'G', 'B'])
-                for x in range(0, width, pas):
-                    for y in range(0, height, pas):
-                        color = pixels[x, y]
-
-                        # use_four_points
-                        if use_four_points:
-                            lon, lat = bilinear_geo(x, y, self.image.width, self.image.height, nw, ne, sw, se)
-                            writer.writerow([lon, lat, color[0], color[1], color[2]])
-
-                        # INTERPOLATION
-                        elif use_bilinear:
-                            nx = x / (width - 1)
-                            ny = y / (height - 1)
-                            lon = lon_min + nx * (lon_max - lon_min)
-                            lat = lat_max - ny * (lat_max - lat_min)
-                            writer.writerow([lon, lat, color[0], color[1], color[2]])
-
-                        # Conversion normale coords réelles
-                        else:
-                            real_x, real_y = self.convert_coords(x, height - y)
-                            if real_x is None or real_y is None:
-                                return
-                            writer.writerow([real_x, real_y, color[0], color[1], color[2]])
+            with profilage.etape("Extraction des couleurs"):
+                df = self.extract_dataframe()
+            with profilage.etape("Écriture du CSV", len(df)):
+                df.to_csv(file_path, index=False)
+            profilage.ecrire()
+            if self.session is not None:
+                self.session.put(EXTRACTION, df, file_path)
 
             self.is_saved = True
             messagebox.showinfo("Exportation", f"Données exportées vers {file_path}")
@@ -474,6 +636,127 @@ class ExtractionWindow:
         except Exception as e:
             messagebox.showerror("Erreur", f"Une erreur est survenue lors de l'exportation : {e}")
 
+    def queue_export(self):
+        """Ajoute l'extraction de l'image vers un CSV à la file des traitements."""
+        if self.image is None:
+            messagebox.showerror("Erreur", "Aucune image chargée.")
+            return
+        params = self.get_extraction_parameters()
+        if not str(params["Pas Echantillonage"]).isdigit() or int(params["Pas Echantillonage"]) <= 0:
+            messagebox.showerror("Erreur", "Le pas d'échantillonnage doit être un entier positif.")
+            return
+        file_path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("Fichiers CSV", "*.csv")])
+        if not file_path:
+            return
+        self.taches.soumettre("Extraction", os.path.basename(self.image_path), export_colors,
+                              (self.image_path, params, file_path), ETAPES_EXTRACTION)
+        self.is_saved = True
+
+    def send_to_session(self):
+        """Garde l'extraction en mémoire pour la fenêtre de conversion, sans écrire de fichier."""
+        if self.image is None:
+            messagebox.showerror("Erreur", "Aucune image chargée.")
+            return
+        try:
+            df = self.extract_dataframe()
+            self.session.put(EXTRACTION, df, self.image_path)
+            messagebox.showinfo("Session", f"{len(df)} points envoyés vers la session "
+                                           f"({self.session.taille_totale() / 1e6:.1f} Mo en mémoire).")
+        except Exception as e:
+            messagebox.showerror("Erreur", f"Une erreur est survenue lors de l'extraction : {e}")
+
+    def get_pixel_affine(self):
+        return get_pixel_affine(self.image.width, self.image.height, self.get_extraction_parameters())
+
+    def export_value_tif(self):
+        """Convertit directement les pixels de l'image en valeurs et les écrit dans un Tif aligné sur l'image."""
+        if self.worker is not None:
+            return  # Ne pas démarrer un export si déjà en cours
+
+        if self.image is None:
+            response = messagebox.askyesno("Erreur", "Aucune image chargée. Voulez-vous en charger une maintenant ?")
+            if response:
+                self.open_image()
+            return
+
+        pas = self.entries["Pas Echantillonage"].get()
+        if not pas.isdigit() or int(pas) <= 0:
+            messagebox.showerror("Erreur", "Le pas d'échantillonnage doit être un entier positif.")
+            return
+
+        params = self.get_extraction_parameters()
+        params_tif = self.get_value_tif_parameters()
+        try:
+            self.get_pixel_affine()
+            int(params_tif["EPSG Sortie"]), int(params_tif["Points Interpolation Palette"])
+            float(params_tif["Seuil Distance Couleur"])
+        except ValueError as e:
+            messagebox.showerror("Erreur", f"Veuillez entrer des valeurs numériques valides dans les champs : {e}")
+            return
+
+        palette_path = filedialog.askopenfilename(title="Sélectionner la palette", filetypes=[("Text files", "*.txt")])
+        if not palette_path:
+            return
+        file_path = filedialog.asksaveasfilename(defaultextension=".tiff", filetypes=[("Fichiers tif", "*.tiff")])
+        if not file_path:
+            return
+
+        self.progress_window = Toplevel(self.window)
+        self.progress_window.title("Export du Tif des valeurs")
+        self.progress = Progressbar(self.progress_window, orient="horizontal", length=300, mode="determinate")
+        self.progress.grid(row=0, column=0, padx=10)
+        self.progress_label = Label(self.progress_window, text="Démarrage...", font=("Arial", 10))
+        self.progress_label.grid(row=1, column=0, padx=10, pady=10)
+        self.progress_window.protocol("WM_DELETE_WINDOW", lambda: None)  # Fermée à la fin de l'export
+
+        # Lancer le calcul dans un processus séparé
+        self.progress_queue = multiprocessing.Queue()
+        self.worker = multiprocessing.Process(
+            target=export_values_tif,
+            args=(self.image_path, params, params_tif, palette_path, file_path),
+            kwargs={"progress_queue": self.progress_queue},
+            daemon=True
+        )
+        self.fichier_tif_valeurs = file_path
+        self.worker.start()
+        self.window.after(200, self.check_value_tif)
+
+    def check_value_tif(self):
+        """Lit l'avancement envoyé par le processus d'export du Tif des valeurs."""
+        try:
+            while True:
+                message = self.progress_queue.get_nowait()
+                if message[0] == "etape":
+                    indice = message[1]
+                    self.progress['value'] = indice / len(ETAPES_TIF_VALEURS) * 100
+                    self.progress_label.config(text=f"Étape {indice + 1}/{len(ETAPES_TIF_VALEURS)} : "
+                                                    f"{ETAPES_TIF_VALEURS[indice]}")
+                elif message[0] == "termine":
+                    self.end_value_tif()
+                    if self.session is not None:
+                        self.session.put(GRILLE, message[1], self.fichier_tif_valeurs)
+                    self.is_saved = True
+                    messagebox.showinfo("Exportation", f"Tif des valeurs exporté vers {self.fichier_tif_valeurs}")
+                    return
+                elif message[0] == "erreur":
+                    self.end_value_tif()
+                    messagebox.showerror("Erreur", f"Une erreur est survenue lors de l'exportation : {message[1]}")
+                    return
+        except queue.Empty:
+            pass
+
+        if not self.worker.is_alive() and self.progress_queue.empty():
+            self.end_value_tif()
+            messagebox.showerror("Erreur", "Le processus d'export s'est arrêté de manière inattendue.")
+            return
+        self.window.after(200, self.check_value_tif)
+
+    def end_value_tif(self):
+        self.worker.join()
+        self.worker = None
+        if self.progress_window.winfo_exists():
+            self.progress_window.destroy()
+
     def on_close(self):
         """Vérifie si la palette a été sauvegardée avant de fermer la fenêtre."""
         if not self.is_saved and self.image:
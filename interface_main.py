@@ -5,12 +5,22 @@ Dernière modification le 28/03/2025
 Ce script contient les fonctions pour le lancement de l'application Conversion RGB
 """
 
+import time
+DEBUT_LANCEMENT = time.perf_counter()
+
+import sys
+import importlib
+import threading
+import multiprocessing
 from tkinter import *
-from tkinter import messagebox
-from interface_palette import ColorPaletteWindow  # Importer la fenêtre de palette
-from interface_extraction import ExtractionWindow  # Importer la fenêtre d'extraction
-from interface_conversion import ConversionWindow  # Importer la fenêtre de conversion
-from interface_tif import TifWindow
+from tkinter import filedialog, messagebox
+from interface_session import SessionDonnees, SessionWindow
+from interface_taches import FileTaches, TachesWindow
+
+# Les fenêtres (et pandas, matplotlib, scipy, rasterio, PIL) ne sont importées qu'à leur première ouverture
+# ou en arrière-plan une fois la fenêtre principale affichée
+MODULES_FENETRES = ["interface_palette", "interface_extraction", "interface_conversion", "interface_tif",
+                    "interface_association"]
 
 BG_1 = "#A6E3E9"
 BG_2 = "#71C9CE"
@@ -30,17 +40,58 @@ def show_credits():
         "© mars 2025, tous droits réservés."
     )
 
+def prewarm_modules():
+    """Importe les modules des fenêtres en arrière-plan pour que leur première ouverture soit immédiate."""
+    for module in MODULES_FENETRES:
+        importlib.import_module(module)
+
 class Main:
     def __init__(self):
         self.ui = Tk()
         self.ui.title("Outil : Conversion Couleur - Valeur")
         self.ui.config(bg=BG_1)
 
+        # Données partagées en mémoire entre les fenêtres
+        self.session = SessionDonnees()
+        # File des traitements soumis par les fenêtres
+        self.taches = FileTaches()
+        # Dernière fenêtre ouverte de chaque traitement et paramètres du projet ouvert, enregistrés dans le projet
+        self.fenetres = {}
+        self.parametres_fenetres = {}
+        # Mesures par étape des traitements (rapports dans le dossier de profilage)
+        self.profilage = BooleanVar(value=False)
+        self.cprofile = BooleanVar(value=False)
+
+        self.ui.protocol("WM_DELETE_WINDOW", self.on_quit)
         self.create_menu()
         self.create_buttons()
 
+        self.ui.after_idle(self.on_displayed)
         self.ui.mainloop()
 
+    def on_displayed(self):
+        """Appelée une fois la fenêtre principale affichée : mesure du démarrage et préchargement des modules."""
+        if "--mesure-demarrage" in sys.argv:
+            self.ui.update()
+            print(f"Fenêtre principale affichée en {time.perf_counter() - DEBUT_LANCEMENT:.3f} s")
+            self.ui.destroy()
+            return
+        threading.Thread(target=prewarm_modules, daemon=True).start()
+        self.update_taches()
+
+    def update_taches(self):
+        """Lit l'avancement des traitements de la file et lance les suivants."""
+        self.taches.update()
+        self.ui.after(500, self.update_taches)
+
+    def on_quit(self):
+        """Demande confirmation avant de quitter si des traitements sont en cours ou en attente."""
+        restants = len(self.taches.en_cours()) + len(self.taches.en_attente())
+        if restants and not messagebox.askyesno("Quitter", f"{restants} traitement(s) en cours ou en attente seront annulés. Quitter ?"):
+            return
+        self.taches.annuler_tout()
+        self.ui.destroy()
+
     def create_menu(self):
         """Crée la barre de menu."""
         self.menu = Menu(self.ui)
@@ -51,16 +102,34 @@ class Main:
         window_menu.add_command(label="Palette de Couleurs", command=self.open_palette_window, accelerator="Ctrl+P")
         window_menu.add_command(label="Conversion en Valeurs", command=self.open_conversion_window, accelerator="Ctrl+C")
         window_menu.add_command(label="Création d'un Tif", command=self.open_tif_window, accelerator="Ctrl+T")
+        window_menu.add_command(label="Association de valeurs", command=self.open_association_window, accelerator="Ctrl+A")
         window_menu.add_separator()
-        window_menu.add_command(label="Quitter", command=self.ui.destroy, accelerator="Ctrl+Q")
+        window_menu.add_command(label="Quitter", command=self.on_quit, accelerator="Ctrl+Q")
         self.menu.add_cascade(label="Fenêtre", menu=window_menu)
 
-        # Définir les raccourcis clavier
-        self.ui.bind_all("<Control-e>", lambda event: self.open_extraction_window())  # Ctrl+E pour Extraction
-        self.ui.bind_all("<Control-p>", lambda event: self.open_palette_window())     # Ctrl+P pour Palette
-        self.ui.bind_all("<Control-c>", lambda event: self.open_conversion_window())  # Ctrl+C pour Conversion
-        self.ui.bind_all("<Control-t>", lambda event: self.open_tif_window())  # Ctrl+C pour Conversion
-        self.ui.bind_all("<Control-q>", lambda event: self.ui.destroy())  # Ctrl+C pour Conversion
+        # Définir les raccourcis clavier (limités à la fenêtre principale : chaque fenêtre a les siens)
+        self.ui.bind("<Control-e>", lambda event: self.open_extraction_window())  # Ctrl+E pour Extraction
+        self.ui.bind("<Control-p>", lambda event: self.open_palette_window())     # Ctrl+P pour Palette
+        self.ui.bind("<Control-c>", lambda event: self.open_conversion_window())  # Ctrl+C pour Conversion
+        self.ui.bind("<Control-t>", lambda event: self.open_tif_window())  # Ctrl+T pour Tif
+        self.ui.bind("<Control-a>", lambda event: self.open_association_window())  # Ctrl+A pour Association
+        self.ui.bind("<Control-j>", lambda event: self.open_taches_window())  # Ctrl+J pour la file des traitements
+        self.ui.bind("<Control-q>", lambda event: self.on_quit())  # Ctrl+Q pour Quitter
+
+        taches_menu = Menu(self.menu, tearoff=0)
+        taches_menu.add_command(label="File des traitements", command=self.open_taches_window, accelerator="Ctrl+J")
+        taches_menu.add_separator()
+        taches_menu.add_checkbutton(label="Profilage des traitements", variable=self.profilage, command=self.toggle_profilage)
+        taches_menu.add_checkbutton(label="Profil cProfile détaillé", variable=self.cprofile, command=self.toggle_profilage)
+        self.menu.add_cascade(label="Traitements", menu=taches_menu)
+
+        session_menu = Menu(self.menu, tearoff=0)
+        session_menu.add_command(label="Données de la session", command=self.open_session_window)
+        session_menu.add_command(label="Vider la session", command=self.session.clear)
+        session_menu.add_separator()
+        session_menu.add_command(label="Ouvrir un projet", command=self.open_project)
+        session_menu.add_command(label="Sauvegarder le projet", command=self.save_project)
+        self.menu.add_cascade(label="Session", menu=session_menu)
 
         aide_menu = Menu(self.menu, tearoff=0)
         aide_menu.add_command(label="Crédits", command=show_credits)
@@ -82,20 +151,101 @@ class Main:
         button_conversion = Button(self.ui, text="Créer un TIF depuis le CSV", command=self.open_tif_window, width=20, height=2, relief="solid", bg=BG_1, highlightbackground=BG_1, highlightcolor=FG)
         button_conversion.grid(row=4, column=0, pady=10, padx=10, sticky="nswe")
 
+        button_association = Button(self.ui, text="Associer des valeurs à des points", command=self.open_association_window, width=20, height=2, relief="solid", bg=BG_1, highlightbackground=BG_1, highlightcolor=FG)
+        button_association.grid(row=5, column=0, pady=10, padx=10, sticky="nswe")
+
     def open_palette_window(self):
         """Ouvre la fenêtre de la palette de couleurs."""
-        ColorPaletteWindow(self.ui)
+        from interface_palette import ColorPaletteWindow
+        ColorPaletteWindow(self.ui, self.session)
 
     def open_extraction_window(self):
         """Ouvre la fenêtre d'extraction."""
-        ExtractionWindow(self.ui)
+        from interface_extraction import ExtractionWindow
+        self.register_window("extraction", ExtractionWindow(self.ui, self.session, self.taches))
 
     def open_conversion_window(self):
         """Ouvre la fenêtre de conversion."""
-        ConversionWindow(self.ui)
+        from interface_conversion import ConversionWindow
+        self.register_window("conversion", ConversionWindow(self.ui, self.session, self.taches))
 
     def open_tif_window(self):
-        TifWindow(self.ui)
+        from interface_tif import TifWindow
+        self.register_window("tif", TifWindow(self.ui, self.session, self.taches))
+
+    def open_association_window(self):
+        """Ouvre la fenêtre d'association de valeurs à des points."""
+        from interface_association import AssociationWindow
+        self.register_window("association", AssociationWindow(self.ui, self.session))
+
+    def register_window(self, nom, fenetre):
+        """Garde la fenêtre pour le projet et lui applique les paramètres du projet ouvert, s'il y en a."""
+        self.fenetres[nom] = fenetre
+        if nom in self.parametres_fenetres:
+            fenetre.set_parameters(self.parametres_fenetres[nom])
+
+    def window_parameters(self):
+        """Paramètres de chaque traitement : ceux des fenêtres ouvertes, sinon ceux du projet ouvert."""
+        parametres = dict(self.parametres_fenetres)
+        for nom, fenetre in self.fenetres.items():
+            if fenetre.window.winfo_exists():
+                parametres[nom] = fenetre.get_parameters()
+        return parametres
+
+    def save_project(self):
+        """Enregistre toutes les données de la session dans un seul fichier projet."""
+        from tool_projet import EXTENSION, sauvegarder_projet
+
+        parametres = self.window_parameters()
+        if not self.session.items() and not parametres:
+            messagebox.showerror("Erreur", "La session est vide et aucune fenêtre de traitement n'est ouverte.")
+            return
+        file_path = filedialog.asksaveasfilename(defaultextension=EXTENSION, filetypes=[("Projet Conversion RGB", "*" + EXTENSION)])
+        if not file_path:
+            return
+        try:
+            sauvegarder_projet(file_path, self.session.items(), {"sources": self.session.sources(), "fenetres": parametres})
+            messagebox.showinfo("Sauvegarde", "Projet sauvegardé avec succès.")
+        except Exception as e:
+            messagebox.showerror("Erreur", f"Erreur lors de la sauvegarde du projet : {e}")
+
+    def open_project(self):
+        """Charge un fichier projet dans la session (les tableaux sont projetés en mémoire, pas copiés)."""
+        from tool_projet import EXTENSION, Projet
+
+        file_path = filedialog.askopenfilename(filetypes=[("Projet Conversion RGB", "*" + EXTENSION)])
+        if not file_path:
+            return
+        try:
+            projet = Projet(file_path)
+            sources = projet.parametres.get("sources", {})
+            for nom in projet.noms():
+                self.session.put(nom, projet.charger(nom), sources.get(nom, file_path))
+            projet.close()
+
+            # Paramètres des traitements : appliqués aux fenêtres ouvertes, puis à celles ouvertes ensuite
+            self.parametres_fenetres = projet.parametres.get("fenetres", {})
+            for nom, fenetre in self.fenetres.items():
+                if nom in self.parametres_fenetres and fenetre.window.winfo_exists():
+                    fenetre.set_parameters(self.parametres_fenetres[nom])
+            contenu = projet.noms() + [f"paramètres {nom}" for nom in self.parametres_fenetres]
+            messagebox.showinfo("Chargement", f"Projet chargé : {', '.join(contenu)}")
+        except Exception as e:
+            messagebox.showerror("Erreur", f"Erreur lors du chargement du projet : {e}")
+
+    def open_session_window(self):
+        """Ouvre la fenêtre des données de la session."""
+        SessionWindow(self.ui, self.session)
+
+    def toggle_profilage(self):
+        """Active le profilage des prochains traitements, y compris ceux lancés dans des processus séparés."""
+        from tool_profilage import activer
+        activer(self.profilage.get(), self.cprofile.get())
+
+    def open_taches_window(self):
+        """Ouvre la fenêtre de la file des traitements."""
+        TachesWindow(self.ui, self.taches)
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # Nécessaire pour les processus de calcul dans l'exécutable PyInstaller
     Main()
@@ -8,6 +8,7 @@ Ce script contient les fonctions pour la fenêtre de création d'une palette.
 from tkinter import *
 from tkinter import filedialog, messagebox
 from PIL import Image, ImageTk
+from interface_session import PALETTE
 
 
 BG_1 = "#A6E3E9"
@@ -29,9 +30,10 @@ def show_credits():
     )
 
 class ColorPaletteWindow:
-    def __init__(self, root):
+    def __init__(self, root, session=None):
         """Initialise la fenêtre de gestion de palette de couleurs."""
         self.master = root
+        self.session = session
         self.window = Toplevel(root)
         self.window.title("Palette des couleurs")
         self.window.config(bg=BG_1)
@@ -66,10 +68,10 @@ class ColorPaletteWindow:
         aide_menu.add_command(label="Crédits", command=show_credits)
         self.menu.add_cascade(label="Aide", menu=aide_menu)
 
-        self.window.bind_all("<Control-o>", lambda event: self.load_image())
-        self.window.bind_all("<Control-l>", lambda event: self.load_palette())
-        self.window.bind_all("<Control-s>", lambda event: self.save_palette())
-        self.window.bind_all("<Control-q>", lambda event: self.on_close())
+        self.window.bind("<Control-o>", lambda event: self.load_image())
+        self.window.bind("<Control-l>", lambda event: self.load_palette())
+        self.window.bind("<Control-s>", lambda event: self.save_palette())
+        self.window.bind("<Control-q>", lambda event: self.on_close())
 
     def create_widgets(self):
         # --- Interface graphique ---
@@ -136,6 +138,9 @@ class ColorPaletteWindow:
                relief="solid", bg=BG_1, highlightbackground=BG_1, highlightcolor=FG).grid(row=0, column=1, padx=10, pady=5)
         Button(frame, text="Charger une palette", command=self.load_palette, width=20, height=2, relief="solid", bg=BG_1,
                highlightbackground=BG_1, highlightcolor=FG).grid(row=0, column=0, padx=10, pady=5)
+        if self.session is not None:
+            Button(frame, text="Envoyer vers la session", command=self.send_to_session, width=20, height=2, relief="solid",
+                   bg=BG_1, highlightbackground=BG_1, highlightcolor=FG).grid(row=1, column=0, columnspan=2, padx=10, pady=5)
 
     def refresh_list(self):
         """Mise à jour de la liste des couleurs affichées."""
@@ -285,6 +290,18 @@ class ColorPaletteWindow:
             except Exception as e:
                 messagebox.showerror("Erreur", f"Une erreur est survenue : {e}")
 
+    def send_to_session(self):
+        """Garde la palette en mémoire pour la fenêtre de conversion."""
+        import pandas as pd  # Import à la demande pour ne pas ralentir l'ouverture de la fenêtre
+
+        if not self.colors:
+            messagebox.showerror("Erreur", "La palette est vide.")
+            return
+        palette = pd.DataFrame([(float(c[0]), int(c[1]), int(c[2]), int(c[3])) for c in self.colors],
+                               columns=['value', 'r', 'g', 'b'])
+        self.session.put(PALETTE, palette, "fenêtre palette")
+        messagebox.showinfo("Session", "Palette envoyée vers la session.")
+
     def on_close(self):
         """Vérifie si la palette a été sauvegardée avant de fermer la fenêtre."""
         if not self.is_saved and len(self.colors) > 0:
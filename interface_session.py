@@ -0,0 +1,132 @@
+"""
+Script python créé par S. ROULLET
+Dernière modification le 19/10/2026
+
+Ce script contient la mémoire de session partagée entre les fenêtres et la fenêtre qui l'affiche.
+"""
+
+import time
+import threading
+from tkinter import *
+from tkinter import messagebox
+
+BG_1 = "#A6E3E9"
+BG_2 = "#71C9CE"
+FG = "#112D4E"
+
+# Noms des données partagées entre les fenêtres
+EXTRACTION = "extraction"  # DataFrame X, Y, R, G, B
+PALETTE = "palette"  # DataFrame value, r, g, b
+CONVERSION = "conversion"  # DataFrame X, Y, Z
+PALETTE_INTERPOLEE = "palette_interpolee"  # DataFrame value, r, g, b utilisé pour la correspondance
+GRILLE = "grille"  # dict : valeurs (tableau 2D), affine, pas, epsg
+
+
+def taille_memoire(objet):
+    """Estime la mémoire occupée (en octets) par un tableau numpy, un DataFrame ou un dict de ceux-ci."""
+    if hasattr(objet, "memory_usage"):
+        return int(objet.memory_usage(deep=True).sum())
+    if hasattr(objet, "nbytes"):
+        return int(objet.nbytes)
+    if isinstance(objet, dict):
+        return sum(taille_memoire(v) for v in objet.values())
+    return 0
+
+
+class SessionDonnees:
+    """
+    Mémoire de session appartenant à Main : garde en mémoire les derniers résultats
+    (extraction, palette, conversion, grille) pour que les fenêtres puissent les réutiliser sans fichier.
+    """
+
+    def __init__(self):
+        self.donnees = {}
+        self.lock = threading.Lock()
+
+    def put(self, nom, objet, source=""):
+        with self.lock:
+            self.donnees[nom] = {"objet": objet, "taille": taille_memoire(objet), "source": source, "date": time.time()}
+
+    def get(self, nom):
+        with self.lock:
+            element = self.donnees.get(nom)
+        return None if element is None else element["objet"]
+
+    def date(self, nom):
+        """Date d'ajout de la donnée, pour savoir si elle a été remplacée."""
+        with self.lock:
+            element = self.donnees.get(nom)
+        return None if element is None else element["date"]
+
+    def evict(self, nom):
+        with self.lock:
+            self.donnees.pop(nom, None)
+
+    def clear(self):
+        with self.lock:
+            self.donnees.clear()
+
+    def taille_totale(self):
+        with self.lock:
+            return sum(element["taille"] for element in self.donnees.values())
+
+    def items(self):
+        """Dictionnaire nom -> donnée, par exemple pour l'enregistrer dans un projet."""
+        with self.lock:
+            return {nom: element["objet"] for nom, element in self.donnees.items()}
+
+    def sources(self):
+        with self.lock:
+            return {nom: element["source"] for nom, element in self.donnees.items()}
+
+    def resume(self):
+        """Liste (nom, taille en octets, source) des données en mémoire."""
+        with self.lock:
+            return [(nom, element["taille"], element["source"]) for nom, element in self.donnees.items()]
+
+
+class SessionWindow:
+    def __init__(self, root, session):
+        self.session = session
+        self.window = Toplevel(root)
+        self.window.title("Données de la session")
+        self.window.config(bg=BG_1)
+
+        self.create_widgets()
+        self.refresh_list()
+
+    def create_widgets(self):
+        Label(self.window, text="Données gardées en mémoire", font=("Arial", 12, "bold"), bg=BG_1).grid(row=0, column=0,
+                                                                                                       columnspan=2, padx=10,
+                                                                                                       pady=10)
+        self.listbox = Listbox(self.window, width=60, height=6, relief="solid", bd=2, highlightbackground=BG_1)
+        self.listbox.grid(row=1, column=0, columnspan=2, padx=10, pady=10)
+
+        self.total_label = Label(self.window, text="", font=("Arial", 12), bg=BG_1)
+        self.total_label.grid(row=2, column=0, columnspan=2, padx=10, pady=5)
+
+        Button(self.window, text="Libérer la sélection", command=self.evict_selected, width=20, height=2, relief="solid",
+               bg=BG_1, highlightbackground=BG_1, highlightcolor=FG).grid(row=3, column=0, padx=10, pady=10)
+        Button(self.window, text="Tout libérer", command=self.clear, width=20, height=2, relief="solid",
+               bg=BG_1, highlightbackground=BG_1, highlightcolor=FG).grid(row=3, column=1, padx=10, pady=10)
+
+    def refresh_list(self):
+        self.listbox.delete(0, END)
+        self.noms = []
+        for nom, taille, source in self.session.resume():
+            self.noms.append(nom)
+            self.listbox.insert(END, f"{nom} : {taille / 1e6:.1f} Mo {'(' + source + ')' if source else ''}")
+        self.total_label.config(text=f"Total : {self.session.taille_totale() / 1e6:.1f} Mo")
+
+    def evict_selected(self):
+        try:
+            selected_index = self.listbox.curselection()[0]
+        except IndexError:
+            messagebox.showerror("Erreur", "Aucune donnée sélectionnée dans la liste.")
+            return
+        self.session.evict(self.noms[selected_index])
+        self.refresh_list()
+
+    def clear(self):
+        self.session.clear()
+        self.refresh_list()
@@ -0,0 +1,279 @@
+"""
+Script python créé par S. ROULLET
+Dernière modification le 19/10/2026
+
+Ce script contient la file des traitements (extraction, conversion, Tif) partagée par les fenêtres et la fenêtre qui l'affiche.
+"""
+
+import os
+import time
+import queue
+import itertools
+import multiprocessing
+from tkinter import *
+from tkinter import messagebox
+from tkinter.ttk import Treeview
+
+BG_1 = "#A6E3E9"
+BG_2 = "#71C9CE"
+FG = "#112D4E"
+
+PRIORITES = {"Haute": 0, "Normale": 1, "Basse": 2}
+
+EN_ATTENTE = "En attente"
+EN_COURS = "En cours"
+TERMINE = "Terminé"
+ERREUR = "Erreur"
+ANNULE = "Annulé"
+
+
+def format_duree(secondes):
+    if secondes is None:
+        return ""
+    return f"{int(secondes // 60)}m {int(secondes % 60):02d}s"
+
+
+class Tache:
+    """
+    Traitement de la file. cible est une fonction de calcul exécutée dans un processus séparé, appelée avec
+    progress_queue en dernier argument nommé ; elle envoie ("etape", indice), éventuellement ("points", nombre),
+    puis ("termine", résultat) ou ("erreur", message), comme generate_tif.
+    """
+
+    def __init__(self, numero, type_tache, nom, cible, args, etapes, priorite="Normale", kwargs=None):
+        self.numero = numero
+        self.type = type_tache
+        self.nom = nom
+        self.cible = cible
+        self.args = args
+        self.kwargs = kwargs or {}
+        self.etapes = etapes
+        self.priorite = priorite
+
+        self.statut = EN_ATTENTE
+        self.etape = -1
+        self.points = None
+        self.resultat = None
+        self.erreur = ""
+        self.soumission = time.time()
+        self.debut = None
+        self.fin = None
+        self.worker = None
+        self.progress_queue = None
+
+    def duree(self):
+        if self.debut is None:
+            return None
+        return (self.fin or time.time()) - self.debut
+
+    def avancement(self):
+        """Fraction du traitement effectuée, d'après l'étape en cours."""
+        if self.statut == TERMINE:
+            return 1.0
+        return max(self.etape, 0) / len(self.etapes)
+
+    def debit(self):
+        """Points traités par seconde (si le traitement a annoncé son nombre de points)."""
+        duree = self.duree()
+        if not self.points or not duree:
+            return None
+        return self.points * (1.0 if self.statut == TERMINE else self.avancement()) / duree
+
+    def eta(self):
+        """Temps restant estimé à partir de l'avancement par étape."""
+        avancement = self.avancement()
+        if self.statut != EN_COURS or avancement <= 0:
+            return None
+        return self.duree() * (1 - avancement) / avancement
+
+
+class FileTaches:
+    """
+    File des traitements appartenant à Main : les fenêtres y soumettent leurs traitements, qui sont lancés par ordre
+    de priorité (puis de soumission) dans au plus `processus` processus en même temps. update() est appelée
+    régulièrement depuis la boucle Tk pour lire l'avancement et démarrer les traitements suivants.
+    """
+
+    def __init__(self, processus=2):
+        self.processus = max(1, processus)
+        self.taches = []
+        self.numeros = itertools.count(1)
+
+    def soumettre(self, type_tache, nom, cible, args, etapes, priorite="Normale", kwargs=None):
+        tache = Tache(next(self.numeros), type_tache, nom, cible, args, etapes, priorite, kwargs)
+        self.taches.append(tache)
+        self.update()
+        return tache
+
+    def get(self, numero):
+        for tache in self.taches:
+            if tache.numero == numero:
+                return tache
+        return None
+
+    def en_cours(self):
+        return [tache for tache in self.taches if tache.statut == EN_COURS]
+
+    def en_attente(self):
+        return [tache for tache in self.taches if tache.statut == EN_ATTENTE]
+
+    def set_processus(self, processus):
+        """Change le nombre de traitements simultanés ; les traitements en cours ne sont pas interrompus."""
+        self.processus = max(1, int(processus))
+        self.update()
+
+    def set_priorite(self, numero, priorite):
+        tache = self.get(numero)
+        if tache is not None and tache.statut == EN_ATTENTE:
+            tache.priorite = priorite
+
+    def annuler(self, numero):
+        tache = self.get(numero)
+        if tache is None or tache.statut not in (EN_ATTENTE, EN_COURS):
+            return
+        if tache.worker is not None and tache.worker.is_alive():
+            tache.worker.terminate()
+            tache.worker.join()
+        tache.statut = ANNULE
+        tache.fin = time.time()
+        self.update()
+
+    def annuler_tout(self):
+        for tache in self.taches:
+            self.annuler(tache.numero)
+
+    def vider_terminees(self):
+        self.taches = [tache for tache in self.taches if tache.statut in (EN_ATTENTE, EN_COURS)]
+
+    def demarrer(self, tache):
+        tache.progress_queue = multiprocessing.Queue()
+        tache.worker = multiprocessing.Process(target=tache.cible, args=tache.args,
+                                               kwargs={**tache.kwargs, "progress_queue": tache.progress_queue}, daemon=True)
+        tache.statut = EN_COURS
+        tache.debut = time.time()
+        tache.worker.start()
+
+    def lire_avancement(self, tache):
+        try:
+            while True:
+                message = tache.progress_queue.get_nowait()
+                if message[0] == "etape":
+                    tache.etape = message[1]
+                elif message[0] == "points":
+                    tache.points = message[1]
+                elif message[0] == "termine":
+                    tache.statut, tache.resultat = TERMINE, message[1]
+                elif message[0] == "erreur":
+                    tache.statut, tache.erreur = ERREUR, message[1]
+        except queue.Empty:
+            pass
+
+        if tache.statut == EN_COURS and not tache.worker.is_alive() and tache.progress_queue.empty():
+            tache.statut, tache.erreur = ERREUR, "Le processus de calcul s'est arrêté de manière inattendue."
+        if tache.statut != EN_COURS:
+            tache.fin = time.time()
+            tache.worker.join()
+
+    def update(self):
+        for tache in self.en_cours():
+            self.lire_avancement(tache)
+
+        # Démarrer les traitements en attente les plus prioritaires dans les places libres
+        attente = sorted(self.en_attente(), key=lambda tache: (PRIORITES[tache.priorite], tache.numero))
+        for tache in attente[:max(0, self.processus - len(self.en_cours()))]:
+            self.demarrer(tache)
+
+
+class TachesWindow:
+    def __init__(self, root, taches):
+        self.taches = taches
+        self.window = Toplevel(root)
+        self.window.title("File des traitements")
+        self.window.config(bg=BG_1)
+
+        self.processus = StringVar(value=str(taches.processus))
+        self.priorite = StringVar(value="Normale")
+
+        self.create_widgets()
+        self.refresh_list()
+
+    def create_widgets(self):
+        Label(self.window, text="Traitements", font=("Arial", 12, "bold"), bg=BG_1).grid(row=0, column=0, columnspan=4,
+                                                                                         padx=10, pady=10)
+        colonnes = ("type", "nom", "priorite", "statut", "avancement", "duree", "debit", "eta")
+        titres = ("Type", "Nom", "Priorité", "Statut", "Avancement", "Durée", "Débit", "Temps restant")
+        self.liste = Treeview(self.window, columns=colonnes, show="headings", height=12)
+        for colonne, titre in zip(colonnes, titres):
+            self.liste.heading(colonne, text=titre)
+            self.liste.column(colonne, width=220 if colonne in ("nom", "avancement") else 100)
+        self.liste.grid(row=1, column=0, columnspan=4, padx=10, pady=10)
+
+        self.total_label = Label(self.window, text="", font=("Arial", 12), bg=BG_1)
+        self.total_label.grid(row=2, column=0, columnspan=4, padx=10, pady=5)
+
+        Label(self.window, text="Traitements simultanés", font=("Arial", 12, "bold"), bg=BG_1).grid(row=3, column=0, padx=10,
+                                                                                                    pady=10, sticky="w")
+        Spinbox(self.window, from_=1, to=max(1, os.cpu_count() or 1), textvariable=self.processus, width=5,
+                command=self.change_processus).grid(row=3, column=1, padx=10, pady=10, sticky="w")
+
+        Label(self.window, text="Priorité", font=("Arial", 12, "bold"), bg=BG_1).grid(row=3, column=2, padx=10, pady=10,
+                                                                                      sticky="w")
+        OptionMenu(self.window, self.priorite, *PRIORITES, command=lambda *args: self.change_priorite()).grid(
+            row=3, column=3, padx=10, pady=10, sticky="w")
+
+        Button(self.window, text="Annuler la sélection", command=self.cancel_selected, width=20, height=2, relief="solid",
+               bg=BG_1, highlightbackground=BG_1, highlightcolor=FG).grid(row=4, column=0, padx=10, pady=10)
+        Button(self.window, text="Tout annuler", command=self.cancel_all, width=20, height=2, relief="solid",
+               bg=BG_1, highlightbackground=BG_1, highlightcolor=FG).grid(row=4, column=1, padx=10, pady=10)
+        Button(self.window, text="Retirer les terminés", command=self.clear_finished, width=20, height=2, relief="solid",
+               bg=BG_1, highlightbackground=BG_1, highlightcolor=FG).grid(row=4, column=2, padx=10, pady=10)
+
+    def selected_numbers(self):
+        return [int(element) for element in self.liste.selection()]
+
+    def refresh_list(self):
+        """Met à jour la liste toutes les secondes tant que la fenêtre est ouverte."""
+        if not self.window.winfo_exists():
+            return
+        selection = self.liste.selection()
+        self.liste.delete(*self.liste.get_children())
+        for tache in self.taches.taches:
+            if tache.statut == EN_COURS and 0 <= tache.etape < len(tache.etapes):
+                avancement = f"{tache.avancement() * 100:.0f}% : {tache.etapes[tache.etape]}"
+            elif tache.statut == ERREUR:
+                avancement = tache.erreur
+            else:
+                avancement = f"{tache.avancement() * 100:.0f}%"
+            debit = tache.debit()
+            self.liste.insert("", END, iid=str(tache.numero), values=(
+                tache.type, tache.nom, tache.priorite, tache.statut, avancement, format_duree(tache.duree()),
+                f"{debit:,.0f} pts/s".replace(",", " ") if debit else "", format_duree(tache.eta())))
+        self.liste.selection_set([element for element in selection if self.liste.exists(element)])
+
+        self.total_label.config(text=f"{len(self.taches.en_cours())} en cours, {len(self.taches.en_attente())} en attente")
+        self.window.after(1000, self.refresh_list)
+
+    def change_processus(self):
+        try:
+            self.taches.set_processus(int(self.processus.get()))
+        except ValueError:
+            messagebox.showerror("Erreur", "Le nombre de traitements simultanés doit être un entier positif.")
+
+    def change_priorite(self):
+        for numero in self.selected_numbers():
+            self.taches.set_priorite(numero, self.priorite.get())
+
+    def cancel_selected(self):
+        numeros = self.selected_numbers()
+        if not numeros:
+            messagebox.showerror("Erreur", "Aucun traitement sélectionné dans la liste.")
+            return
+        for numero in numeros:
+            self.taches.annuler(numero)
+
+    def cancel_all(self):
+        if messagebox.askyesno("Annulation", "Annuler tous les traitements en cours et en attente ?"):
+            self.taches.annuler_tout()
+
+    def clear_finished(self):
+        self.taches.vider_terminees()
@@ -9,12 +9,21 @@ import numpy as np
 import pandas as pd
 import os
 import rasterio
-from rasterio.transform import from_origin
-from scipy.interpolate import griddata
+from rasterio.transform import from_origin, Affine
+from scipy.interpolate import LinearNDInterpolator
 import json
 import csv
+import time
+import queue
+import multiprocessing
+from functools import lru_cache
+from pyproj import Transformer
 from tkinter import *
 from tkinter import filedialog, messagebox
+from tkinter.ttk import Progressbar
+from interface_session import CONVERSION
+from tool_cache import cache
+from tool_profilage import profiler_queue
 
 BG_1 = "#A6E3E9"
 BG_2 = "#71C9CE"
@@ -34,8 +43,163 @@ def show_credits():
         "© mars 2025, tous droits réservés."
     )
 
+# === Fonctions de traitement ===
+ETAPES_TIF = ["Chargement du CSV", "Reprojection", "Triangulation", "Interpolation", "Écriture du TIF"]
+
+
+@lru_cache(maxsize=16)
+def get_transformer(epsg_source, epsg_cible):
+    """Retourne le Transformer pyproj entre deux EPSG, mis en cache pour être réutilisé."""
+    return Transformer.from_crs(f"EPSG:{epsg_source}", f"EPSG:{epsg_cible}", always_xy=True)
+
+
+def reproject_points(x, y, epsg_source, epsg_cible, chunk_size=1_000_000):
+    """Reprojette les tableaux x, y d'un EPSG à un autre, par blocs de chunk_size points."""
+    transformer = get_transformer(str(epsg_source), str(epsg_cible))
+    x_out = np.empty(len(x), dtype=np.float64)
+    y_out = np.empty(len(y), dtype=np.float64)
+    for debut in range(0, len(x), chunk_size):
+        fin = debut + chunk_size
+        x_out[debut:fin], y_out[debut:fin] = transformer.transform(x[debut:fin], y[debut:fin])
+    return x_out, y_out
+
+
+def count_points_per_cell(x, y, x_min, x_max, y_min, y_max, grid_res_x, grid_res_y):
+    """Compte le nombre de points contribuant à chaque cellule de la grille (au nœud le plus proche)."""
+    ix = np.rint((x - x_min) / ((x_max - x_min) or 1) * (grid_res_x - 1)).astype(np.int64)
+    iy = np.rint((y - y_min) / ((y_max - y_min) or 1) * (grid_res_y - 1)).astype(np.int64)
+    counts = np.bincount(iy * grid_res_x + ix, minlength=grid_res_x * grid_res_y)
+    return counts.reshape(grid_res_y, grid_res_x)
+
+
+def compute_grid(fichier_csv, nom_X, nom_Y, nom_Z, grid_res_x, grid_res_y, epsg, progress_queue,
+                 multi_bandes=False, nom_distance="distance", epsg_source=""):
+    """Calcule les bandes de la grille, leurs descriptions et la transformation spatiale du Tif."""
+    progress_queue.put(("etape", 0))
+    from_dataframe = isinstance(fichier_csv, pd.DataFrame)
+    header = fichier_csv.columns if from_dataframe else pd.read_csv(fichier_csv, nrows=0).columns
+    colonnes_valeurs = [nom_Z]
+    if multi_bandes and nom_distance in header:
+        colonnes_valeurs.append(nom_distance)
+    if from_dataframe:
+        df = fichier_csv
+    else:
+        df = pd.read_csv(fichier_csv, usecols=[nom_X, nom_Y] + colonnes_valeurs)
+    x = df[nom_X].values
+    y = df[nom_Y].values
+    valeurs = df[colonnes_valeurs].values
+    progress_queue.put(("points", len(x)))
+
+    # Reprojection des points vers l'EPSG de sortie
+    progress_queue.put(("etape", 1))
+    if epsg_source and str(epsg_source) != str(epsg):
+        x, y = reproject_points(x, y, epsg_source, epsg)
+
+    # Triangulation de Delaunay (même méthode que griddata(method="linear")), partagée par toutes les bandes
+    progress_queue.put(("etape", 2))
+    interpolateur = LinearNDInterpolator(np.column_stack((x, y)), valeurs)
+
+    # Définir une grille régulière et interpoler les valeurs Z
+    progress_queue.put(("etape", 3))
+    grid_x, grid_y = np.meshgrid(
+        np.linspace(x.min(), x.max(), grid_res_x),
+        np.linspace(y.min(), y.max(), grid_res_y)
+    )
+    grid_valeurs = interpolateur(grid_x, grid_y)  # forme (grid_res_y, grid_res_x, nb colonnes)
+    bandes = [grid_valeurs[:, :, i] for i in range(len(colonnes_valeurs))]
+    descriptions = list(colonnes_valeurs)
+
+    if multi_bandes:
+        bandes.append(count_points_per_cell(x, y, x.min(), x.max(), y.min(), y.max(), grid_res_x, grid_res_y))
+        descriptions.append("nombre_points")
+
+    # Définir la transformation spatiale
+    pixel_size_x = (x.max() - x.min()) / grid_res_x
+    pixel_size_y = (y.max() - y.min()) / grid_res_y
+
+    transform = from_origin(x.min(), y.min(), pixel_size_x, -pixel_size_y)
+    return {"bandes": np.stack(bandes).astype(np.float32), "descriptions": descriptions, "transform": list(transform)[:6]}
+
+
+def chemin_temporaire(output_file):
+    """Chemin où le Tif est écrit avant de remplacer output_file, qui reste intact en cas d'annulation."""
+    return output_file + ".partiel"
+
+
+def generate_tif(fichier_csv, nom_X, nom_Y, nom_Z, grid_res_x, grid_res_y, epsg, output_file, progress_queue,
+                 multi_bandes=False, nom_distance="distance", epsg_source=""):
+    """
+    Crée le GeoTIFF depuis le CSV (ou directement depuis un DataFrame). Exécutée dans un processus séparé : l'avancement est
+    envoyé dans progress_queue sous la forme ("etape", indice), puis ("termine", chemin)
+    ou ("erreur", message).
+    Si multi_bandes est activé, le Tif contient aussi la distance couleur (si la colonne
+    nom_distance existe) et le nombre de points par cellule, calculés en une seule passe.
+    Si epsg_source est renseigné et diffère de epsg, les points sont reprojetés avant l'interpolation.
+    """
+    progress_queue = profiler_queue(progress_queue, "tif", ETAPES_TIF)
+    try:
+        # Grille déjà calculée pour ces points et ces paramètres ?
+        cle = cache.cle("grille", fichier_csv, nom_X, nom_Y, nom_Z, grid_res_x, grid_res_y, str(epsg), str(epsg_source),
+                        multi_bandes, nom_distance)
+        grille = cache.get(cle)
+        if grille is None:
+            grille = compute_grid(fichier_csv, nom_X, nom_Y, nom_Z, grid_res_x, grid_res_y, epsg, progress_queue,
+                                  multi_bandes, nom_distance, epsg_source)
+            cache.put(cle, grille)
+
+        progress_queue.put(("etape", 4))
+        fichier_temporaire = chemin_temporaire(output_file)
+        with rasterio.open(
+                fichier_temporaire, "w",
+                driver="GTiff",
+                height=grid_res_y,
+                width=grid_res_x,
+                count=len(grille["descriptions"]),
+                dtype=rasterio.float32,
+                crs=f"EPSG:{epsg}",  # PROJECTION ICI
+                transform=Affine(*grille["transform"])
+        ) as dst:
+            for i, description in enumerate(grille["descriptions"], start=1):
+                dst.write(grille["bandes"][i - 1], i)
+                dst.set_band_description(i, description)
+        os.replace(fichier_temporaire, output_file)
+
+        progress_queue.put(("termine", output_file))
+    except Exception as e:
+        if os.path.exists(chemin_temporaire(output_file)):
+            os.remove(chemin_temporaire(output_file))
+        progress_queue.put(("erreur", str(e)))
+
+
+def write_value_tif(values, affine, pas, epsg, output_file):
+    """
+    Écrit directement la grille de valeurs d'une image dans un GeoTIFF aligné sur ses pixels.
+    affine = (a, b, c, d, e, f) donne les coordonnées du centre du pixel source (x, y) :
+    X = a*x + b*y + c et Y = d*x + e*y + f. values est déjà décimée d'un facteur pas.
+    """
+    a, b, c, d, e, f = affine
+    # Le pixel de sortie (i, j) a pour centre le pixel source (i*pas, j*pas) ; rasterio attend le coin du pixel
+    transform = Affine(a * pas, b * pas, c - (a + b) * pas / 2,
+                       d * pas, e * pas, f - (d + e) * pas / 2)
+
+    with rasterio.open(
+            output_file, "w",
+            driver="GTiff",
+            height=values.shape[0],
+            width=values.shape[1],
+            count=1,
+            dtype=rasterio.float32,
+            crs=f"EPSG:{epsg}",
+            transform=transform,
+            nodata=np.nan
+    ) as dst:
+        dst.write(values.astype(np.float32), 1)
+
+
 class TifWindow:
-    def __init__(self, root):
+    def __init__(self, root, session=None, taches=None):
+        self.session = session
+        self.taches = taches
         self.window = Toplevel(root)
         self.window.title("Création d'un Tif")
         self.window.config(bg=BG_1)
@@ -46,11 +210,18 @@ class TifWindow:
         self.grid_res_x = StringVar(value="5000")
         self.grid_res_y = StringVar(value="5000")
         self.epsg = StringVar(value="32198")
+        self.epsg_source = StringVar(value="")
 
         self.nom_X = StringVar(value="X")
         self.nom_Y = StringVar(value="Y")
         self.nom_Z = StringVar(value="Z")
+        self.nom_distance = StringVar(value="distance")
+        self.multi_bandes = BooleanVar(value=False)
+        self.utiliser_session = BooleanVar(value=False)
 
+        self.is_processing = False
+        self.worker = None
+        self.progress_queue = None
         self.window.protocol("WM_DELETE_WINDOW", self.on_close)
 
         # Interface graphique
@@ -77,14 +248,17 @@ class TifWindow:
         self.menu.add_cascade(label="Aide", menu=aide_menu)
 
         # Ajout des raccourcis clavier
-        self.window.bind_all("<Control-e>", lambda event: self.browse_extraction_file())
-        self.window.bind_all("<Control-s>", lambda event: self.save_parameters())
-        self.window.bind_all("<Control-l>", lambda event: self.load_parameters())
-        self.window.bind_all("<Control-q>", lambda event: self.on_close())
+        self.window.bind("<Control-e>", lambda event: self.browse_extraction_file())
+        self.window.bind("<Control-s>", lambda event: self.save_parameters())
+        self.window.bind("<Control-l>", lambda event: self.load_parameters())
+        self.window.bind("<Control-q>", lambda event: self.on_close())
 
     def on_close(self):
         """Vérifie si la palette a été sauvegardée avant de fermer la fenêtre."""
-        self.window.destroy()
+        if self.is_processing:
+            messagebox.showwarning("Fermeture", "Le calcul est en cours. Impossible de fermer la fenêtre.")
+        else:
+            self.window.destroy()
 
     def create_widgets(self):
         # Fichier d'extraction
@@ -113,6 +287,12 @@ class TifWindow:
         Entry(self.window, textvariable=self.epsg, width=10, relief="solid", highlightbackground=BG_1).grid(row=3, column=1, padx=10,
                                                                                             pady=10)
 
+        # EPSG des points du CSV (vide : pas de reprojection)
+        Label(self.window, text="EPSG du CSV (reprojection)", font=("Arial", 12, "bold"), bg=BG_1).grid(row=2, column=2, padx=10,
+                                                                                                      pady=10, sticky="w")
+        Entry(self.window, textvariable=self.epsg_source, width=10, relief="solid", highlightbackground=BG_1).grid(row=2, column=3,
+                                                                                                    padx=10, pady=10)
+
 
         # Indices des colonnes dans un frame avec columnspan=5
         self.frame_noms = Frame(self.window, bg=BG_2, relief="solid", bd=2)
@@ -139,6 +319,21 @@ class TifWindow:
         Entry(self.frame_noms, textvariable=self.nom_Z, width=10, relief="solid", highlightbackground=BG_2).grid(
             row=1, column=2, padx=5,pady=5)
 
+        Label(self.frame_noms, text="Nom distance", font=("Arial", 12, "bold"), bg=BG_2).grid(row=0, column=3, padx=5,
+                                                                                            pady=5,
+                                                                                            sticky="w")
+        Entry(self.frame_noms, textvariable=self.nom_distance, width=10, relief="solid", highlightbackground=BG_2).grid(
+            row=1, column=3, padx=5,pady=5)
+
+        # Conversion gardée en mémoire dans la session
+        if self.session is not None:
+            Checkbutton(self.window, text="Utiliser la conversion de la session", variable=self.utiliser_session,
+                        font=("Arial", 12, "bold"), bg=BG_1).grid(row=1, column=2, columnspan=2, padx=10, pady=10, sticky="w")
+
+        # Bandes supplémentaires : distance couleur et nombre de points
+        Checkbutton(self.window, text="Tif multi-bandes (valeur, distance, nombre de points)", variable=self.multi_bandes,
+                    font=("Arial", 12, "bold"), bg=BG_1).grid(row=3, column=2, padx=10, pady=10, sticky="w")
+
         # Si un fichier d'extraction est chargé, afficher les colonnes et leurs indices
         if self.fichier_extraction.get():  # Vérifiez si un fichier a été chargé
             # Cette partie suppose que le fichier est chargé et contient des données
@@ -151,18 +346,27 @@ class TifWindow:
                highlightbackground=BG_1, highlightcolor=FG).grid(row=5, column=1, padx=10, pady=20)
         Button(self.window, text="Lancer la conversion", command=self.process, width=20, height=2, relief="solid", bg=BG_1,
                highlightbackground=BG_1, highlightcolor=FG).grid(row=5, column=2, padx=10, pady=20)
+        if self.taches is not None:
+            Button(self.window, text="Mettre en file", command=self.queue_tif, width=20, height=2, relief="solid", bg=BG_1,
+                   highlightbackground=BG_1, highlightcolor=FG).grid(row=5, column=3, padx=10, pady=20)
 
-    def save_parameters(self):
-        """Sauvegarde les paramètres dans un fichier JSON."""
-        params = {
+    def get_parameters(self):
+        return {
             "fichier_extraction": self.fichier_extraction.get(),
             "grid_res_x": self.grid_res_x.get(),
             "grid_res_y": self.grid_res_y.get(),
             "epsg": self.epsg.get(),
+            "epsg_source": self.epsg_source.get(),
             "nom_X": self.nom_X.get(),
             "nom_Y": self.nom_Y.get(),
-            "nom_Z": self.nom_Z.get()
+            "nom_Z": self.nom_Z.get(),
+            "nom_distance": self.nom_distance.get(),
+            "multi_bandes": self.multi_bandes.get()
         }
+
+    def save_parameters(self):
+        """Sauvegarde les paramètres dans un fichier JSON."""
+        params = self.get_parameters()
         file_path = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("JSON", "*.json")])
         if not file_path:
             return
@@ -174,6 +378,20 @@ class TifWindow:
         except Exception as e:
             messagebox.showerror("Erreur", f"Erreur lors de la sauvegarde des paramètres : {e}")
 
+    def set_parameters(self, params):
+        """Applique un dictionnaire de paramètres (fichier JSON ou projet) aux champs de la fenêtre."""
+        self.fichier_extraction.set(params.get("fichier_extraction", ""))
+        self.grid_res_x.set(params.get("grid_res_x", "5000"))
+        self.grid_res_y.set(params.get("grid_res_y", "5000"))
+        self.epsg.set(params.get("epsg", "32198"))
+        self.epsg_source.set(params.get("epsg_source", ""))
+        self.nom_X.set(params.get("nom_X","X"))
+        self.nom_Y.set(params.get("nom_Y","Y"))
+        self.nom_Z.set(params.get("nom_Z","Z"))
+        self.nom_distance.set(params.get("nom_distance", "distance"))
+        self.multi_bandes.set(params.get("multi_bandes", False))
+        self.show_column_names_and_indices()
+
     def load_parameters(self):
         """Charge les paramètres depuis un fichier JSON."""
         file_path = filedialog.askopenfilename(filetypes=[("JSON", "*.json")])
@@ -183,15 +401,8 @@ class TifWindow:
         try:
             with open(file_path, "r") as f:
                 params = json.load(f)
-                self.fichier_extraction.set(params.get("fichier_extraction", ""))
-                self.grid_res_x.set(params.get("grid_res_x", "5000"))
-                self.grid_res_y.set(params.get("grid_res_y", "5000"))
-                self.epsg.set(params.get("epsg", "32198"))
-                self.nom_X.set(params.get("nom_X","X"))
-                self.nom_Y.set(params.get("nom_Y","Y"))
-                self.nom_Z.set(params.get("nom_Z","Z"))
+            self.set_parameters(params)
             messagebox.showinfo("Chargement", "Paramètres chargés avec succès.")
-            self.show_column_names_and_indices()
         except Exception as e:
             messagebox.showerror("Erreur", f"Erreur lors du chargement des paramètres : {e}")
 
@@ -229,46 +440,133 @@ class TifWindow:
             self.fichier_extraction.set(filename)
             self.show_column_names_and_indices()
 
+    def get_job_arguments(self):
+        """Vérifie les paramètres et demande le fichier de sortie ; retourne les arguments de generate_tif ou None."""
+        if self.utiliser_session.get():
+            source = self.session.get(CONVERSION)
+            if source is None:
+                messagebox.showerror("Erreur", "Aucune conversion dans la session.")
+                return
+            headers = source.columns
+        else:
+            source = self.fichier_extraction.get()
+            if not source or not os.path.exists(source):
+                messagebox.showerror("Erreur", "Le fichier d'extraction n'existe pas.")
+                return
+            with open(source, newline='', encoding='utf-8') as csvfile:
+                headers = next(csv.reader(csvfile))
+
+        if not {self.nom_X.get(), self.nom_Y.get(), self.nom_Z.get()}.issubset(headers):
+            messagebox.showwarning("Erreur", "Les colonnes n'ont pas été trouvées dans le CSV")
+            return
+
+        try:
+            grid_res_x = int(self.grid_res_x.get())
+            grid_res_y = int(self.grid_res_y.get())
+            if grid_res_x <= 0 or grid_res_y <= 0:
+                raise ValueError
+        except ValueError:
+            messagebox.showerror("Erreur", "La résolution de sortie doit être un entier positif.")
+            return
+
+        # Choisir le fichier de sortie avant de lancer le calcul
+        file_path = filedialog.asksaveasfilename(defaultextension=".tiff", filetypes=[("Fichiers tif", "*.tiff")])
+        if not file_path:
+            return
+
+        return ((source, self.nom_X.get(), self.nom_Y.get(), self.nom_Z.get(), grid_res_x, grid_res_y, self.epsg.get(),
+                 file_path),
+                {"multi_bandes": self.multi_bandes.get(), "nom_distance": self.nom_distance.get(),
+                 "epsg_source": self.epsg_source.get()})
+
+    def queue_tif(self):
+        """Ajoute la création du Tif à la file des traitements."""
+        arguments = self.get_job_arguments()
+        if arguments is None:
+            return
+        args, kwargs = arguments
+        self.taches.soumettre("Tif", os.path.basename(args[-1]), generate_tif, args, ETAPES_TIF, kwargs=kwargs)
+
     def process(self):
-        if not self.fichier_extraction.get() or not os.path.exists(self.fichier_extraction.get()):
-            messagebox.showerror("Erreur", "Le fichier d'extraction n'existe pas.")
+        if self.is_processing:
+            return  # Ne pas démarrer un traitement si déjà en cours
+
+        arguments = self.get_job_arguments()
+        if arguments is None:
             return
-        df = pd.read_csv(self.fichier_extraction.get())
+        args, kwargs = arguments
 
-        if not {self.nom_X.get(), self.nom_Y.get(), self.nom_Z.get()}.issubset(df.columns):
-            messagebox.showwarning("Erreur", "Les colonnes n'ont pas été trouvées dans le CSV")
+        self.is_processing = True
+        self.output_file = args[-1]
+        self.start_time = time.time()
 
-        x = df[self.nom_X.get()].values
-        y = df[self.nom_Y.get()].values
-        z = df[self.nom_Z.get()].values
+        self.progress_window = Toplevel(self.window)
+        self.progress_window.title("Création du Tif")
 
-        # Définir une grille régulière
-        grid_x, grid_y = np.meshgrid(
-            np.linspace(x.min(), x.max(), int(self.grid_res_x.get())),
-            np.linspace(y.min(), y.max(), int(self.grid_res_y.get()))
-        )
+        # Créer la barre de progression
+        self.progress = Progressbar(self.progress_window, orient="horizontal", length=300, mode="determinate")
+        self.progress.grid(row=0, column=0, padx=10)
 
-        # Interpoler les valeurs Z avec 'nearest' pour éviter les NaN
-        grid_z = griddata((x, y), z, (grid_x, grid_y), method="linear")
+        self.progress_label = Label(self.progress_window, text="Démarrage...", font=("Arial", 10))
+        self.progress_label.grid(row=1, column=0, padx=10, pady=10)
 
-        # Définir la transformation spatiale
-        pixel_size_x = (x.max() - x.min()) / int(self.grid_res_x.get())
-        pixel_size_y = (y.max() - y.min()) / int(self.grid_res_y.get())
+        Button(self.progress_window, text="Annuler", command=self.cancel_process, width=15, relief="solid", bg=BG_1,
+               highlightbackground=BG_1, highlightcolor=FG).grid(row=2, column=0, padx=10, pady=10)
+        self.progress_window.protocol("WM_DELETE_WINDOW", self.cancel_process)
 
-        transform = from_origin(x.min(), y.min(), pixel_size_x, -pixel_size_y)
+        # Lancer le calcul dans un processus séparé
+        self.progress_queue = multiprocessing.Queue()
+        self.worker = multiprocessing.Process(
+            target=generate_tif,
+            args=args,
+            kwargs={**kwargs, "progress_queue": self.progress_queue},
+            daemon=True
+        )
+        self.worker.start()
+        self.window.after(200, self.check_for_updates)
 
-        # Enregistrer le raster en GeoTIFF avec EPSG:32198
-        file_path = filedialog.asksaveasfilename(defaultextension=".tiff", filetypes=[("Fichiers tif", "*.tiff")])
-        if file_path:
-            with rasterio.open(
-                    file_path, "w",
-                    driver="GTiff",
-                    height=grid_z.shape[0],
-                    width=grid_z.shape[1],
-                    count=1,
-                    dtype=rasterio.float32,
-                    crs=f"EPSG:{self.epsg.get()}",  # PROJECTION ICI
-                    transform=transform
-            ) as dst:
-                dst.write(grid_z.astype(np.float32), 1)
-            messagebox.showinfo("Succès", "Tif sauvegardé avec succès.")
\ No newline at end of file
+    def check_for_updates(self):
+        """Lit l'avancement envoyé par le processus de calcul."""
+        if not self.is_processing:
+            return
+        try:
+            while True:
+                message = self.progress_queue.get_nowait()
+                if message[0] == "etape":
+                    indice = message[1]
+                    self.progress['value'] = indice / len(ETAPES_TIF) * 100
+                    self.progress_label.config(text=f"Étape {indice + 1}/{len(ETAPES_TIF)} : {ETAPES_TIF[indice]}")
+                elif message[0] == "termine":
+                    elapsed_time = time.time() - self.start_time
+                    self.end_process()
+                    messagebox.showinfo("Succès", f"Tif sauvegardé avec succès en "
+                                                  f"{int(elapsed_time // 60)}m {int(elapsed_time % 60)}s.")
+                    return
+                elif message[0] == "erreur":
+                    self.end_process()
+                    messagebox.showerror("Erreur", f"Erreur lors de la création du Tif : {message[1]}")
+                    return
+        except queue.Empty:
+            pass
+
+        if not self.worker.is_alive() and self.progress_queue.empty():
+            self.end_process()
+            messagebox.showerror("Erreur", "Le processus de calcul s'est arrêté de manière inattendue.")
+            return
+        self.window.after(200, self.check_for_updates)
+
+    def cancel_process(self):
+        """Interrompt la création du Tif en cours."""
+        if self.worker is not None and self.worker.is_alive():
+            self.worker.terminate()
+            self.worker.join()
+            # Supprimer le Tif partiellement écrit ; un Tif existant à remplacer n'a pas été touché
+            if os.path.exists(chemin_temporaire(self.output_file)):
+                os.remove(chemin_temporaire(self.output_file))
+        self.end_process()
+
+    def end_process(self):
+        self.is_processing = False
+        self.worker = None
+        if self.progress_window.winfo_exists():
+            self.progress_window.destroy()
@@ -1,45 +1,118 @@
+import argparse
+import json
+import numpy as np
 import pandas as pd
-from sklearn.neighbors import NearestNeighbors
-
-# --- Charger les CSV ---
-positions = pd.read_csv('/Users/sylvain/Desktop/These/Etude Sédimentaire/Sources/MDN/Résultats/points_fusionnes.csv')  # colonnes X,Y,Z
-values = pd.read_csv('/Users/sylvain/Desktop/These/Etude Sédimentaire/Sources/MDN/Résultats/points_couleur.csv')        # colonnes X,Y,Z
-
-# --- Ne garder que X,Y pour les positions ---
-pos_coords = positions[["X","Y"]].values
-val_coords = values[["X","Y"]].values
-val_z = values["Z"].values
-
-# --- Trouver le voisin le plus proche ---
-nbrs = NearestNeighbors(n_neighbors=1).fit(val_coords)
-distances, indices = nbrs.kneighbors(pos_coords)
-
-# --- Associer les valeurs Z correspondantes ---
-closest_z = val_z[indices.flatten()]
-
-# --- Remplacer par les étiquettes ---
-labels_dict = {
-    0: "Roche",
-    1: "Gravier sableux",
-    2: "Sable graveleux",
-    3: "Sable",
-    4: "Sable boueux",
-    5: "Boue sableuse",
-    6: "Boue"
-}
-
-labeled_values = [labels_dict[int(z)] for z in closest_z]
-
-# --- Créer le DataFrame de sortie ---
-output_df = positions.copy()
-output_df["Composition"] = labeled_values
-output_df["Nom"] = [f"SP-2007-{i+1}" for i in range(len(output_df))]
-
-output_df = output_df.drop(columns=["Z"])  # drop Z initial
-output_df = output_df.rename(columns={"X": "Longitude (°)", "Y": "Latitude (°)"})
-
-# --- Sauvegarder en CSV ---
-output_df.to_csv("positions_with_values.csv", index=False)
-
-print("Fichier créé : positions_with_values.csv")
-print(output_df.head())
+from scipy.spatial import cKDTree
+
+
+class AssociationValeurs:
+    """
+    Index spatial construit une seule fois sur les points convertis (X, Y, Z),
+    interrogé en bloc pour associer une valeur à n'importe quel fichier de points.
+    """
+
+    def __init__(self, coords, valeurs):
+        self.tree = cKDTree(np.asarray(coords, dtype=np.float64))
+        self.valeurs = np.asarray(valeurs, dtype=np.float64)
+
+    def associer(self, coords, k=1, methode="vote", dist_max=None):
+        """
+        Associe une valeur à chaque point de coords à partir de ses k plus proches voisins.
+        methode : "vote" (valeur majoritaire) ou "moyenne" (moyenne pondérée par l'inverse de la distance).
+        Les voisins plus loin que dist_max sont ignorés ; sans voisin retenu, la valeur est NaN.
+        Retourne les valeurs et la distance au plus proche voisin.
+        """
+        distances, indices = self.tree.query(np.asarray(coords, dtype=np.float64), k=k,
+                                             distance_upper_bound=np.inf if dist_max is None else dist_max)
+        distances = distances.reshape(len(distances), -1)
+        indices = indices.reshape(len(indices), -1)
+
+        # Les voisins hors de dist_max ont une distance infinie et un indice égal au nombre de points
+        valides = np.isfinite(distances)
+        voisins = np.where(valides, self.valeurs[np.minimum(indices, len(self.valeurs) - 1)], np.nan)
+
+        if methode == "moyenne":
+            poids = np.where(valides, 1 / np.maximum(distances, 1e-12), 0)
+            with np.errstate(invalid="ignore"):
+                resultat = np.nansum(voisins * poids, axis=1) / poids.sum(axis=1)
+        elif methode == "vote":
+            resultat = vote_majoritaire(voisins)
+        else:
+            raise ValueError(f"Méthode d'association inconnue : {methode}")
+
+        return resultat, distances[:, 0]
+
+
+def vote_majoritaire(voisins):
+    """Valeur la plus fréquente de chaque ligne (les NaN sont ignorés, en cas d'égalité le plus proche gagne)."""
+    comptes = np.zeros(voisins.shape, dtype=np.int64)
+    for j in range(voisins.shape[1]):
+        comptes[:, j] = (voisins == voisins[:, j:j + 1]).sum(axis=1)
+    gagnant = np.argmax(comptes, axis=1)  # argmax retourne la première colonne, donc le voisin le plus proche
+    return voisins[np.arange(len(voisins)), gagnant]
+
+
+def appliquer_etiquettes(valeurs, etiquettes):
+    """
+    Remplace les valeurs par l'étiquette de la clé la plus proche (dictionnaire valeur -> étiquette), de façon
+    vectorisée : les valeurs interpolées (moyenne, IDW, bilinéaire) reçoivent l'étiquette de leur classe.
+    Les valeurs NaN (sans voisin) reçoivent une étiquette vide.
+
+    >>> list(appliquer_etiquettes([1.0, 1.4, 2.7, float("nan")], {1.0: "sable", 2.0: "argile", 3.0: "roche"}))
+    ['sable', 'sable', 'roche', '']
+    """
+    valeurs = np.asarray(valeurs, dtype=np.float64)
+    cles = np.array(sorted(etiquettes), dtype=np.float64)
+    noms = np.array([etiquettes[c] for c in sorted(etiquettes)] + [""], dtype=object)
+    if len(cles) < 2:
+        position = np.zeros(len(valeurs), dtype=np.int64)
+    else:
+        # Clé voisine la plus proche, comme classes() de tool_precision
+        position = np.clip(np.searchsorted(cles, valeurs), 1, len(cles) - 1)
+        position = position - ((valeurs - cles[position - 1]) < (cles[position] - valeurs))
+    return noms[np.where(np.isnan(valeurs), len(cles), position)]
+
+
+def charger_etiquettes(fichier):
+    """Charge un fichier JSON {valeur: étiquette}."""
+    with open(fichier, "r", encoding="utf-8") as f:
+        return {float(k): v for k, v in json.load(f).items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Associe à des points la valeur des points convertis les plus proches.")
+    parser.add_argument("valeurs", help="CSV des points convertis (colonnes X, Y, Z)")
+    parser.add_argument("points", help="CSV des points à renseigner (colonnes X, Y)")
+    parser.add_argument("sortie", nargs="?", default="positions_with_values.csv", help="CSV de sortie")
+    parser.add_argument("-k", type=int, default=1, help="Nombre de voisins")
+    parser.add_argument("--methode", choices=["vote", "moyenne"], default="vote", help="Vote majoritaire ou moyenne pondérée")
+    parser.add_argument("--dist-max", type=float, default=None, help="Distance maximale au voisin")
+    parser.add_argument("--etiquettes", default=None, help="Fichier JSON {valeur: étiquette}")
+    parser.add_argument("--nom-x", default="X", help="Nom de la colonne X")
+    parser.add_argument("--nom-y", default="Y", help="Nom de la colonne Y")
+    parser.add_argument("--nom-z", default="Z", help="Nom de la colonne Z")
+    args = parser.parse_args()
+
+    # --- Charger les CSV ---
+    values = pd.read_csv(args.valeurs, usecols=[args.nom_x, args.nom_y, args.nom_z])
+    positions = pd.read_csv(args.points)
+
+    association = AssociationValeurs(values[[args.nom_x, args.nom_y]].values, values[args.nom_z].values)
+    valeurs, distances = association.associer(positions[[args.nom_x, args.nom_y]].values, args.k, args.methode, args.dist_max)
+
+    # --- Créer le DataFrame de sortie ---
+    output_df = positions.copy()
+    output_df[args.nom_z] = valeurs
+    output_df["distance"] = distances
+    if args.etiquettes:
+        output_df["Etiquette"] = appliquer_etiquettes(valeurs, charger_etiquettes(args.etiquettes))
+
+    # --- Sauvegarder en CSV ---
+    output_df.to_csv(args.sortie, index=False)
+
+    print(f"Fichier créé : {args.sortie}")
+    print(output_df.head())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+import argparse
+import json
+import os
+import queue
+import time
+import traceback
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import matplotlib
+matplotlib.use("Agg")  # Aucun affichage : les figures sont seulement enregistrées
+
+EXTENSIONS_IMAGES = (".png", ".jpg", ".jpeg", ".tif", ".tiff", ".bmp", ".gif")
+
+# Valeurs par défaut des paramètres de conversion et du Tif (mêmes que dans les fenêtres)
+CONVERSION_DEFAUT = {
+    "fichier_palette": "",
+    "fichier_sortie_image_palette": "Palette_interpolée",
+    "fichier_sortie_image_csv": "Nuage_points",
+    "fichier_sortie_csv": "Extraction_convertie",
+    "n_points_interpolation": "1000",
+    "n_ticks_yticks": "10",
+    "seuil_distance_couleur": "80",
+    "rendu_nuage": "points",
+    "espace_couleur": "RGB",
+    "colonne_X": "0",
+    "colonne_Y": "1",
+    "colonne_R": "2",
+    "colonne_G": "3",
+    "colonne_B": "4",
+    "nom_X": "X",
+    "nom_Y": "Y",
+    "nom_Z": "Z",
+    "conserver_distance": False,
+    "score_ambiguite": False,
+    "consensus": "aucun",
+    "taille_consensus": 3,
+}
+TIF_DEFAUT = {
+    "grid_res_x": "5000",
+    "grid_res_y": "5000",
+    "epsg": "32198",
+    "epsg_source": "",
+    "nom_X": "X",
+    "nom_Y": "Y",
+    "nom_Z": "Z",
+    "nom_distance": "distance",
+    "multi_bandes": False,
+}
+
+
+def charger_parametres(fichier):
+    """Paramètres enregistrés par le bouton « Sauvegarder les paramètres » d'une fenêtre."""
+    if not fichier:
+        return {}
+    with open(fichier, "r") as f:
+        return json.load(f)
+
+
+def appliquer_surcharges(parametres, surcharges):
+    """
+    Applique les surcharges « etape.cle=valeur » (etape : extraction, conversion ou tif).
+    La valeur est lue en JSON si possible (true, 2.5...), sinon gardée telle quelle.
+    """
+    for surcharge in surcharges:
+        if "=" not in surcharge or "." not in surcharge.split("=", 1)[0]:
+            raise ValueError(f"Surcharge invalide : {surcharge} (format attendu etape.cle=valeur)")
+        cle, valeur = surcharge.split("=", 1)
+        etape, cle = cle.split(".", 1)
+        if etape not in parametres:
+            raise ValueError(f"Étape inconnue dans la surcharge : {etape}")
+        try:
+            valeur = json.loads(valeur)
+        except ValueError:
+            pass
+        parametres[etape][cle] = valeur
+    return parametres
+
+
+def nom_travail(entree, noms_utilises):
+    """Nom du dossier de sortie d'une entrée, rendu unique si deux entrées ont le même nom."""
+    nom = os.path.splitext(os.path.basename(entree))[0]
+    candidat, i = nom, 1
+    while candidat in noms_utilises:
+        i += 1
+        candidat = f"{nom}_{i}"
+    noms_utilises.add(candidat)
+    return candidat
+
+
+@lru_cache(maxsize=16)
+def _palette_preparee(fichier_palette, taille, date, n_points, espace):
+    from interface_conversion import load_reference_palette, get_interpolated_palette, palette_tree
+
+    interp_palette = get_interpolated_palette(load_reference_palette(fichier_palette), n_points)
+    return interp_palette, palette_tree(interp_palette, espace)
+
+
+def preparer_palette(fichier_palette, n_points, espace="RGB"):
+    """
+    Palette interpolée et son index de correspondance (dans l'espace de couleur choisi), gardés en mémoire dans
+    le processus : les entrées suivantes avec la même palette (non modifiée) ne paient plus leur préparation.
+    """
+    stat = os.stat(fichier_palette)
+    return _palette_preparee(os.path.abspath(fichier_palette), stat.st_size, stat.st_mtime_ns, n_points, espace)
+
+
+def traiter_entree(entree, dossier_sortie, parametres, figures=True):
+    """
+    Enchaîne extraction -> conversion -> Tif pour une image (ou un CSV d'extraction) sans interface.
+    Exécutée dans un processus du pool : retourne le résumé du travail (durées, nombre de points, fichiers produits).
+    """
+    import pandas as pd
+    from interface_extraction import open_image, extract_colors
+    from interface_conversion import (convert_colors, consensus_voisinage, filter_conversion, load_reference_palette,
+                                      render_figures)
+    from tool_profilage import Profilage
+
+    resume = {"entree": entree, "dossier": dossier_sortie, "statut": "termine", "durees": {}, "sorties": {}}
+    profilage = Profilage("batch-" + os.path.basename(dossier_sortie))
+    debut = time.perf_counter()
+    try:
+        os.makedirs(dossier_sortie, exist_ok=True)
+        conversion = {**CONVERSION_DEFAUT, **parametres["conversion"]}
+
+        # === Extraction ===
+        t = time.perf_counter()
+        profilage.debut("Extraction")
+        if entree.lower().endswith(".csv"):
+            df = pd.read_csv(entree)
+        else:
+            df = extract_colors(open_image(entree), parametres["extraction"], entree)
+        resume["durees"]["extraction"] = time.perf_counter() - t
+        resume["points"] = len(df)
+        profilage.lignes(len(df))
+
+        # === Conversion ===
+        t = time.perf_counter()
+        if not conversion["fichier_palette"] or not os.path.exists(conversion["fichier_palette"]):
+            raise ValueError(f"Le fichier de palette n'existe pas : {conversion['fichier_palette']}")
+        colonnes = [int(conversion[c]) for c in ("colonne_X", "colonne_Y", "colonne_R", "colonne_G", "colonne_B")]
+        for col_index in colonnes:
+            if col_index >= len(df.columns):
+                raise ValueError(f"Indice de colonne {col_index} invalide. Le fichier ne contient pas autant de colonnes.")
+        profilage.debut("Interpolation de la palette")
+        interp_palette, tree = preparer_palette(conversion["fichier_palette"], int(conversion["n_points_interpolation"]),
+                                                conversion["espace_couleur"])
+        profilage.debut("Correspondance des couleurs")
+        df_correspondance = convert_colors(df, colonnes, interp_palette, tree, conversion["espace_couleur"],
+                                           bool(conversion["score_ambiguite"]))
+        if conversion["consensus"] != "aucun":
+            profilage.debut("Consensus de voisinage")
+            df_correspondance = consensus_voisinage(df_correspondance, float(conversion["seuil_distance_couleur"]),
+                                                    conversion["consensus"], int(conversion["taille_consensus"]),
+                                                    load_reference_palette(conversion["fichier_palette"])['value'].values)
+        profilage.debut("Seuil et noms des colonnes")
+        df_sortie = filter_conversion(df_correspondance, float(conversion["seuil_distance_couleur"]), conversion["nom_X"],
+                                      conversion["nom_Y"], conversion["nom_Z"], bool(conversion["conserver_distance"]))
+        profilage.debut("Écriture du CSV")
+        profilage.lignes(len(df_sortie))
+        fichier_csv = os.path.join(dossier_sortie, conversion["fichier_sortie_csv"] + ".csv")
+        df_sortie.to_csv(fichier_csv, index=False)
+        resume["durees"]["conversion"] = time.perf_counter() - t
+        resume["points_retenus"] = len(df_sortie)
+        resume["sorties"]["csv"] = fichier_csv
+
+        # === Figures ===
+        if figures:
+            t = time.perf_counter()
+            profilage.debut("Tracé des figures")
+            figures_queue = queue.Queue()
+            render_figures(interp_palette, int(conversion["n_ticks_yticks"]),
+                           os.path.join(dossier_sortie, conversion["fichier_sortie_image_palette"] + ".png"),
+                           df_sortie, conversion["nom_X"], conversion["nom_Y"], conversion["nom_Z"],
+                           os.path.join(dossier_sortie, conversion["fichier_sortie_image_csv"] + ".png"),
+                           conversion["rendu_nuage"], figures_queue)
+            message = figures_queue.get_nowait()
+            if message[0] == "erreur":
+                raise RuntimeError(f"Erreur lors du tracé des figures : {message[1]}")
+            resume["durees"]["figures"] = time.perf_counter() - t
+            resume["sorties"]["figures"] = message[1]
+
+        # === Tif ===
+        if parametres["tif"] is not None:
+            from interface_tif import generate_tif
+
+            t = time.perf_counter()
+            profilage.fin()  # generate_tif écrit son propre rapport par étape
+            tif = {**TIF_DEFAUT, **parametres["tif"]}
+            fichier_tif = os.path.join(dossier_sortie, os.path.basename(dossier_sortie) + ".tif")
+            progress_queue = queue.Queue()
+            generate_tif(df_sortie, tif["nom_X"], tif["nom_Y"], tif["nom_Z"], int(tif["grid_res_x"]),
+                         int(tif["grid_res_y"]), str(tif["epsg"]), fichier_tif, progress_queue,
+                         bool(tif["multi_bandes"]), tif["nom_distance"], str(tif["epsg_source"]))
+            message = None
+            while not progress_queue.empty():
+                message = progress_queue.get_nowait()
+            if message is None or message[0] != "termine":
+                raise RuntimeError(f"Erreur lors de la création du Tif : {message[1] if message else 'aucun résultat'}")
+            resume["durees"]["tif"] = time.perf_counter() - t
+            resume["sorties"]["tif"] = fichier_tif
+
+    except Exception as e:
+        resume["statut"] = "erreur"
+        resume["erreur"] = str(e)
+        resume["trace"] = traceback.format_exc()
+
+    resume["durees"]["total"] = time.perf_counter() - debut
+    rapport = profilage.ecrire(resume["statut"])
+    if rapport:
+        resume["sorties"]["profilage"] = rapport
+    return resume
+
+
+def lister_entrees(chemins):
+    """Images et CSV d'extraction donnés directement ou contenus dans les dossiers donnés."""
+    entrees = []
+    for chemin in chemins:
+        if os.path.isdir(chemin):
+            entrees.extend(os.path.join(chemin, nom) for nom in sorted(os.listdir(chemin))
+                           if nom.lower().endswith(EXTENSIONS_IMAGES + (".csv",)))
+        else:
+            entrees.append(chemin)
+    return entrees
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Traite des cartes sans interface : extraction -> conversion -> Tif, en parallèle, "
+                    "avec les fichiers de paramètres JSON enregistrés depuis les fenêtres.")
+    parser.add_argument("entrees", nargs="+", help="Images, CSV d'extraction ou dossiers à traiter")
+    parser.add_argument("--extraction", default=None, help="Paramètres de la fenêtre d'extraction (JSON)")
+    parser.add_argument("--conversion", required=True, help="Paramètres de la fenêtre de conversion (JSON)")
+    parser.add_argument("--tif", default=None, help="Paramètres de la fenêtre Tif (JSON) ; pas de Tif si absent")
+    parser.add_argument("--palette", default=None, help="Fichier palette, remplace celui des paramètres de conversion")
+    parser.add_argument("--set", dest="surcharges", action="append", default=[], metavar="ETAPE.CLE=VALEUR",
+                        help="Remplace un paramètre, par exemple conversion.seuil_distance_couleur=60 (répétable)")
+    parser.add_argument("--sortie", default="resultats", help="Dossier de sortie (un sous-dossier par entrée)")
+    parser.add_argument("--processus", type=int, default=os.cpu_count(), help="Nombre de processus en parallèle")
+    parser.add_argument("--resume", default=None, help="Fichier JSON du résumé (par défaut resume_batch.json dans la sortie)")
+    parser.add_argument("--sans-figures", action="store_true", help="Ne trace pas la palette et le nuage de points")
+    parser.add_argument("--profilage", default=None, metavar="DOSSIER",
+                        help="Écrit un rapport de mesures par étape pour chaque entrée dans ce dossier")
+    parser.add_argument("--cprofile", action="store_true", help="Avec --profilage, enregistre aussi un profil cProfile")
+    args = parser.parse_args()
+
+    if args.profilage:
+        from tool_profilage import activer
+        activer(True, args.cprofile, os.path.abspath(args.profilage))
+
+    parametres = {
+        "extraction": charger_parametres(args.extraction),
+        "conversion": charger_parametres(args.conversion),
+        "tif": charger_parametres(args.tif) if args.tif else None,
+    }
+    if args.palette:
+        parametres["conversion"]["fichier_palette"] = args.palette
+    if parametres["tif"] is None and any(s.startswith("tif.") for s in args.surcharges):
+        parametres["tif"] = {}
+    appliquer_surcharges(parametres, args.surcharges)
+
+    entrees = lister_entrees(args.entrees)
+    os.makedirs(args.sortie, exist_ok=True)
+    fichier_resume = args.resume or os.path.join(args.sortie, "resume_batch.json")
+
+    noms_utilises = set()
+    travaux = [(entree, os.path.join(args.sortie, nom_travail(entree, noms_utilises))) for entree in entrees]
+
+    debut = time.perf_counter()
+    resultats = []
+    with ProcessPoolExecutor(max_workers=max(1, args.processus)) as pool:
+        futures = {pool.submit(traiter_entree, entree, dossier, parametres, not args.sans_figures): entree
+                   for entree, dossier in travaux}
+        for future in as_completed(futures):
+            resume = future.result()
+            resultats.append(resume)
+            etat = "OK" if resume["statut"] == "termine" else f"ERREUR : {resume['erreur']}"
+            print(f"[{len(resultats)}/{len(travaux)}] {resume['entree']} ({resume['durees']['total']:.1f} s) {etat}")
+
+    duree = time.perf_counter() - debut
+    resultats.sort(key=lambda r: entrees.index(r["entree"]))
+    erreurs = sum(r["statut"] != "termine" for r in resultats)
+    with open(fichier_resume, "w") as f:
+        json.dump({
+            "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "duree": duree,
+            "processus": args.processus,
+            "parametres": parametres,
+            "entrees": len(resultats),
+            "erreurs": erreurs,
+            "travaux": resultats,
+        }, f, indent=4, ensure_ascii=False, default=str)
+
+    print(f"{len(resultats) - erreurs}/{len(resultats)} entrées traitées en {duree:.1f} s. Résumé : {fichier_resume}")
+    return 1 if erreurs else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
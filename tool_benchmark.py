@@ -0,0 +1,234 @@
+import argparse
+import json
+import os
+import platform
+import queue
+import subprocess
+import tempfile
+import time
+import tracemalloc
+import matplotlib
+matplotlib.use("Agg")
+import numpy as np
+import pandas as pd
+from PIL import Image
+
+from tool_cache import cache
+from interface_extraction import extract_colors
+from interface_conversion import (interpolate_palette, match_color_to_value, match_colors_to_values, plot_scatter,
+                                  load_reference_palette)
+from interface_tif import generate_tif
+
+Image.MAX_IMAGE_PIXELS = None  # Les grandes cartes synthétiques dépassent la limite de PIL
+cache.actif = False  # Mesure des calculs eux-mêmes, sans le cache des résultats intermédiaires
+
+# === Données synthétiques ===
+
+def generer_palette(n_couleurs, valeur_min=0.0, valeur_max=100.0, colormap="viridis"):
+    """Palette connue : n_couleurs valeurs régulières et les couleurs d'une colormap matplotlib."""
+    valeurs = np.linspace(valeur_min, valeur_max, n_couleurs)
+    couleurs = np.round(matplotlib.colormaps[colormap](np.linspace(0, 1, n_couleurs))[:, :3] * 255).astype(int)
+    return pd.DataFrame({"value": valeurs, "r": couleurs[:, 0], "g": couleurs[:, 1], "b": couleurs[:, 2]})
+
+
+def ecrire_palette(palette, fichier):
+    """Écrit la palette au format lu par load_reference_palette (valeur,R,G,B)."""
+    with open(fichier, "w") as f:
+        for _, ligne in palette.iterrows():
+            f.write(f"{ligne['value']},{int(ligne['r'])},{int(ligne['g'])},{int(ligne['b'])}\n")
+
+
+def champ_valeurs(largeur, hauteur, valeur_min=0.0, valeur_max=100.0, graine=0):
+    """Champ de valeurs lisse (somme de sinusoïdes aléatoires) couvrant [valeur_min, valeur_max], de forme (hauteur, largeur)."""
+    rng = np.random.default_rng(graine)
+    y, x = np.meshgrid(np.linspace(0, 1, hauteur, dtype=np.float32), np.linspace(0, 1, largeur, dtype=np.float32),
+                       indexing="ij")
+    champ = np.zeros((hauteur, largeur), dtype=np.float32)
+    for _ in range(4):
+        fx, fy, phase = rng.uniform(0.5, 3, 2).tolist() + [rng.uniform(0, 2 * np.pi)]
+        champ += np.sin(2 * np.pi * (fx * x + fy * y) + phase)
+    champ -= champ.min()
+    champ /= champ.max() or 1
+    return valeur_min + champ * (valeur_max - valeur_min)
+
+
+def generer_carte(largeur, hauteur, palette, bruit=0.0, graine=0):
+    """
+    Carte synthétique : chaque pixel prend la couleur de la valeur de palette la plus proche du champ,
+    plus un bruit gaussien d'écart-type bruit (en niveaux RGB). Retourne l'image et le champ de valeurs.
+    """
+    valeurs_palette = palette["value"].values
+    champ = champ_valeurs(largeur, hauteur, valeurs_palette.min(), valeurs_palette.max(), graine)
+    indices = np.clip(np.searchsorted(valeurs_palette, champ), 1, len(valeurs_palette) - 1)
+    indices -= (champ - valeurs_palette[indices - 1]) < (valeurs_palette[indices] - champ)
+    rgb = palette[["r", "g", "b"]].values.astype(np.uint8)[indices]
+    if bruit > 0:
+        rng = np.random.default_rng(graine + 1)
+        rgb = np.clip(rgb + rng.normal(0, bruit, rgb.shape).astype(np.float32), 0, 255).astype(np.uint8)
+    return Image.fromarray(rgb, "RGB"), champ
+
+
+def parametres_extraction(lon_min=-70.0, lat_min=45.0, lon_max=-69.0, lat_max=46.0, pas=1):
+    """Paramètres de la fenêtre d'extraction géoréférençant la carte par ses coins Nord-Ouest et Sud-Est."""
+    return {
+        "Longueur Réelle X": 1, "Longueur Pixels X": 1, "Valeur Offset X": 0, "Pixel Offset X": 0,
+        "Longueur Réelle Y": 1, "Longueur Pixels Y": 1, "Valeur Offset Y": 0, "Pixel Offset Y": 0,
+        "Pas Echantillonage": pas,
+        "Coordonnées Nord-Ouest (°)": f"{lon_min}, {lat_max}",
+        "Coordonnées Sud-Est (°)": f"{lon_max}, {lat_min}",
+        "Coordonnées Sud-Ouest (°)": "", "Coordonnées Nord-Est (°)": "",
+    }
+
+
+def dimensions(n_pixels, rapport=4 / 3):
+    largeur = max(2, int(round(np.sqrt(n_pixels * rapport))))
+    return largeur, max(2, int(round(n_pixels / largeur)))
+
+
+# === Mesures ===
+
+def mesurer(fonction, memoire=True):
+    """Exécute fonction et retourne (résultat, durée en s, pic mémoire Python en octets ou None)."""
+    debut = time.perf_counter()
+    resultat = fonction()
+    duree = time.perf_counter() - debut
+    pic = None
+    if memoire:
+        # Deuxième exécution sous tracemalloc, pour ne pas fausser la durée
+        tracemalloc.start()
+        fonction()
+        pic = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return resultat, duree, pic
+
+
+def lancer_generate_tif(df, dossier, resolution):
+    progress_queue = queue.Queue()
+    fichier = os.path.join(dossier, "benchmark.tif")
+    generate_tif(df, "X", "Y", "Z", resolution, resolution, "4326", fichier, progress_queue)
+    message = None
+    while not progress_queue.empty():
+        message = progress_queue.get_nowait()
+    if message is None or message[0] != "termine":
+        raise RuntimeError(f"generate_tif : {message[1] if message else 'aucun résultat'}")
+
+
+def benchmark_taille(n_pixels, args, dossier):
+    """
+    Mesure chaque étape pour une carte de n_pixels ; retourne la liste des mesures.
+    L'extraction porte sur l'image entière (la fenêtre d'extraction la réduit d'abord à sa taille d'affichage).
+    """
+    largeur, hauteur = dimensions(n_pixels)
+    palette = generer_palette(args.couleurs)
+    fichier_palette = os.path.join(dossier, "palette.txt")
+    ecrire_palette(palette, fichier_palette)
+    image, _ = generer_carte(largeur, hauteur, palette, args.bruit, args.graine)
+    parametres = parametres_extraction()
+    mesures = []
+
+    def noter(etape, lignes, duree, pic):
+        mesures.append({"pixels": largeur * hauteur, "largeur": largeur, "hauteur": hauteur, "etape": etape,
+                        "lignes": lignes, "secondes": duree, "debit": lignes / duree if duree > 0 else None,
+                        "memoire_max": pic})
+        print(f"{largeur * hauteur:>12} px  {etape:<24} {duree:>9.3f} s  {lignes / max(duree, 1e-9):>14,.0f} lignes/s")
+
+    df, duree, pic = mesurer(lambda: extract_colors(image, parametres), args.memoire)
+    noter("extraction", len(df), duree, pic)
+
+    if len(df) <= args.max_csv:
+        fichier_csv = os.path.join(dossier, "extraction.csv")
+        _, duree, pic = mesurer(lambda: df.to_csv(fichier_csv, index=False), args.memoire)
+        noter("ecriture_csv", len(df), duree, pic)
+
+    reference = load_reference_palette(fichier_palette)
+    interp_palette, duree, pic = mesurer(lambda: interpolate_palette(reference, args.points_interpolation), args.memoire)
+    noter("interpolate_palette", args.points_interpolation, duree, pic)
+
+    # Correspondance ligne par ligne (comme la fenêtre de conversion), sur un échantillon
+    echantillon = df.iloc[:min(len(df), args.max_lignes_boucle)]
+    _, duree, pic = mesurer(lambda: [match_color_to_value(r, g, b, interp_palette)
+                                     for r, g, b in echantillon[["R", "G", "B"]].values], args.memoire)
+    noter("match_color_to_value", len(echantillon), duree, pic)
+
+    (z, distances), duree, pic = mesurer(lambda: match_colors_to_values(df[["R", "G", "B"]].values, interp_palette),
+                                         args.memoire)
+    noter("match_colors_to_values", len(df), duree, pic)
+
+    df_valeurs = pd.DataFrame({"X": df["X"].values, "Y": df["Y"].values, "Z": z})
+    fichier_nuage = os.path.join(dossier, "nuage.png")
+    for rendu in args.rendus:
+        if rendu == "points" and len(df_valeurs) > args.max_points_nuage:
+            continue
+        _, duree, pic = mesurer(lambda: plot_scatter(df_valeurs, "X", "Y", "Z", interp_palette, fichier_nuage, rendu),
+                                args.memoire)
+        noter(f"plot_scatter_{rendu}", len(df_valeurs), duree, pic)
+
+    _, duree, pic = mesurer(lambda: lancer_generate_tif(df_valeurs, dossier, args.resolution_tif), args.memoire)
+    noter("generate_tif", len(df_valeurs), duree, pic)
+    return mesures
+
+
+def version_code():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def comparer(ancien, nouveau):
+    """Affiche le rapport des durées entre deux fichiers de résultats (même taille et même étape)."""
+    anciennes = {(m["pixels"], m["etape"]): m["secondes"] for m in ancien["resultats"]}
+    print(f"\nComparaison avec {ancien.get('version')} ({ancien.get('date')}) :")
+    for mesure in nouveau["resultats"]:
+        cle = (mesure["pixels"], mesure["etape"])
+        if cle in anciennes and mesure["secondes"] > 0:
+            rapport = anciennes[cle] / mesure["secondes"]
+            print(f"{cle[0]:>12} px  {cle[1]:<24} x{rapport:.2f} {'(plus lent)' if rapport < 0.9 else ''}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mesure la vitesse et la mémoire de chaque étape sur des cartes synthétiques.")
+    parser.add_argument("--tailles", nargs="+", type=float, default=[1e4, 1e5, 1e6],
+                        help="Nombres de pixels des cartes (jusqu'à 1e8)")
+    parser.add_argument("--couleurs", type=int, default=20, help="Nombre de couleurs de la palette")
+    parser.add_argument("--bruit", type=float, default=5.0, help="Écart-type du bruit ajouté aux couleurs (niveaux RGB)")
+    parser.add_argument("--graine", type=int, default=0, help="Graine du générateur aléatoire")
+    parser.add_argument("--points-interpolation", type=int, default=1000, help="Points de la palette interpolée")
+    parser.add_argument("--resolution-tif", type=int, default=1000, help="Résolution de la grille du Tif")
+    parser.add_argument("--rendus", nargs="+", default=["points", "moyenne"], help="Rendus de plot_scatter mesurés")
+    parser.add_argument("--max-lignes-boucle", type=int, default=10000,
+                        help="Lignes mesurées pour la correspondance ligne par ligne")
+    parser.add_argument("--max-points-nuage", type=int, default=1_000_000,
+                        help="Nombre maximal de points pour le rendu « points »")
+    parser.add_argument("--max-csv", type=int, default=10_000_000, help="Nombre maximal de lignes pour l'écriture CSV")
+    parser.add_argument("--sans-memoire", dest="memoire", action="store_false",
+                        help="Ne mesure pas le pic mémoire (chaque étape n'est alors exécutée qu'une fois)")
+    parser.add_argument("--sortie", default="benchmark.json", help="Fichier JSON des résultats")
+    parser.add_argument("--comparer", default=None, help="Résultats d'une version précédente à comparer")
+    args = parser.parse_args()
+
+    resultats = []
+    with tempfile.TemporaryDirectory() as dossier:
+        for taille in args.tailles:
+            resultats.extend(benchmark_taille(int(taille), args, dossier))
+
+    sortie = {
+        "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "version": version_code(),
+        "machine": {"python": platform.python_version(), "systeme": platform.platform(), "processeurs": os.cpu_count(),
+                    "numpy": np.__version__, "pandas": pd.__version__},
+        "parametres": {k: v for k, v in vars(args).items() if k not in ("sortie", "comparer")},
+        "resultats": resultats,
+    }
+    with open(args.sortie, "w") as f:
+        json.dump(sortie, f, indent=4)
+    print(f"Résultats : {args.sortie}")
+
+    if args.comparer:
+        with open(args.comparer, "r") as f:
+            comparer(json.load(f), sortie)
+
+
+if __name__ == "__main__":
+    main()
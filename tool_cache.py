@@ -0,0 +1,151 @@
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+import numpy as np
+import pandas as pd
+from tool_projet import Projet, sauvegarder_projet
+
+# Dossier et taille maximale (en octets) du cache des résultats intermédiaires
+DOSSIER_CACHE = os.environ.get("CONVERSION_RGB_CACHE", os.path.join(os.path.expanduser("~"), ".conversion_rgb_cache"))
+TAILLE_MAX = int(os.environ.get("CONVERSION_RGB_CACHE_TAILLE", 2 * 1024 ** 3))
+CACHE_ACTIF = os.environ.get("CONVERSION_RGB_CACHE_DESACTIVE", "") == ""
+# Âge (en secondes) au-delà duquel un fichier temporaire est celui d'un écrivain interrompu
+AGE_TEMPORAIRE = 3600
+
+
+def empreinte(element, h):
+    """Ajoute à l'empreinte h le contenu d'un élément (DataFrame, tableau, chemin de fichier ou valeur JSON)."""
+    if isinstance(element, pd.DataFrame):
+        h.update(json.dumps([str(c) for c in element.columns]).encode())
+        h.update(pd.util.hash_pandas_object(element, index=False).values.tobytes())
+    elif isinstance(element, np.ndarray):
+        h.update(str((element.dtype, element.shape)).encode())
+        h.update(np.ascontiguousarray(element).tobytes())
+    elif isinstance(element, str) and os.path.isfile(element):
+        # Fichier : chemin, taille et date de modification, sans relire son contenu
+        stat = os.stat(element)
+        h.update(json.dumps([os.path.abspath(element), stat.st_size, stat.st_mtime_ns]).encode())
+    else:
+        h.update(json.dumps(element, sort_keys=True, default=str).encode())
+    h.update(b"|")
+
+
+class CacheResultats:
+    """
+    Cache disque des étapes longues (extraction, interpolation de la palette, correspondance, grille).
+    Chaque résultat est rangé sous l'empreinte de ses entrées et paramètres ; les résultats
+    les moins récemment utilisés sont supprimés quand la taille du cache dépasse taille_max.
+    """
+
+    def __init__(self, dossier=DOSSIER_CACHE, taille_max=TAILLE_MAX, actif=CACHE_ACTIF):
+        self.dossier = dossier
+        self.taille_max = taille_max
+        self.actif = actif
+
+    def cle(self, etape, *elements):
+        h = hashlib.sha256(etape.encode())
+        for element in elements:
+            empreinte(element, h)
+        return f"{etape}-{h.hexdigest()[:32]}"
+
+    def chemin(self, cle):
+        return os.path.join(self.dossier, cle + ".crgb")
+
+    def get(self, cle):
+        """Résultat en cache (tableaux projetés en mémoire) ou None."""
+        if not self.actif or not os.path.exists(self.chemin(cle)):
+            return None
+        try:
+            with Projet(self.chemin(cle)) as projet:
+                resultat = projet.charger("resultat")
+            os.utime(self.chemin(cle))  # Marque le résultat comme récemment utilisé
+            return resultat
+        except Exception:
+            return None
+
+    def put(self, cle, resultat):
+        if not self.actif:
+            return
+        os.makedirs(self.dossier, exist_ok=True)
+        # Fichier temporaire propre à l'écrivain : plusieurs processus peuvent calculer la même étape en même temps
+        temporaire = f"{self.chemin(cle)}.{os.getpid()}-{threading.get_ident()}.tmp"
+        sauvegarder_projet(temporaire, {"resultat": resultat})
+        try:
+            os.replace(temporaire, self.chemin(cle))
+        except FileNotFoundError:
+            return  # Cache vidé pendant l'écriture : le résultat n'est simplement pas gardé
+        self.evict()
+
+    def entrees(self):
+        """Liste (date d'utilisation, taille, chemin) des résultats en cache."""
+        if not os.path.isdir(self.dossier):
+            return []
+        entrees = []
+        for nom in os.listdir(self.dossier):
+            if nom.endswith(".crgb"):
+                stat = os.stat(os.path.join(self.dossier, nom))
+                entrees.append((stat.st_mtime, stat.st_size, os.path.join(self.dossier, nom)))
+        return entrees
+
+    def supprimer_temporaires(self, age_min=0):
+        """
+        Supprime les fichiers temporaires plus anciens que age_min secondes, laissés par un écrivain
+        interrompu (processus annulé pendant put).
+        """
+        if not os.path.isdir(self.dossier):
+            return
+        limite = time.time() - age_min
+        for nom in os.listdir(self.dossier):
+            chemin = os.path.join(self.dossier, nom)
+            try:
+                if nom.endswith(".tmp") and os.path.getmtime(chemin) <= limite:
+                    os.remove(chemin)
+            except OSError:
+                pass  # Déjà remplacé par son écrivain, ou encore ouvert sous Windows
+
+    def evict(self):
+        """
+        Supprime les fichiers temporaires abandonnés, puis les résultats les moins récemment utilisés
+        jusqu'à repasser sous taille_max.
+        """
+        self.supprimer_temporaires(AGE_TEMPORAIRE)
+        entrees = sorted(self.entrees())
+        taille = sum(e[1] for e in entrees)
+        for _, taille_entree, chemin in entrees:
+            if taille <= self.taille_max:
+                break
+            try:
+                os.remove(chemin)
+                taille -= taille_entree
+            except OSError:
+                pass  # Fichier encore ouvert (projeté en mémoire) sous Windows
+
+    def vider(self):
+        self.supprimer_temporaires()
+        for _, _, chemin in self.entrees():
+            try:
+                os.remove(chemin)
+            except OSError:
+                pass
+
+
+cache = CacheResultats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Affiche ou vide le cache des résultats intermédiaires.")
+    parser.add_argument("--vider", action="store_true", help="Supprime tous les résultats en cache")
+    args = parser.parse_args()
+
+    if args.vider:
+        cache.vider()
+    entrees = cache.entrees()
+    print(f"Cache : {cache.dossier}")
+    print(f"{len(entrees)} résultats, {sum(e[1] for e in entrees) / 1e6:.1f} Mo / {cache.taille_max / 1e6:.0f} Mo")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import argparse
+import numpy as np
+import pandas as pd
+import matplotlib
+import matplotlib.pyplot as plt
+import matplotlib.colors as mcolors
+from interface_conversion import load_reference_palette, rasteriser_points, dimensions_grille
+from tool_associer_points_valeur import charger_etiquettes
+
+
+def create_listed_cmap(palette_df):
+    """Colormap discrète (une couleur par valeur de la palette, par valeurs croissantes) et sa normalisation."""
+    palette_sorted = palette_df.sort_values(by="value", ascending=True).reset_index(drop=True)
+    cmap = mcolors.ListedColormap(palette_sorted[['r', 'g', 'b']].values / 255.0)
+    cmap.set_bad(alpha=0)  # Cellules vides transparentes
+    norm = mcolors.BoundaryNorm(np.arange(len(palette_sorted) + 1) - 0.5, len(palette_sorted))
+    return cmap, norm, palette_sorted['value'].values
+
+
+def plot_categorical_map(x, y, z, palette_df, output_file=None, etiquettes=None, largeur=1000,
+                         titre="Carte des compositions", nom_x="Longitude (°)", nom_y="Latitude (°)", nom_z="Composition"):
+    """
+    Trace une carte des catégories : les points sont rastérisés (mode par cellule) puis affichés avec imshow,
+    ce qui rend le temps de tracé indépendant du nombre de points. La grille suit l'espacement des points,
+    avec au plus largeur cellules en largeur, pour que des points épars restent visibles.
+    """
+    cmap, norm, valeurs_palette = create_listed_cmap(palette_df)
+
+    # Indice de la valeur de palette la plus proche pour chaque point
+    z = np.asarray(z, dtype=np.float64)
+    position = np.clip(np.searchsorted(valeurs_palette, z), 1, len(valeurs_palette) - 1)
+    codes = np.where(np.abs(z - valeurs_palette[position - 1]) <= np.abs(z - valeurs_palette[position]), position - 1, position)
+    codes = np.where(np.isnan(z), np.nan, codes)
+
+    x_min, x_max, y_min, y_max = np.nanmin(x), np.nanmax(x), np.nanmin(y), np.nanmax(y)
+    hauteur_max = max(1, int(round(largeur * (y_max - y_min) / ((x_max - x_min) or 1))))
+    valides = ~np.isnan(codes)
+    largeur, hauteur = dimensions_grille(np.asarray(x)[valides], np.asarray(y)[valides], largeur, hauteur_max)
+    grille, etendue = rasteriser_points(x, y, codes, largeur, hauteur, "mode", (x_min, x_max, y_min, y_max))
+
+    fig, ax = plt.subplots(figsize=(10, 8))
+    image = ax.imshow(grille, origin="lower", extent=etendue, cmap=cmap, norm=norm, interpolation="nearest")
+
+    # --- Colorbar ---
+    cbar = fig.colorbar(image, ax=ax, ticks=range(len(valeurs_palette)))
+    if etiquettes:
+        cbar.ax.set_yticklabels([etiquettes.get(v, v) for v in valeurs_palette])
+    else:
+        cbar.ax.set_yticklabels([f"{v:g}" for v in valeurs_palette])
+    cbar.set_label(nom_z, fontsize=12)
+
+    ax.set_xlabel(nom_x, fontsize=12)
+    ax.set_ylabel(nom_y, fontsize=12)
+    ax.set_title(titre, fontsize=14)
+    ax.set_aspect('equal')
+
+    fig.tight_layout()
+    if output_file:
+        fig.savefig(output_file, dpi=150)
+        plt.close(fig)
+    return fig
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Trace une carte des catégories à partir d'un CSV de points.")
+    parser.add_argument("points", help="CSV des points classés")
+    parser.add_argument("palette", help="Fichier palette (valeur,R,G,B)")
+    parser.add_argument("sortie", nargs="?", default=None, help="Image de sortie (affichage si absent)")
+    parser.add_argument("--etiquettes", default=None, help="Fichier JSON {valeur: étiquette}")
+    parser.add_argument("--largeur", type=int, default=1000, help="Nombre maximal de cellules en largeur")
+    parser.add_argument("--nom-x", default="Longitude (°)", help="Nom de la colonne X")
+    parser.add_argument("--nom-y", default="Latitude (°)", help="Nom de la colonne Y")
+    parser.add_argument("--nom-z", default="Composition", help="Nom de la colonne des valeurs ou des étiquettes")
+    args = parser.parse_args()
+
+    if args.sortie:
+        matplotlib.use("Agg")
+
+    df = pd.read_csv(args.points)
+    etiquettes = charger_etiquettes(args.etiquettes) if args.etiquettes else None
+
+    z = df[args.nom_z]
+    if z.dtype == object and etiquettes:
+        # Les étiquettes sont reconverties en valeurs
+        z = z.map({v: k for k, v in etiquettes.items()})
+
+    plot_categorical_map(df[args.nom_x].values, df[args.nom_y].values, z.values.astype(np.float64),
+                         load_reference_palette(args.palette), args.sortie, etiquettes, args.largeur,
+                         nom_x=args.nom_x, nom_y=args.nom_y, nom_z=args.nom_z)
+    if not args.sortie:
+        plt.show()
+
+
+if __name__ == "__main__":
+    main()
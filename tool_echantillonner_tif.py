@@ -0,0 +1,88 @@
+import argparse
+import numpy as np
+import pandas as pd
+import rasterio
+from rasterio.windows import Window
+
+# Taille (en pixels) des fenêtres lues dans le Tif
+TAILLE_FENETRE = 512
+
+
+def echantillonner_tif(fichier_tif, x, y, methode="plus_proche", bande=1, taille_fenetre=TAILLE_FENETRE):
+    """
+    Lit la valeur du Tif aux points (x, y), exprimés dans le système de coordonnées du Tif.
+    Seules les fenêtres du raster contenant des points sont lues.
+    methode : "plus_proche" (pixel contenant le point) ou "bilineaire".
+    Les points hors du raster ou sur une cellule sans donnée valent NaN.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    resultat = np.full(len(x), np.nan)
+
+    with rasterio.open(fichier_tif) as src:
+        cols, rows = ~src.transform * (x, y)
+        dedans = (cols >= 0) & (cols < src.width) & (rows >= 0) & (rows < src.height)
+
+        if methode == "bilineaire":
+            # Coordonnées relatives aux centres des pixels
+            cols = np.clip(cols - 0.5, 0, src.width - 1)
+            rows = np.clip(rows - 0.5, 0, src.height - 1)
+        elif methode != "plus_proche":
+            raise ValueError(f"Méthode d'échantillonnage inconnue : {methode}")
+        col0 = np.floor(cols).astype(np.int64)
+        row0 = np.floor(rows).astype(np.int64)
+
+        # Regrouper les points par fenêtre
+        indices = np.flatnonzero(dedans)
+        fenetres, groupes = np.unique(np.column_stack((row0[indices] // taille_fenetre, col0[indices] // taille_fenetre)),
+                                      axis=0, return_inverse=True)
+        # Tri unique des points par fenêtre : chaque fenêtre est une tranche contiguë (pas de parcours par fenêtre)
+        ordre = np.argsort(groupes.ravel(), kind="stable")
+        bornes = np.searchsorted(groupes.ravel()[ordre], np.arange(1, len(fenetres)))
+        points_fenetres = np.split(indices[ordre], bornes)
+
+        for (fr, fc), idx in zip(fenetres, points_fenetres):
+            row_off, col_off = fr * taille_fenetre, fc * taille_fenetre
+            # Une ligne et une colonne de plus pour l'interpolation bilinéaire en bord de fenêtre
+            window = Window(col_off, row_off,
+                            min(taille_fenetre + 1, src.width - col_off), min(taille_fenetre + 1, src.height - row_off))
+            data = src.read(bande, window=window, masked=True).astype(np.float64).filled(np.nan)
+
+            r = row0[idx] - row_off
+            c = col0[idx] - col_off
+            if methode == "plus_proche":
+                resultat[idx] = data[r, c]
+            else:
+                r1 = np.minimum(r + 1, data.shape[0] - 1)
+                c1 = np.minimum(c + 1, data.shape[1] - 1)
+                dr = rows[idx] - row0[idx]
+                dc = cols[idx] - col0[idx]
+                resultat[idx] = ((1 - dr) * (1 - dc) * data[r, c] + (1 - dr) * dc * data[r, c1] +
+                                 dr * (1 - dc) * data[r1, c] + dr * dc * data[r1, c1])
+
+    return resultat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lit les valeurs d'un Tif aux positions d'un CSV de points.")
+    parser.add_argument("tif", help="Tif créé par la fenêtre de création d'un Tif")
+    parser.add_argument("points", help="CSV des points (colonnes X, Y)")
+    parser.add_argument("sortie", nargs="?", default="points_echantillonnes.csv", help="CSV de sortie")
+    parser.add_argument("--methode", choices=["plus_proche", "bilineaire"], default="plus_proche")
+    parser.add_argument("--bande", type=int, default=1, help="Bande du Tif à lire")
+    parser.add_argument("--nom-x", default="X", help="Nom de la colonne X")
+    parser.add_argument("--nom-y", default="Y", help="Nom de la colonne Y")
+    parser.add_argument("--nom-z", default="Z", help="Nom de la colonne de sortie")
+    args = parser.parse_args()
+
+    positions = pd.read_csv(args.points)
+    positions[args.nom_z] = echantillonner_tif(args.tif, positions[args.nom_x].values, positions[args.nom_y].values,
+                                               args.methode, args.bande)
+    positions.to_csv(args.sortie, index=False)
+
+    print(f"Fichier créé : {args.sortie}")
+    print(positions.head())
+
+
+if __name__ == "__main__":
+    main()
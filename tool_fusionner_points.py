@@ -1,67 +1,165 @@
+import argparse
+import numpy as np
 import pandas as pd
-from sklearn.neighbors import NearestNeighbors
-
-# Distance maximale (en degrés GPS) pour considérer deux points comme voisins
-# 0.0003 ≈ 30 mètres
-DIST_MAX = 0.00095
-
-# Charger CSV
-df = pd.read_csv('/Users/sylvain/Desktop/These/Etude Sédimentaire/Sources/MDN/liste_points.csv')
-
-coords = df[["X", "Y"]].values
-
-# Construire graphe de voisinage
-nbrs = NearestNeighbors(radius=DIST_MAX).fit(coords)
-distances, indices = nbrs.radius_neighbors(coords)
-
-# --- Trouver les groupes de points connectés ---
-visited = set()
-groups = []
-
-for i in range(len(coords)):
-    if i in visited:
-        continue
-
-    stack = [i]
-    group = []
-
-    while stack:
-        p = stack.pop()
-        if p in visited:
-            continue
-        visited.add(p)
-        group.append(p)
-
-        # Ajouter ses voisins dans la pile
-        for neigh in indices[p]:
-            if neigh not in visited:
-                stack.append(neigh)
-
-    groups.append(group)
-
-# --- Calcul du centre pour chaque groupe ---
-merged_points = []
-
-for group in groups:
-    if len(group) == 1:
-        # garder tel quel
-        p = df.iloc[group[0]]
-        merged_points.append([p.X, p.Y, p.Z])
-        continue
-
-    # points à fusionner
-    subset = df.iloc[group]
-
-    # centre moyen
-    Xc = subset["X"].mean()
-    Yc = subset["Y"].mean()
-    Zc = subset["Z"].mean()
-
-    merged_points.append([Xc, Yc, Zc])
-
-# --- Export final ---
-result = pd.DataFrame(merged_points, columns=["X", "Y", "Z"])
-result.to_csv("points_fusionnes.csv", index=False)
-
-print(f"Nombre de points d'origine : {len(df)}")
-print(f"Nombre de points après fusion : {len(result)}")
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from sklearn.neighbors import BallTree
+
+# Distance maximale (en mètres) pour considérer deux points comme voisins
+DIST_MAX = 100
+
+# Taille des blocs spatiaux traités séparément (en degrés)
+TAILLE_BLOC = 0.5
+
+RAYON_TERRE = 6_371_000  # mètres
+
+
+# Nombre de lignes du CSV lues à la fois
+TAILLE_LOT = 1_000_000
+
+# Nombre de paires de voisins construites à la fois dans un bloc (les amas denses sont traités par paquets)
+MAX_PAIRES = 5_000_000
+
+
+def composantes_voisinage(lon, lat, dist_max=DIST_MAX, taille_bloc=TAILLE_BLOC):
+    """
+    Étiquette de groupe de chaque point : les groupes sont les chaînes de voisins à moins de dist_max mètres
+    (distance haversine). Les points sont traités par blocs de taille_bloc degrés, chacun avec une marge de
+    recouvrement égale au rayon, afin de ne construire que de petits BallTree. Les arêtes d'un bloc ne sont pas
+    gardées : chaque groupe local est réduit à une étoile (chaque point relié au premier point du groupe), et les
+    points de la marge, présents dans plusieurs blocs, relient les groupes d'un bloc à l'autre.
+    Dans un bloc, les points sont interrogés par paquets d'environ MAX_PAIRES paires de voisins (comptées d'abord
+    avec count_only), chaque paquet étant fusionné avec l'étoile des paquets précédents. La mémoire est ainsi
+    proportionnelle au nombre de points plus MAX_PAIRES, et non au nombre de paires (quadratique dans les amas).
+    """
+    n = len(lon)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    rayon = dist_max / RAYON_TERRE  # rayon en radians
+    marge_lat = np.degrees(rayon)
+    cos_lat_min = max(np.cos(np.radians(min(np.abs(lat).max() + marge_lat, 90))), 0.01)
+    marge_lon = marge_lat / cos_lat_min
+
+    # Les blocs doivent être plus grands que la marge pour que les 8 blocs voisins suffisent
+    bloc_lon = max(taille_bloc, marge_lon)
+    bloc_lat = max(taille_bloc, marge_lat)
+    bx = np.floor(lon / bloc_lon).astype(np.int64)
+    by = np.floor(lat / bloc_lat).astype(np.int64)
+
+    # Regrouper les indices des points par bloc
+    ordre = np.lexsort((by, bx))
+    cles, debuts = np.unique(np.column_stack((bx[ordre], by[ordre])), axis=0, return_index=True)
+    fins = np.append(debuts[1:], len(ordre))
+    blocs = {(kx, ky): ordre[d:f] for (kx, ky), d, f in zip(cles, debuts, fins)}
+
+    coords = np.radians(np.column_stack((lat, lon)))
+    lignes, colonnes = [], []
+    for (kx, ky), coeur in blocs.items():
+        voisinage = np.concatenate([blocs[(kx + dx, ky + dy)]
+                                    for dx in (-1, 0, 1) for dy in (-1, 0, 1) if (kx + dx, ky + dy) in blocs])
+
+        # Ne garder que les points voisins situés dans la marge de recouvrement du bloc
+        dans_marge = ((lon[voisinage] >= kx * bloc_lon - marge_lon) & (lon[voisinage] <= (kx + 1) * bloc_lon + marge_lon) &
+                      (lat[voisinage] >= ky * bloc_lat - marge_lat) & (lat[voisinage] <= (ky + 1) * bloc_lat + marge_lat))
+        voisinage = voisinage[dans_marge]
+
+        # Groupes du bloc (indices locaux de voisinage), puis une étoile par groupe
+        tree = BallTree(coords[voisinage], metric="haversine")
+        tri = np.argsort(voisinage)
+        coeur_local = tri[np.searchsorted(voisinage, coeur, sorter=tri)]
+        comptes = tree.query_radius(coords[coeur], r=rayon, count_only=True)
+        coupures = np.flatnonzero(np.diff(np.cumsum(comptes) // MAX_PAIRES)) + 1
+        etoile = np.arange(len(voisinage))  # chaque point relié au premier point de son groupe
+        for paquet in np.split(np.arange(len(coeur)), coupures):
+            voisins = tree.query_radius(coords[coeur[paquet]], r=rayon)
+            longueurs = [len(v) for v in voisins]
+            sources = np.concatenate((np.arange(len(voisinage)), np.repeat(coeur_local[paquet], longueurs)))
+            cibles = np.concatenate((etoile, *voisins))
+            local = coo_matrix((np.ones(len(sources), dtype=bool), (sources, cibles)),
+                               shape=(len(voisinage), len(voisinage)))
+            _, labels_locaux = connected_components(local, directed=False)
+            etoile = np.unique(labels_locaux, return_index=True)[1][labels_locaux]
+        lignes.append(voisinage)
+        colonnes.append(voisinage[etoile])
+
+    # Groupes globaux : union des étoiles de tous les blocs (au plus un lien par point et par bloc)
+    lignes, colonnes = np.concatenate(lignes), np.concatenate(colonnes)
+    graphe = coo_matrix((np.ones(len(lignes), dtype=bool), (lignes, colonnes)), shape=(n, n))
+    return connected_components(graphe, directed=False)[1]
+
+
+def fusionner_points(df, dist_max=DIST_MAX, nom_X="X", nom_Y="Y", taille_bloc=TAILLE_BLOC):
+    """
+    Fusionne les groupes de points connectés (chaînes de voisins à moins de dist_max mètres)
+    en un point unique placé au centre moyen du groupe. X et Y sont la longitude et la latitude
+    en degrés. Les autres colonnes numériques sont moyennées. Retourne le DataFrame des points fusionnés.
+    """
+    labels = composantes_voisinage(df[nom_X].values.astype(np.float64), df[nom_Y].values.astype(np.float64),
+                                   dist_max, taille_bloc)
+    result = df.select_dtypes("number").groupby(labels, sort=True).mean()
+    return result.reset_index(drop=True)
+
+
+def fusionner_fichier(entree, sortie, dist_max=DIST_MAX, nom_X="X", nom_Y="Y", taille_bloc=TAILLE_BLOC,
+                      taille_lot=TAILLE_LOT):
+    """
+    fusionner_points sur un CSV trop grand pour la mémoire, lu par lots de taille_lot lignes : un premier passage
+    ne garde que les coordonnées pour former les groupes, un second accumule les sommes de chaque groupe.
+    Retourne le nombre de points d'origine et de points fusionnés.
+    """
+    lots = [lot[[nom_X, nom_Y]].values.astype(np.float64)
+            for lot in pd.read_csv(entree, usecols=[nom_X, nom_Y], chunksize=taille_lot)]
+    coords = np.concatenate(lots) if lots else np.zeros((0, 2))
+    del lots
+    labels = composantes_voisinage(coords[:, 0], coords[:, 1], dist_max, taille_bloc)
+    n_points = len(coords)
+    del coords
+    n_groupes = int(labels.max()) + 1 if n_points else 0
+
+    # Moyenne de chaque colonne numérique par groupe, sans relire le fichier en entier (NaN ignorés)
+    colonnes, sommes, comptes = None, None, None
+    debut = 0
+    for lot in pd.read_csv(entree, chunksize=taille_lot):
+        if colonnes is None:
+            colonnes = list(lot.select_dtypes("number").columns)
+            sommes = np.zeros((len(colonnes), n_groupes))
+            comptes = np.zeros((len(colonnes), n_groupes))
+        groupes = labels[debut:debut + len(lot)]
+        for i, colonne in enumerate(colonnes):
+            valeurs = pd.to_numeric(lot[colonne], errors="coerce").values.astype(np.float64)
+            presentes = ~np.isnan(valeurs)
+            sommes[i] += np.bincount(groupes[presentes], weights=valeurs[presentes], minlength=n_groupes)
+            comptes[i] += np.bincount(groupes[presentes], minlength=n_groupes)
+        debut += len(lot)
+
+    if n_points == 0:
+        # Fichier sans ligne : garder l'en-tête
+        result = pd.DataFrame(columns=pd.read_csv(entree, nrows=0).columns)
+    else:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            result = pd.DataFrame({c: sommes[i] / comptes[i] for i, c in enumerate(colonnes)})
+    result.to_csv(sortie, index=False)
+    return n_points, len(result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fusionne les points proches d'un CSV.")
+    parser.add_argument("entree", help="CSV des points (colonnes X, Y, Z en degrés)")
+    parser.add_argument("sortie", nargs="?", default="points_fusionnes.csv", help="CSV des points fusionnés")
+    parser.add_argument("--dist-max", type=float, default=DIST_MAX, help="Distance maximale entre deux voisins (mètres)")
+    parser.add_argument("--taille-bloc", type=float, default=TAILLE_BLOC, help="Taille des blocs spatiaux (degrés)")
+    parser.add_argument("--taille-lot", type=int, default=TAILLE_LOT, help="Nombre de lignes du CSV lues à la fois")
+    parser.add_argument("--nom-x", default="X", help="Nom de la colonne longitude")
+    parser.add_argument("--nom-y", default="Y", help="Nom de la colonne latitude")
+    args = parser.parse_args()
+
+    n_points, n_fusionnes = fusionner_fichier(args.entree, args.sortie, args.dist_max, args.nom_x, args.nom_y,
+                                              args.taille_bloc, args.taille_lot)
+
+    print(f"Nombre de points d'origine : {n_points}")
+    print(f"Nombre de points après fusion : {n_fusionnes}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+import argparse
+import io
+import itertools
+import json
+import queue
+import time
+import numpy as np
+import pandas as pd
+from PIL import Image, ImageFilter
+from tool_benchmark import champ_valeurs, dimensions, generer_palette, parametres_extraction
+from interface_extraction import extract_colors
+from interface_conversion import create_custom_cmap, interpolate_palette, match_colors_to_values, ESPACES_COULEUR
+from interface_tif import compute_grid
+
+# Emprise des cartes de test (coins Nord-Ouest et Sud-Est)
+LON_MIN, LAT_MIN, LON_MAX, LAT_MAX = -70.0, 45.0, -69.0, 46.0
+
+
+def rendre_carte(champ, palette, qualite_jpeg=0, flou=0.0):
+    """
+    Rend un champ de valeurs connu avec la colormap du projet (create_custom_cmap), comme une carte en dégradé,
+    puis la dégrade éventuellement : flou gaussien (rayon en pixels) et compression JPEG (qualité 1-95, 0 : aucune).
+    """
+    palette_triee = palette.sort_values(by="value").reset_index(drop=True)
+    cmap = create_custom_cmap(palette_triee)
+    # create_custom_cmap répartit les couleurs régulièrement : position de chaque valeur entre les couleurs voisines
+    position = np.interp(champ, palette_triee["value"].values, np.linspace(0, 1, len(palette_triee)))
+    image = Image.fromarray(np.round(cmap(position)[..., :3] * 255).astype(np.uint8), "RGB")
+    if flou > 0:
+        image = image.filter(ImageFilter.GaussianBlur(flou))
+    if qualite_jpeg > 0:
+        tampon = io.BytesIO()
+        image.save(tampon, format="JPEG", quality=qualite_jpeg)
+        image = Image.open(io.BytesIO(tampon.getvalue())).convert("RGB")
+    return image
+
+
+def classes(valeurs, valeurs_palette):
+    """Indice de la valeur de palette la plus proche (la « classe » d'une valeur)."""
+    position = np.clip(np.searchsorted(valeurs_palette, valeurs), 1, len(valeurs_palette) - 1)
+    return position - ((valeurs - valeurs_palette[position - 1]) < (valeurs_palette[position] - valeurs))
+
+
+class Memo:
+    """Garde le résultat et la durée de chaque étape déjà calculée, partagés entre les configurations."""
+
+    def __init__(self):
+        self.resultats = {}
+
+    def get(self, cle, fonction):
+        if cle not in self.resultats:
+            debut = time.perf_counter()
+            resultat = fonction()
+            self.resultats[cle] = (resultat, time.perf_counter() - debut)
+        return self.resultats[cle]
+
+
+def evaluer(image, champ, palette, n_points, seuil, pas, grille, memo, cle_image, espace="RGB"):
+    """Exécute la chaîne de conversion pour une configuration et la compare au champ de valeurs connu."""
+    largeur, hauteur = image.size
+    valeurs_palette = np.sort(palette["value"].values)
+
+    df, t_extraction = memo.get(("extraction", cle_image, pas),
+                                lambda: extract_colors(image, parametres_extraction(LON_MIN, LAT_MIN, LON_MAX, LAT_MAX, pas)))
+    interp_palette, t_palette = memo.get(("palette", n_points), lambda: interpolate_palette(palette, n_points))
+    (z, distances), t_correspondance = memo.get(("correspondance", cle_image, pas, n_points, espace),
+                                                lambda: match_colors_to_values(df[["R", "G", "B"]].values, interp_palette,
+                                                                               espace=espace))
+
+    # Valeurs vraies dans l'ordre de l'extraction (colonne par colonne, un pixel sur pas)
+    verite = champ[::pas, ::pas].T.ravel()
+    debut = time.perf_counter()
+    retenus = distances <= seuil
+    t_seuil = time.perf_counter() - debut
+
+    erreur = z[retenus] - verite[retenus]
+    resultat = {
+        "points": int(len(z)),
+        "taux_rejet": float(1 - retenus.mean()),
+        "rmse": float(np.sqrt(np.mean(erreur ** 2))) if erreur.size else None,
+        "erreur_max": float(np.abs(erreur).max()) if erreur.size else None,
+        "taux_mauvaise_classe": float(np.mean(classes(z[retenus], valeurs_palette) != classes(verite[retenus], valeurs_palette)))
+        if erreur.size else None,
+    }
+    durees = {"extraction": t_extraction, "interpolation_palette": t_palette, "correspondance": t_correspondance,
+              "seuil": t_seuil}
+
+    if grille:
+        df_valeurs = pd.DataFrame({"X": df["X"].values[retenus], "Y": df["Y"].values[retenus], "Z": z[retenus]})
+        grid, t_grille = memo.get(("grille", cle_image, pas, n_points, espace, seuil, grille),
+                                  lambda: compute_grid(df_valeurs, "X", "Y", "Z", grille, grille, "4326", queue.Queue()))
+        bande = np.asarray(grid["bandes"][0], dtype=np.float64)
+        a, b, c, d, e, f = grid["transform"]
+        # Valeur vraie au centre de chaque cellule (pixel de la carte le plus proche)
+        colonnes, lignes = np.meshgrid(np.arange(bande.shape[1]) + 0.5, np.arange(bande.shape[0]) + 0.5)
+        lon, lat = a * colonnes + b * lignes + c, d * colonnes + e * lignes + f
+        px = np.clip(np.round((lon - LON_MIN) / (LON_MAX - LON_MIN) * (largeur - 1)).astype(int), 0, largeur - 1)
+        py = np.clip(np.round((LAT_MAX - lat) / (LAT_MAX - LAT_MIN) * (hauteur - 1)).astype(int), 0, hauteur - 1)
+        erreur_grille = (bande - champ[py, px])[np.isfinite(bande)]
+        resultat["rmse_grille"] = float(np.sqrt(np.mean(erreur_grille ** 2))) if erreur_grille.size else None
+        durees["grille"] = t_grille
+
+    resultat["durees"] = durees
+    resultat["duree_totale"] = sum(durees.values())
+    return resultat
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Mesure la précision et la vitesse de la conversion pour chaque combinaison de réglages, "
+                    "sur des cartes rendues depuis des champs de valeurs connus.")
+    parser.add_argument("--pixels", type=float, default=2e5, help="Nombre de pixels des cartes")
+    parser.add_argument("--couleurs", type=int, default=10, help="Nombre de couleurs de la palette de référence")
+    parser.add_argument("--colormap", default="viridis", help="Colormap matplotlib donnant les couleurs de la palette")
+    parser.add_argument("--graine", type=int, default=0, help="Graine du champ de valeurs")
+    parser.add_argument("--jpeg", nargs="+", type=int, default=[0], help="Qualités JPEG testées (0 : pas de compression)")
+    parser.add_argument("--flou", nargs="+", type=float, default=[0.0], help="Rayons de flou gaussien testés (pixels)")
+    parser.add_argument("--points-interpolation", nargs="+", type=int, default=[100, 1000, 5000],
+                        help="Valeurs de n_points_interpolation testées")
+    parser.add_argument("--seuils", nargs="+", type=float, default=[20, 40, 80],
+                        help="Valeurs de seuil_distance_couleur testées (dans l'unité de chaque espace de couleur)")
+    parser.add_argument("--espaces", nargs="+", default=["RGB"], choices=ESPACES_COULEUR,
+                        help="Espaces de couleur de la correspondance testés")
+    parser.add_argument("--pas", nargs="+", type=int, default=[1, 2, 4], help="Pas d'échantillonnage testés")
+    parser.add_argument("--grilles", nargs="+", type=int, default=[0],
+                        help="Résolutions de grille du Tif testées (0 : pas de grille)")
+    parser.add_argument("--cible-rmse", type=float, default=None, help="RMSE visée : affiche la configuration la plus rapide qui l'atteint")
+    parser.add_argument("--cible-classe", type=float, default=None, help="Taux de mauvaise classe maximal visé (0-1)")
+    parser.add_argument("--sortie", default="precision.json", help="Fichier JSON des résultats")
+    args = parser.parse_args()
+
+    largeur, hauteur = dimensions(int(args.pixels))
+    palette = generer_palette(args.couleurs, colormap=args.colormap)
+    champ = champ_valeurs(largeur, hauteur, palette["value"].min(), palette["value"].max(), args.graine).astype(np.float64)
+
+    memo = Memo()
+    resultats = []
+    for qualite, flou in itertools.product(args.jpeg, args.flou):
+        image = rendre_carte(champ, palette, qualite, flou)
+        for espace, n_points, seuil, pas, grille in itertools.product(args.espaces, args.points_interpolation, args.seuils,
+                                                                      args.pas, args.grilles):
+            configuration = {"jpeg": qualite, "flou": flou, "espace_couleur": espace, "n_points_interpolation": n_points,
+                             "seuil_distance_couleur": seuil, "pas": pas, "grid_res": grille}
+            resultat = evaluer(image, champ, palette, n_points, seuil, pas, grille, memo, (qualite, flou), espace)
+            resultats.append({"configuration": configuration, **resultat})
+            rmse = "-" if resultat["rmse"] is None else f"{resultat['rmse']:.3f}"
+            classe = "-" if resultat["taux_mauvaise_classe"] is None else f"{resultat['taux_mauvaise_classe'] * 100:.1f}%"
+            print(f"jpeg={qualite:<3} flou={flou:<4} {espace:<14} n={n_points:<5} seuil={seuil:<5} pas={pas:<2} grille={grille:<5} "
+                  f"RMSE={rmse:<8} classe={classe:<7} rejet={resultat['taux_rejet'] * 100:.1f}%  "
+                  f"{resultat['duree_totale']:.3f} s")
+
+    with open(args.sortie, "w") as f:
+        json.dump({"date": time.strftime("%Y-%m-%d %H:%M:%S"), "pixels": largeur * hauteur, "couleurs": args.couleurs,
+                   "colormap": args.colormap, "graine": args.graine, "resultats": resultats}, f, indent=4)
+    print(f"Résultats : {args.sortie}")
+
+    if args.cible_rmse is not None or args.cible_classe is not None:
+        valides = [r for r in resultats if r["rmse"] is not None
+                   and (args.cible_rmse is None or r["rmse"] <= args.cible_rmse)
+                   and (args.cible_classe is None or r["taux_mauvaise_classe"] <= args.cible_classe)]
+        if not valides:
+            print("Aucune configuration n'atteint la précision visée.")
+        else:
+            # Les étapes communes ne sont calculées qu'une fois ici : la durée totale reste celle d'un traitement seul
+            meilleure = min(valides, key=lambda r: r["duree_totale"])
+            print(f"Configuration la plus rapide atteignant la cible : {json.dumps(meilleure['configuration'])} "
+                  f"({meilleure['duree_totale']:.3f} s, RMSE {meilleure['rmse']:.3f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+import argparse
+import cProfile
+import json
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource  # Absent sous Windows : pas de mémoire résidente maximale
+except ImportError:
+    resource = None
+
+# Le profilage est activé par variable d'environnement, héritée par les processus de calcul
+VARIABLE_ACTIF = "CONVERSION_RGB_PROFILAGE"
+VARIABLE_CPROFILE = "CONVERSION_RGB_PROFILAGE_CPROFILE"
+VARIABLE_DOSSIER = "CONVERSION_RGB_PROFILAGE_DOSSIER"
+DOSSIER_DEFAUT = os.path.join(os.path.expanduser("~"), ".conversion_rgb_profilage")
+
+
+def profilage_actif():
+    return os.environ.get(VARIABLE_ACTIF, "") != ""
+
+
+def activer(actif=True, cprofile=False, dossier=None):
+    """Active ou désactive le profilage des prochaines exécutions (et des processus lancés ensuite)."""
+    for variable, valeur in ((VARIABLE_ACTIF, actif), (VARIABLE_CPROFILE, actif and cprofile)):
+        if valeur:
+            os.environ[variable] = "1"
+        else:
+            os.environ.pop(variable, None)
+    if dossier:
+        os.environ[VARIABLE_DOSSIER] = dossier
+
+
+def rss_max():
+    """Mémoire résidente maximale du processus en octets (None si indisponible)."""
+    if resource is None:
+        return None
+    maximum = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maximum if sys.platform == "darwin" else maximum * 1024  # Octets sous macOS, kilo-octets sous Linux
+
+
+class Profilage:
+    """
+    Mesures par étape d'une exécution (extraction, conversion ou Tif) : temps réel, temps CPU, lignes traitées,
+    pic mémoire Python (tracemalloc) et mémoire résidente maximale. Sans effet si le profilage n'est pas activé.
+    ecrire() enregistre le rapport JSON (et le profil cProfile si demandé) dans le dossier de profilage.
+    """
+
+    def __init__(self, nom, actif=None):
+        self.nom = nom
+        self.actif = profilage_actif() if actif is None else actif
+        self.mesures = []
+        self.courante = None
+        self.lignes_courantes = None
+        self.debut_execution = time.perf_counter()
+        self.date = time.strftime("%Y-%m-%d %H:%M:%S")
+        self.profileur = None
+        self.arreter_tracemalloc = False
+
+        if self.actif:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self.arreter_tracemalloc = True
+            if os.environ.get(VARIABLE_CPROFILE, "") != "":
+                self.profileur = cProfile.Profile()
+                self.profileur.enable()
+
+    def debut(self, etape):
+        """Termine l'étape en cours et commence la suivante."""
+        if not self.actif:
+            return
+        self.fin()
+        tracemalloc.reset_peak()
+        self.courante = {"etape": etape, "debut": time.perf_counter() - self.debut_execution,
+                         "_mur": time.perf_counter(), "_cpu": time.process_time()}
+
+    def lignes(self, nombre):
+        """Nombre de lignes traitées par l'étape en cours et les suivantes."""
+        self.lignes_courantes = int(nombre)
+
+    def fin(self):
+        if not self.actif or self.courante is None:
+            return
+        mesure = self.courante
+        mesure["temps_reel"] = time.perf_counter() - mesure.pop("_mur")
+        mesure["temps_cpu"] = time.process_time() - mesure.pop("_cpu")
+        mesure["lignes"] = self.lignes_courantes
+        mesure["lignes_par_seconde"] = (self.lignes_courantes / mesure["temps_reel"]
+                                        if self.lignes_courantes and mesure["temps_reel"] > 0 else None)
+        mesure["memoire_max"] = tracemalloc.get_traced_memory()[1]
+        mesure["rss_max"] = rss_max()
+        self.mesures.append(mesure)
+        self.courante = None
+
+    @contextmanager
+    def etape(self, nom, lignes=None):
+        self.debut(nom)
+        if lignes is not None:
+            self.lignes(lignes)
+        try:
+            yield self
+        finally:
+            self.fin()
+
+    def rapport(self, statut="termine"):
+        return {"nom": self.nom, "date": self.date, "pid": os.getpid(), "statut": statut,
+                "temps_total": time.perf_counter() - self.debut_execution, "etapes": self.mesures}
+
+    def ecrire(self, statut="termine"):
+        """Termine l'exécution et écrit le rapport ; retourne son chemin (None si le profilage est désactivé)."""
+        if not self.actif:
+            return None
+        self.fin()
+        dossier = os.environ.get(VARIABLE_DOSSIER, DOSSIER_DEFAUT)
+        os.makedirs(dossier, exist_ok=True)
+        base = os.path.join(dossier, f"{self.nom}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}")
+        if self.profileur is not None:
+            self.profileur.disable()
+            self.profileur.dump_stats(base + ".prof")
+        if self.arreter_tracemalloc:
+            tracemalloc.stop()
+        with open(base + ".json", "w") as f:
+            json.dump(self.rapport(statut), f, indent=4, ensure_ascii=False)
+        self.actif = False
+        return base + ".json"
+
+
+class QueueProfilee:
+    """
+    Enveloppe la progress_queue d'une fonction de calcul : chaque ("etape", indice) commence une étape du profilage,
+    ("points", nombre) donne les lignes traitées, et ("termine", ...) ou ("erreur", ...) écrit le rapport.
+    """
+
+    def __init__(self, progress_queue, nom, etapes):
+        self.progress_queue = progress_queue
+        self.etapes = etapes
+        self.profilage = Profilage(nom)
+
+    def put(self, message):
+        if message[0] == "etape":
+            self.profilage.debut(self.etapes[message[1]])
+        elif message[0] == "points":
+            self.profilage.lignes(message[1])
+        elif message[0] in ("termine", "erreur"):
+            self.profilage.ecrire(message[0])
+        self.progress_queue.put(message)
+
+    def __getattr__(self, nom):
+        return getattr(self.progress_queue, nom)
+
+
+def profiler_queue(progress_queue, nom, etapes):
+    """progress_queue enveloppée pour le profilage s'il est activé, sinon inchangée."""
+    return QueueProfilee(progress_queue, nom, etapes) if profilage_actif() else progress_queue
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Affiche les rapports de profilage des exécutions.")
+    parser.add_argument("rapports", nargs="*", help="Rapports JSON (par défaut, les 5 derniers du dossier de profilage)")
+    args = parser.parse_args()
+
+    rapports = args.rapports
+    if not rapports:
+        dossier = os.environ.get(VARIABLE_DOSSIER, DOSSIER_DEFAUT)
+        if os.path.isdir(dossier):
+            rapports = sorted((os.path.join(dossier, nom) for nom in os.listdir(dossier) if nom.endswith(".json")),
+                              key=os.path.getmtime)[-5:]
+
+    for fichier in rapports:
+        with open(fichier, "r") as f:
+            rapport = json.load(f)
+        print(f"\n{rapport['nom']} ({rapport['date']}, {rapport['statut']}) : {rapport['temps_total']:.2f} s")
+        for mesure in rapport["etapes"]:
+            lignes = "" if mesure["lignes"] is None else f"{mesure['lignes']:>12} lignes"
+            print(f"  {mesure['etape']:<32} {mesure['temps_reel']:>8.3f} s  CPU {mesure['temps_cpu']:>8.3f} s  "
+                  f"{mesure['memoire_max'] / 1e6:>9.1f} Mo  {lignes}")
+        if os.path.exists(fichier[:-5] + ".prof"):
+            print(f"  Profil cProfile : {fichier[:-5] + '.prof'}")
+
+
+if __name__ == "__main__":
+    main()
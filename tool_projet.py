@@ -0,0 +1,131 @@
+import argparse
+import io
+import json
+import struct
+import zipfile
+import numpy as np
+import pandas as pd
+
+# Extension des fichiers projet (zip non compressé de tableaux .npy et d'un manifeste JSON)
+EXTENSION = ".crgb"
+VERSION = 1
+
+
+def sauvegarder_projet(fichier, donnees, parametres=None):
+    """
+    Écrit un projet complet dans un seul fichier. donnees est un dict nom -> DataFrame, tableau numpy
+    ou dict (tableaux numpy et valeurs JSON). Chaque colonne ou tableau est un fichier .npy non compressé
+    du zip, pour pouvoir être relu par projection en mémoire (memmap).
+    """
+    manifeste = {"version": VERSION, "parametres": parametres or {}, "donnees": {}}
+
+    with zipfile.ZipFile(fichier, "w", zipfile.ZIP_STORED, allowZip64=True) as z:
+        def ecrire_tableau(chemin, tableau):
+            tableau = np.asarray(tableau)
+            if tableau.dtype == object:
+                tableau = tableau.astype(str)  # Pas de pickle dans le projet
+            with z.open(chemin, "w", force_zip64=True) as f:
+                np.lib.format.write_array(f, np.ascontiguousarray(tableau), allow_pickle=False)
+
+        for nom, objet in donnees.items():
+            if isinstance(objet, pd.DataFrame):
+                colonnes = [str(c) for c in objet.columns]
+                for i, colonne in enumerate(colonnes):
+                    ecrire_tableau(f"{nom}/{i}.npy", objet.iloc[:, i].values)
+                manifeste["donnees"][nom] = {"type": "dataframe", "colonnes": colonnes}
+            elif isinstance(objet, dict):
+                tableaux = [k for k, v in objet.items() if isinstance(v, np.ndarray)]
+                for k in tableaux:
+                    ecrire_tableau(f"{nom}/{k}.npy", objet[k])
+                valeurs = {k: v for k, v in objet.items() if k not in tableaux}
+                manifeste["donnees"][nom] = {"type": "dict", "tableaux": tableaux, "valeurs": valeurs}
+            else:
+                ecrire_tableau(f"{nom}.npy", objet)
+                manifeste["donnees"][nom] = {"type": "tableau"}
+
+        z.writestr("manifest.json", json.dumps(manifeste, indent=4, default=float))
+
+
+class Projet:
+    """
+    Projet ouvert en lecture. Les tableaux sont projetés en mémoire (memmap) : seules les parties
+    réellement lues sont chargées depuis le disque, l'ouverture est donc quasi immédiate.
+    """
+
+    def __init__(self, fichier):
+        self.fichier = fichier
+        self.zip = zipfile.ZipFile(fichier, "r")
+        self.manifeste = json.loads(self.zip.read("manifest.json"))
+        self.parametres = self.manifeste["parametres"]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.zip.close()
+
+    def noms(self):
+        return list(self.manifeste["donnees"])
+
+    def tableau(self, chemin, mmap=True):
+        """Tableau .npy du zip, en memmap (lecture seule) si le fichier n'est pas compressé."""
+        info = self.zip.getinfo(chemin)
+        if not mmap or info.compress_type != zipfile.ZIP_STORED:
+            return np.load(io.BytesIO(self.zip.read(chemin)), allow_pickle=False)
+
+        with open(self.fichier, "rb") as f:
+            # Position des données : en-tête local du zip (30 octets + nom + extra), puis en-tête .npy
+            f.seek(info.header_offset)
+            longueur_nom, longueur_extra = struct.unpack("<HH", f.read(30)[26:30])
+            f.seek(info.header_offset + 30 + longueur_nom + longueur_extra)
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran, dtype = np.lib.format.read_array_header_2_0(f)
+            offset = f.tell()
+
+        if 0 in shape:
+            return np.empty(shape, dtype=dtype)
+        return np.memmap(self.fichier, dtype=dtype, mode="r", offset=offset, shape=shape, order="F" if fortran else "C")
+
+    def dataframe(self, nom, colonnes=None, lignes=None):
+        """Lit un DataFrame du projet, éventuellement seulement certaines colonnes et une tranche de lignes."""
+        colonnes_projet = self.manifeste["donnees"][nom]["colonnes"]
+        colonnes = colonnes_projet if colonnes is None else colonnes
+        lignes = slice(None) if lignes is None else lignes
+        return pd.DataFrame({c: self.tableau(f"{nom}/{colonnes_projet.index(c)}.npy")[lignes] for c in colonnes}, copy=False)
+
+    def charger(self, nom):
+        """Relit une donnée du projet sous sa forme d'origine (DataFrame, tableau ou dict)."""
+        description = self.manifeste["donnees"][nom]
+        if description["type"] == "dataframe":
+            return self.dataframe(nom)
+        if description["type"] == "dict":
+            objet = dict(description["valeurs"])
+            objet.update({k: self.tableau(f"{nom}/{k}.npy") for k in description["tableaux"]})
+            return objet
+        return self.tableau(f"{nom}.npy")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Affiche le contenu d'un projet Conversion RGB.")
+    parser.add_argument("projet", help=f"Fichier projet ({EXTENSION})")
+    args = parser.parse_args()
+
+    with Projet(args.projet) as projet:
+        print(json.dumps(projet.parametres, indent=4, ensure_ascii=False))
+        for nom in projet.noms():
+            description = projet.manifeste["donnees"][nom]
+            if description["type"] == "dataframe":
+                taille = len(projet.tableau(f"{nom}/0.npy")) if description["colonnes"] else 0
+                print(f"{nom} : DataFrame {taille} lignes, colonnes {description['colonnes']}")
+            else:
+                print(f"{nom} : {description['type']}")
+
+
+if __name__ == "__main__":
+    main()
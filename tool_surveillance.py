@@ -0,0 +1,178 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from tool_batch import EXTENSIONS_IMAGES, charger_parametres, nom_travail, traiter_entree
+
+# Les palettes déposées dans le dossier surveillé sont les fichiers texte de la fenêtre palette
+EXTENSION_PALETTE = ".txt"
+JOURNAL = "journal.jsonl"
+
+
+def charger_profil(fichier_profils, nom):
+    """
+    Profil de paramètres nommé. Le fichier de profils associe à chaque nom les paramètres des étapes
+    extraction, conversion et tif, donnés directement ou sous forme de chemin vers le JSON d'une fenêtre.
+    """
+    with open(fichier_profils, "r") as f:
+        profils = json.load(f)
+    if nom not in profils:
+        raise ValueError(f"Profil inconnu : {nom} (profils disponibles : {', '.join(profils)})")
+
+    parametres = {}
+    for etape in ("extraction", "conversion", "tif"):
+        valeur = profils[nom].get(etape)
+        if isinstance(valeur, str):
+            valeur = charger_parametres(os.path.join(os.path.dirname(os.path.abspath(fichier_profils)), valeur))
+        parametres[etape] = valeur if valeur is not None or etape == "tif" else {}
+    return parametres
+
+
+def lire_journal(fichier_journal):
+    """Entrées déjà traitées (chemin, taille, date de modification), pour ne pas les refaire après un redémarrage."""
+    traitees = set()
+    if os.path.exists(fichier_journal):
+        with open(fichier_journal, "r") as f:
+            for ligne in f:
+                if ligne.strip():
+                    resume = json.loads(ligne)
+                    traitees.add(tuple(resume["fichier"]))
+    return traitees
+
+
+def scanner(dossier):
+    """Images et palettes du dossier avec leur (taille, date de modification)."""
+    images, palettes = {}, {}
+    for element in os.scandir(dossier):
+        if not element.is_file():
+            continue
+        nom = element.name.lower()
+        if nom.endswith(EXTENSIONS_IMAGES):
+            cible = images
+        elif nom.endswith(EXTENSION_PALETTE):
+            cible = palettes
+        else:
+            continue
+        stat = element.stat()
+        cible[os.path.abspath(element.path)] = (stat.st_size, stat.st_mtime_ns)
+    return images, palettes
+
+
+def choisir_palette(image, palettes, palette_profil):
+    """
+    Palette de même nom que l'image, sinon celle du profil, sinon None. Une autre palette déposée dans le dossier
+    n'est jamais utilisée : une palette égarée convertirait sinon toutes les cartes suivantes avec la mauvaise légende.
+    """
+    meme_nom = os.path.splitext(image)[0] + EXTENSION_PALETTE
+    for chemin in palettes:
+        if os.path.normcase(chemin) == os.path.normcase(meme_nom):
+            return chemin
+    return palette_profil if palette_profil and os.path.exists(palette_profil) else None
+
+
+class Surveillance:
+    """
+    Surveille un dossier par scrutation (compatible avec les partages réseau, où les notifications du système
+    ne sont pas fiables) et traite chaque nouvelle image dans un pool de processus de taille fixe.
+    Un fichier n'est pris qu'une fois stable (même taille et même date sur deux passages) pour ne pas lire une
+    copie en cours. Les processus du pool sont réutilisés : palettes interpolées et index restent en mémoire
+    entre les cartes, et le cache disque évite de refaire les étapes déjà calculées.
+    """
+
+    def __init__(self, dossier, parametres, dossier_resultats, processus=2, intervalle=5.0, figures=True):
+        self.dossier = dossier
+        self.parametres = parametres
+        self.dossier_resultats = dossier_resultats
+        self.processus = max(1, processus)
+        self.intervalle = intervalle
+        self.figures = figures
+
+        os.makedirs(dossier_resultats, exist_ok=True)
+        self.fichier_journal = os.path.join(dossier_resultats, JOURNAL)
+        self.traitees = lire_journal(self.fichier_journal)
+        self.noms_utilises = set(os.listdir(dossier_resultats))
+        self.precedent = {}  # Dernier état vu de chaque image, pour attendre la fin des copies
+        self.en_cours = {}  # future -> (image, (taille, date))
+        self.sans_palette = set()  # Images déjà signalées comme sans palette
+
+    def images_pretes(self, images):
+        pretes = []
+        soumises = {image for image, _ in self.en_cours.values()}
+        for image, etat in sorted(images.items(), key=lambda element: element[1][1]):
+            if (image, *etat) in self.traitees or image in soumises:
+                continue
+            if self.precedent.get(image) == etat:
+                pretes.append((image, etat))
+        self.precedent = images
+        return pretes
+
+    def soumettre(self, pool, images, palettes):
+        # File bornée : pas plus de deux travaux en attente par processus
+        for image, etat in self.images_pretes(images):
+            if len(self.en_cours) >= 2 * self.processus:
+                break
+            palette = choisir_palette(image, palettes, self.parametres["conversion"].get("fichier_palette"))
+            if palette is None:
+                # Attendre qu'une palette de même nom soit déposée, en ne le signalant qu'une fois
+                if image not in self.sans_palette:
+                    self.sans_palette.add(image)
+                    print(f"ATTENTION : {os.path.basename(image)} ignorée, ni palette "
+                          f"{os.path.splitext(os.path.basename(image))[0] + EXTENSION_PALETTE} ni palette de profil")
+                continue
+            parametres = dict(self.parametres, conversion={**self.parametres["conversion"], "fichier_palette": palette})
+            dossier_sortie = os.path.join(self.dossier_resultats, nom_travail(image, self.noms_utilises))
+            future = pool.submit(traiter_entree, image, dossier_sortie, parametres, self.figures)
+            self.en_cours[future] = (image, etat)
+            print(f"Nouvelle carte : {os.path.basename(image)} (palette {os.path.basename(palette)})")
+
+    def recuperer(self):
+        for future in [f for f in self.en_cours if f.done()]:
+            image, etat = self.en_cours.pop(future)
+            try:
+                resume = future.result()
+            except Exception as e:
+                resume = {"entree": image, "statut": "erreur", "erreur": str(e), "durees": {}, "sorties": {}}
+            resume["fichier"] = [image, *etat]
+            resume["date"] = time.strftime("%Y-%m-%d %H:%M:%S")
+            self.traitees.add((image, *etat))
+            with open(self.fichier_journal, "a") as f:
+                f.write(json.dumps(resume, ensure_ascii=False, default=str) + "\n")
+
+            etat_texte = "OK" if resume["statut"] == "termine" else f"ERREUR : {resume['erreur']}"
+            duree = resume["durees"].get("total", 0)
+            print(f"{os.path.basename(image)} ({duree:.1f} s) {etat_texte}")
+
+    def lancer(self):
+        print(f"Surveillance de {self.dossier} ({self.processus} processus). Ctrl+C pour arrêter.")
+        with ProcessPoolExecutor(max_workers=self.processus) as pool:
+            try:
+                while True:
+                    images, palettes = scanner(self.dossier)
+                    self.soumettre(pool, images, palettes)
+                    self.recuperer()
+                    time.sleep(self.intervalle)
+            except KeyboardInterrupt:
+                print("Arrêt demandé : fin des cartes en cours...")
+                while self.en_cours:
+                    time.sleep(0.5)
+                    self.recuperer()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Surveille un dossier et convertit chaque nouvelle carte déposée.")
+    parser.add_argument("dossier", help="Dossier surveillé (images et palettes .txt)")
+    parser.add_argument("--profils", required=True, help="Fichier JSON des profils de paramètres")
+    parser.add_argument("--profil", required=True, help="Nom du profil à utiliser")
+    parser.add_argument("--resultats", default="resultats", help="Dossier des résultats (un sous-dossier par carte)")
+    parser.add_argument("--processus", type=int, default=2, help="Nombre de cartes traitées en parallèle")
+    parser.add_argument("--intervalle", type=float, default=5.0, help="Secondes entre deux passages sur le dossier")
+    parser.add_argument("--sans-figures", action="store_true", help="Ne trace pas la palette et le nuage de points")
+    args = parser.parse_args()
+
+    Surveillance(args.dossier, charger_profil(args.profils, args.profil), args.resultats, args.processus,
+                 args.intervalle, not args.sans_figures).lancer()
+
+
+if __name__ == "__main__":
+    main()